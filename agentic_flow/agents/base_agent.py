@@ -1,7 +1,10 @@
 from abc import ABC, abstractmethod
+import asyncio
 from typing import Dict, Any, Optional
 from langchain_google_genai import ChatGoogleGenerativeAI
 from config import GOOGLE_API_KEY
+# Registers the metrics callback handler for every chain and model run
+import services.llm_metrics  # noqa: F401
 
 
 class Agent(ABC):
@@ -16,6 +19,8 @@ class Agent(ABC):
     
     def _init_llm(self) -> ChatGoogleGenerativeAI:
         """Initialize the language model."""
+        if not self.api_key:
+            raise ValueError("GOOGLE_API_KEY environment variable is not set")
         return ChatGoogleGenerativeAI(
             model=self.model_name,
             temperature=self.temperature,
@@ -25,4 +30,12 @@ class Agent(ABC):
     @abstractmethod
     def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Process input and return results."""
-        pass
\ No newline at end of file
+        pass
+    
+    async def aprocess(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Process input without blocking the event loop.
+        
+        Agents should override this with a native async implementation; the default
+        runs the synchronous one in a worker thread.
+        """
+        return await asyncio.to_thread(self.process, input_data)
\ No newline at end of file
@@ -1,96 +1,345 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
+import asyncio
 import json
 import re
 from .base_agent import Agent
 from langchain_core.messages import HumanMessage, SystemMessage
 from prompts.query_prompts import get_query_generation_prompt
-from services.scryfall_service import ScryfallService
-from config import QUERY_MODEL, GOOGLE_API_KEY
+from services.card import Card
+from services.deadline import DeadlineExceeded
+from services.scryfall_query import canonical_query
+from services.scryfall_service import ScryfallService, AsyncScryfallService
+from utils.stream_parsers import JSONStringArrayParser
+from config import QUERY_MODEL, GOOGLE_API_KEY, CARD_RANKING_CANDIDATES, CARD_RANKING_TOP_N
 
 class QueryAgent(Agent):
     """Agent responsible for converting strategy into Scryfall search queries."""
     
-    def __init__(self, model_name=None, temperature=0.2, api_key=None):
-        """Initialize the query agent."""
+    def __init__(self, model_name=None, temperature=0.2, api_key=None, ranker=None):
+        """
+        Initialize the query agent.
+        
+        Args:
+            ranker: Optional CardRanker; with one, CARD_RANKING_CANDIDATES cards are
+                fetched per query and the best CARD_RANKING_TOP_N distinct cards across
+                all queries are kept, ranked against the strategy
+        """
         model_name = model_name or QUERY_MODEL
         api_key = api_key or GOOGLE_API_KEY
         super().__init__(model_name, temperature, api_key)
         self.scryfall_service = ScryfallService()
+        self.ranker = ranker
     
     def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Process strategy recommendations and return card results."""
+        """
+        Process strategy recommendations and return card results.
+        
+        When input_data already has "queries" (single-pass mode), they are only
+        fetched; no queries are generated.
+        """
         strategy = input_data.get("strategy", "")
         
         # Generate Scryfall search queries
-        queries = self.generate_queries(strategy)
+        queries = input_data.get("queries")
+        if queries is None:
+            queries = self.generate_queries(strategy)
+        queries = self._unique(queries)
 
         # Fetch cards from Scryfall API using the service
-        cards = self.fetch_cards(queries)
+        cards = self.fetch_cards(queries, strategy=strategy)
         
         return {
             "queries": queries,
             "cards": cards
         }
     
+    async def aprocess(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Process strategy recommendations without blocking the event loop."""
+        strategy = input_data.get("strategy", "")
+        
+        # Card searches start while the query list is still being generated
+        queries = []
+        cards_by_query = {}
+        async for event, query, cards in self.astream_pipeline(strategy, queries=input_data.get("queries")):
+            if event == "query":
+                queries.append(query)
+            else:
+                cards_by_query[query] = cards
+        
+        # Keep results in query order, whatever order the searches finished in
+        return {
+            "queries": queries,
+            "cards": {query: cards_by_query[query] for query in queries if query in cards_by_query}
+        }
+    
     def generate_queries(self, strategy: str) -> List[str]:
         """Generate Scryfall search queries from strategy recommendations."""
-        prompt = get_query_generation_prompt()
-        messages = [
-            SystemMessage(content=prompt["system"]),
-            HumanMessage(content=prompt["user"].format(recommendations=strategy))
-        ]
-        
-        response = self.llm.invoke(messages)
-        print(response)
+        response = self.llm.invoke(self._build_messages(strategy))
         try:
             return self._parse_queries(response.content)
         except Exception as e:
             print(f"Error parsing queries: {e}")
             return []
     
-    def fetch_cards(self, queries: List[str], max_cards_per_query: int = 5) -> List[Dict[Any, Any]]:
-        """Fetch cards from Scryfall API based on generated queries."""
-        all_cards = []
-        for query in queries:
+    async def agenerate_queries(self, strategy: str) -> List[str]:
+        """Generate Scryfall search queries without blocking the event loop."""
+        response = await self.llm.ainvoke(self._build_messages(strategy))
+        try:
+            return self._parse_queries(response.content)
+        except Exception as e:
+            print(f"Error parsing queries: {e}")
+            return []
+    
+    async def astream_queries(self, strategy: str) -> AsyncIterator[str]:
+        """Stream query generation, yielding each query as soon as it is complete in the output."""
+        parser = JSONStringArrayParser()
+        text_parts = []
+        
+        async for chunk in self.llm.astream(self._build_messages(strategy)):
+            text_parts.append(chunk.content)
+            for query in parser.feed(chunk.content):
+                yield query
+        
+        if not parser.started:
+            # No JSON array in the output; fall back to the line-based parser
             try:
-                # Use the ScryfallService to fetch cards
-                cards = self.scryfall_service.search_cards(
-                    query=query, 
-                    order="edhrec", 
-                    unique="cards",
-                    max_results=max_cards_per_query
-                )
-                
-                # Process each card to extract relevant information
-                for card in cards:
-                    card_info = self._extract_card_info(card, query)
-                    all_cards.append(card_info)
-                    
+                for query in self._parse_queries("".join(text_parts)):
+                    yield query
             except Exception as e:
-                print(f"Error fetching cards for query '{query}': {e}")
+                print(f"Error parsing queries: {e}")
+    
+    def _build_messages(self, strategy: str):
+        """Build the query generation messages for a strategy."""
+        prompt = get_query_generation_prompt()
+        return [
+            SystemMessage(content=prompt["system"]),
+            HumanMessage(content=prompt["user"].format(recommendations=strategy))
+        ]
+    
+    def fetch_cards(self, queries: List[str], max_cards_per_query: int = 5,
+                    strategy: Optional[str] = None) -> Dict[str, List[Card]]:
+        """
+        Fetch cards from Scryfall API based on generated queries, grouped by query.
         
-        return all_cards
+        With a ranker and the strategy, the cards are re-ranked against the strategy.
+        """
+        cards_by_query = {}
+
+        # Run every query concurrently; each entry is a card list or an exception
+        results = self.scryfall_service.search_many(
+            queries,
+            order="edhrec",
+            unique="cards",
+            max_results=self._search_limit(max_cards_per_query)
+        )
+
+        for query, cards in zip(queries, results):
+            if isinstance(cards, Exception):
+                print(f"Error fetching cards for query '{query}': {cards}")
+                continue
+            cards_by_query[query] = cards
+
+        return self._rank(strategy, cards_by_query, max_cards_per_query)
     
-    def _extract_card_info(self, card: Dict[str, Any], query: str) -> Dict[str, Any]:
-        """Extract relevant card information."""
-        # Get image URI safely handling double-faced cards
-        image_uri = ""
-        if "image_uris" in card:
-            image_uri = card["image_uris"].get("normal", "")
-        elif "card_faces" in card and len(card["card_faces"]) > 0:
-            image_uri = card["card_faces"][0].get("image_uris", {}).get("normal", "")
+    async def afetch_cards(self, queries: List[str], max_cards_per_query: int = 5,
+                           shared: Optional[Dict[Any, asyncio.Future]] = None,
+                           strategy: Optional[str] = None) -> Dict[str, List[Card]]:
+        """
+        Fetch cards for every query concurrently without blocking the event loop, grouped by query.
         
-        return {
-            "name": card.get("name", ""),
-            "mana_cost": card.get("mana_cost", ""),
-            "type_line": card.get("type_line", ""),
-            "oracle_text": card.get("oracle_text", ""),
-            "image_uri": image_uri,
-            "scryfall_uri": card.get("scryfall_uri", ""),
-            "rarity": card.get("rarity", ""),
-            "set_name": card.get("set_name", ""),
-            "query": query
-        }
+        Args:
+            queries: Scryfall queries to run
+            max_cards_per_query: Cards kept per query
+            shared: Searches started by other requests in the same batch, keyed by
+                canonical query; equivalent queries reuse them and new ones are added
+            strategy: Strategy the cards are re-ranked against, with a ranker
+        """
+        cards_by_query = {}
+        limit = self._search_limit(max_cards_per_query)
+        if shared is None:
+            results = await AsyncScryfallService.search_many(
+                queries,
+                order="edhrec",
+                unique="cards",
+                max_results=limit
+            )
+        else:
+            searches = []
+            for query in queries:
+                key = (canonical_query(query), limit)
+                if key not in shared:
+                    shared[key] = asyncio.ensure_future(AsyncScryfallService.search_cards(
+                        query, order="edhrec", unique="cards", max_results=limit
+                    ))
+                # Shielded so one request giving up doesn't cancel a search others await
+                searches.append(asyncio.shield(shared[key]))
+            results = await asyncio.gather(*searches, return_exceptions=True)
+        
+        for query, cards in zip(queries, results):
+            if isinstance(cards, DeadlineExceeded):
+                raise cards
+            if isinstance(cards, Exception):
+                print(f"Error fetching cards for query '{query}': {cards}")
+                continue
+            cards_by_query[query] = cards
+        
+        return await self._arank(strategy, cards_by_query, max_cards_per_query)
+    
+    async def afetch_page(self, query: str, limit: int = 10, page: int = 1, offset: int = 0
+                          ) -> Tuple[List[Card], Optional[Tuple[int, int]]]:
+        """
+        Fetch one window of a query's results for paginated browsing.
+        
+        Args:
+            query: The search query in Scryfall syntax
+            limit: Number of cards in the window
+            page: Result page the window starts on
+            offset: Position of the window's first card within that page
+            
+        Returns:
+            The cards, and the (page, offset) of the card after them, or None when
+            the results are exhausted
+        """
+        cards = []
+        async for number, page_cards, has_more in AsyncScryfallService.iter_pages(
+            query, order="edhrec", unique="cards", page=page, limit=offset + limit
+        ):
+            taken = page_cards[offset:offset + limit - len(cards)]
+            cards.extend(taken)
+            end = offset + len(taken)
+            offset = 0
+            if len(cards) >= limit:
+                if end < len(page_cards):
+                    return cards, (number, end)
+                return cards, (number + 1, 0) if has_more else None
+        return cards, None
+    
+    async def astream_pipeline(self, strategy: str, max_cards_per_query: int = 5,
+                               queries: Optional[List[str]] = None
+                               ) -> AsyncIterator[Tuple[str, str, Optional[List[Card]]]]:
+        """
+        Generate queries and fetch their cards as one pipeline.
+        
+        Each query is sent to Scryfall the moment it is parsed from the streaming LLM
+        output, so card lookups overlap with the rest of generation. Queries
+        equivalent to an earlier one are skipped. Given queries
+        (single-pass mode) are fetched directly instead. With a ranker, the "cards"
+        events come once every search is done, holding the ranked groups.
+        
+        Yields:
+            ("query", query, None) as each query is generated, and
+            ("cards", query, cards) as each search completes
+        """
+        events = asyncio.Queue()
+        fetches = []
+        # Searches held back for ranking, in generation order
+        found = {}
+        
+        async def fetch(query):
+            cards = await self._afetch_query(query, self._search_limit(max_cards_per_query))
+            if self.ranker is None:
+                await events.put(("cards", query, cards))
+            else:
+                found[query] = cards
+        
+        async def generate():
+            try:
+                if queries is not None:
+                    generated = self._aiter(queries)
+                else:
+                    generated = self.astream_queries(strategy)
+                seen = set()
+                async for query in generated:
+                    # Equivalent queries would fetch the same cards again
+                    key = canonical_query(query)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    await events.put(("query", query, None))
+                    found.setdefault(query, [])
+                    fetches.append(asyncio.create_task(fetch(query)))
+                await asyncio.gather(*fetches)
+                if self.ranker is not None:
+                    for query, cards in (await self._arank(strategy, found, max_cards_per_query)).items():
+                        await events.put(("cards", query, cards))
+            finally:
+                await events.put(None)
+        
+        producer = asyncio.create_task(generate())
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+            # Surface any error raised while generating queries
+            await producer
+        finally:
+            producer.cancel()
+            for task in fetches:
+                task.cancel()
+    
+    def _search_limit(self, max_cards_per_query: int) -> int:
+        """Cards to fetch per query: over-fetched when they will be re-ranked."""
+        return max(max_cards_per_query, CARD_RANKING_CANDIDATES) if self.ranker is not None else max_cards_per_query
+    
+    def _rank(self, strategy: Optional[str], cards_by_query: Dict[str, List[Card]],
+              max_cards_per_query: int) -> Dict[str, List[Card]]:
+        """Re-rank fetched cards against the strategy, or cut them back to size without a strategy."""
+        if self.ranker is None:
+            return cards_by_query
+        try:
+            if strategy:
+                return self.ranker.rank(strategy, cards_by_query, CARD_RANKING_TOP_N)
+        except Exception as e:
+            print(f"Error ranking cards: {e}")
+        return self._truncate(cards_by_query, max_cards_per_query)
+    
+    async def _arank(self, strategy: Optional[str], cards_by_query: Dict[str, List[Card]],
+                     max_cards_per_query: int) -> Dict[str, List[Card]]:
+        """Re-rank without blocking the event loop. See _rank."""
+        if self.ranker is None:
+            return cards_by_query
+        try:
+            if strategy:
+                return await self.ranker.arank(strategy, cards_by_query, CARD_RANKING_TOP_N)
+        except Exception as e:
+            print(f"Error ranking cards: {e}")
+        return self._truncate(cards_by_query, max_cards_per_query)
+    
+    @staticmethod
+    def _truncate(cards_by_query: Dict[str, List[Card]], max_cards_per_query: int) -> Dict[str, List[Card]]:
+        return {query: cards[:max_cards_per_query] for query, cards in cards_by_query.items()}
+    
+    @staticmethod
+    def _unique(queries: List[str]) -> List[str]:
+        """The queries without those equivalent to an earlier one."""
+        seen = set()
+        unique = []
+        for query in queries:
+            key = canonical_query(query)
+            if key not in seen:
+                seen.add(key)
+                unique.append(query)
+        return unique
+    
+    @staticmethod
+    async def _aiter(queries: List[str]) -> AsyncIterator[str]:
+        for query in queries:
+            yield query
+    
+    async def _afetch_query(self, query: str, max_cards_per_query: int) -> List[Card]:
+        """Fetch the cards for a single query, logging failures."""
+        try:
+            return await AsyncScryfallService.search_cards(
+                query=query,
+                order="edhrec",
+                unique="cards",
+                max_results=max_cards_per_query
+            )
+        except (DeadlineExceeded, asyncio.CancelledError):
+            # Not a failed search: the caller ran out of time, and turns that into a partial result
+            raise
+        except Exception as e:
+            print(f"Error fetching cards for query '{query}': {e}")
+            return []
     
     def _parse_queries(self, queries_text: str) -> List[str]:
         """Parse the LLM response to extract Scryfall queries."""
@@ -1,33 +1,97 @@
-from typing import Dict, Any, Optional
+import asyncio
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple, Union
 from .base_agent import Agent
 from langchain.chains import create_history_aware_retriever, create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.exceptions import OutputParserException
+from pydantic import BaseModel, Field
 from services.knowledge_service import KnowledgeBaseRetriever
-from prompts.strategist_prompts import get_context_prompt, get_mtg_strategist_prompt
-from config import STRATEGIST_MODEL, GOOGLE_API_KEY
+from services.retrieval_cache import CachedHistoryAwareRetriever
+from services.semantic_cache import SemanticCache
+from services.session_store import create_session_store, llm_summarizer
+from services.single_flight import SingleFlight
+from prompts.strategist_prompts import (
+    get_context_prompt, get_mtg_strategist_prompt, get_mtg_strategist_structured_prompt
+)
+from config import (
+    STRATEGIST_MODEL, GOOGLE_API_KEY, STRATEGIST_CACHE_ENABLED, STRATEGIST_CACHE_THRESHOLD,
+    STRATEGIST_CACHE_TTL, STRATEGIST_CACHE_MAX_ENTRIES, SESSION_STORE, SESSION_DB, SESSION_MAX_SESSIONS,
+    SESSION_IDLE_TTL, SESSION_MAX_TURNS, SESSION_TOKEN_BUDGET, SESSION_SUMMARY_MODE, RETRIEVAL_CACHE_ENABLED,
+    RETRIEVAL_CACHE_TTL, RETRIEVAL_CACHE_MAX_BYTES, STRATEGIST_SINGLE_FLIGHT, STRATEGIST_SINGLE_PASS
+)
+
+class StrategistResponse(BaseModel):
+    """The strategist's answer together with Scryfall searches for the cards it describes."""
+    answer: str = Field(description="The full response to the user")
+    queries: List[str] = Field(
+        description="3-5 Scryfall search queries for the suggested cards; empty when no cards are needed"
+    )
+
 
 class StrategistAgent(Agent):
     """Agent responsible for providing MTG strategy recommendations."""
     
-    def __init__(self, model_name=None, temperature=0.7, api_key=None):
-        """Initialize the strategist agent."""
+    def __init__(self, model_name=None, temperature=0.7, api_key=None, single_pass=None):
+        """
+        Initialize the strategist agent.
+        
+        Args:
+            single_pass: Also return Scryfall queries with each answer, as "queries" in
+                the response, through structured output; defaults to STRATEGIST_SINGLE_PASS
+        """
         model_name = model_name or STRATEGIST_MODEL
         api_key = api_key or GOOGLE_API_KEY
         super().__init__(model_name, temperature, api_key)
-        self.knowledge_retriever = KnowledgeBaseRetriever().initialize().get_retriever()
+        self.single_pass = STRATEGIST_SINGLE_PASS if single_pass is None else single_pass
+        self.knowledge_base = KnowledgeBaseRetriever().initialize()
+        self.knowledge_retriever = self.knowledge_base.get_retriever()
+        self.retrieval_cache = None
+        if RETRIEVAL_CACHE_ENABLED:
+            self.retrieval_cache = CachedHistoryAwareRetriever(
+                self.llm,
+                self.knowledge_base,
+                get_context_prompt(),
+                ttl=RETRIEVAL_CACHE_TTL,
+                max_bytes=RETRIEVAL_CACHE_MAX_BYTES
+            )
         self.chain = self._build_chain()
-        self.store = {}
+        self.store = create_session_store(
+            SESSION_STORE,
+            path=SESSION_DB,
+            max_sessions=SESSION_MAX_SESSIONS,
+            idle_ttl=SESSION_IDLE_TTL,
+            max_turns=SESSION_MAX_TURNS,
+            token_budget=SESSION_TOKEN_BUDGET,
+            summarizer=llm_summarizer(self.llm) if SESSION_SUMMARY_MODE == "llm" else None
+        )
+        
+        # Optional cache of first-turn answers, matched by question similarity
+        self.answer_cache = None
+        if STRATEGIST_CACHE_ENABLED:
+            self.answer_cache = SemanticCache(
+                self.knowledge_base.embeddings,
+                threshold=STRATEGIST_CACHE_THRESHOLD,
+                ttl=STRATEGIST_CACHE_TTL,
+                max_entries=STRATEGIST_CACHE_MAX_ENTRIES
+            )
+        
+        # Shares one answer between concurrent identical first-turn questions
+        self.first_turn_flight = SingleFlight("strategist_first_turn") if STRATEGIST_SINGLE_FLIGHT else None
 
     def _build_chain(self):
         """Build the history-aware retrieval chain."""
         # Create history-aware retriever
-        history_aware_retriever = create_history_aware_retriever(
-            self.llm, 
-            self.knowledge_retriever, 
-            get_context_prompt()
-        )
+        if self.retrieval_cache is not None:
+            history_aware_retriever = self.retrieval_cache.as_runnable()
+        else:
+            history_aware_retriever = create_history_aware_retriever(
+                self.llm, 
+                self.knowledge_retriever, 
+                get_context_prompt()
+            )
         
         # Create document chain
         question_answer_chain = create_stuff_documents_chain(
@@ -36,13 +100,26 @@ class StrategistAgent(Agent):
         )
         
         # Create retrieval chain
-        rag_chain = create_retrieval_chain(
+        self.rag_chain = create_retrieval_chain(
             history_aware_retriever, 
             question_answer_chain
         )
         
+        if self.single_pass:
+            # Same inputs and "answer" as the plain chain, plus "queries"; a response that
+            # doesn't fit the schema falls back to the plain chain, leaving queries to the QueryAgent
+            structured_chain = create_retrieval_chain(
+                history_aware_retriever,
+                RunnablePassthrough.assign(context=self._format_context)
+                | get_mtg_strategist_structured_prompt()
+                | self.llm.with_structured_output(StrategistResponse)
+            ) | RunnableLambda(self._unpack_structured)
+            self.rag_chain = structured_chain.with_fallbacks(
+                [self.rag_chain], exceptions_to_handle=(OutputParserException,)
+            )
+        
         return RunnableWithMessageHistory(
-            rag_chain,
+            self.rag_chain,
             self.get_session_history,
             input_messages_key="input",
             history_messages_key="chat_history",
@@ -54,20 +131,195 @@ class StrategistAgent(Agent):
         query = input_data.get("query")
         session_id = input_data.get("session_id", "default_session")
         
-        response = self.chain.invoke(
+        if self._is_first_turn(session_id):
+            # Nothing to contextualize, so the history wrapper is bypassed
+            response = self._answer_first_turn(query)
+            self._record_turn(session_id, query, response["answer"])
+            return {**response, "input": query}
+        
+        return self.chain.invoke(
+            {"input": query},
+            {"configurable": {"session_id": session_id}}
+        )
+    
+    async def aprocess(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Process a user query using the agent chain without blocking the event loop."""
+        query = input_data.get("query")
+        session_id = input_data.get("session_id", "default_session")
+        
+        if await self._ais_first_turn(session_id):
+            # A first turn doesn't depend on the session, so identical questions can share one answer
+            if self.first_turn_flight is not None:
+                response = await self.first_turn_flight.do(
+                    self._question_key(query), lambda: self._aanswer_first_turn(query)
+                )
+            else:
+                response = await self._aanswer_first_turn(query)
+            await self._arecord_turn(session_id, query, response["answer"])
+            return {**response, "input": query}
+        
+        return await self.chain.ainvoke(
             {"input": query},
             {"configurable": {"session_id": session_id}}
         )
+    
+    def _answer_first_turn(self, query: str) -> Dict[str, Any]:
+        """Answer a question without conversation history, through the answer cache when enabled."""
+        if self.answer_cache is not None:
+            # Embedded once, for both the lookup and storing the answer after a miss
+            vector = self.answer_cache.embed(query)
+            answer = self.answer_cache.lookup(query, self.knowledge_base.version, vector)
+            if answer is not None:
+                return {"input": query, "chat_history": [], "context": [], "answer": answer}
+        
+        response = self.rag_chain.invoke({"input": query, "chat_history": []})
+        
+        if self.answer_cache is not None:
+            self.answer_cache.store(query, response["answer"], self.knowledge_base.version, vector)
+        return response
+    
+    async def _aanswer_first_turn(self, query: str) -> Dict[str, Any]:
+        """Answer a question without conversation history, through the answer cache when enabled."""
+        if self.answer_cache is not None:
+            vector = await self.answer_cache.aembed(query)
+            answer = await self.answer_cache.alookup(query, self.knowledge_base.version, vector)
+            if answer is not None:
+                return {"input": query, "chat_history": [], "context": [], "answer": answer}
+        
+        response = await self.rag_chain.ainvoke({"input": query, "chat_history": []})
         
+        if self.answer_cache is not None:
+            await self.answer_cache.astore(query, response["answer"], self.knowledge_base.version, vector)
         return response
     
+    async def astream_batch_answers(self, queries: List[str], max_concurrency: int
+                                    ) -> AsyncIterator[Tuple[int, Union[str, Exception], Optional[List[str]]]]:
+        """
+        Answer independent questions, without conversation history, as one batch.
+        
+        Identical questions are answered once and cached answers are yielded first.
+        The rest go through the chain's batch invocation with at most
+        max_concurrency in flight. Nothing is recorded in any session.
+        
+        Yields:
+            (index, answer, queries) as each answer is ready; the answer is the
+            exception raised if that question failed. queries are the answer's
+            Scryfall queries in single-pass mode, else None
+        """
+        positions: Dict[str, List[int]] = {}
+        for index, query in enumerate(queries):
+            positions.setdefault(self._question_key(query), []).append(index)
+        
+        groups = list(positions.values())
+        cached = [(None, None)] * len(groups)
+        if self.answer_cache is not None:
+            limit = asyncio.Semaphore(max_concurrency)
+            
+            async def lookup(query):
+                async with limit:
+                    vector = await self.answer_cache.aembed(query)
+                    return await self.answer_cache.alookup(query, self.knowledge_base.version, vector), vector
+            
+            cached = await asyncio.gather(*(lookup(queries[indexes[0]]) for indexes in groups))
+        
+        pending = []
+        vectors = []
+        for indexes, (answer, vector) in zip(groups, cached):
+            if answer is None:
+                pending.append(indexes)
+                vectors.append(vector)
+                continue
+            for index in indexes:
+                yield index, answer, None
+        
+        inputs = [{"input": queries[indexes[0]], "chat_history": []} for indexes in pending]
+        async for position, response in self.rag_chain.abatch_as_completed(
+            inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True
+        ):
+            answer, search_queries = response, None
+            if not isinstance(response, Exception):
+                answer, search_queries = response["answer"], response.get("queries")
+                if self.answer_cache is not None:
+                    await self.answer_cache.astore(
+                        inputs[position]["input"], answer, self.knowledge_base.version, vectors[position]
+                    )
+            for index in pending[position]:
+                yield index, answer, search_queries
+    
+    async def astream_answer(self, input_data: Dict[str, Any]) -> AsyncIterator[str]:
+        """Stream the answer to a user query token by token."""
+        query = input_data.get("query")
+        session_id = input_data.get("session_id", "default_session")
+        
+        if not await self._ais_first_turn(session_id):
+            async for chunk in self.chain.astream(
+                {"input": query},
+                {"configurable": {"session_id": session_id}}
+            ):
+                # The retrieval chain also emits the input and retrieved context
+                if "answer" in chunk:
+                    yield chunk["answer"]
+            return
+        
+        # Nothing to contextualize on a first turn, so the history wrapper is bypassed
+        if self.answer_cache is not None:
+            vector = await self.answer_cache.aembed(query)
+            answer = await self.answer_cache.alookup(query, self.knowledge_base.version, vector)
+            if answer is not None:
+                await self._arecord_turn(session_id, query, answer)
+                yield answer
+                return
+        
+        answer_parts = []
+        async for chunk in self.rag_chain.astream({"input": query, "chat_history": []}):
+            if "answer" in chunk:
+                answer_parts.append(chunk["answer"])
+                yield chunk["answer"]
+        
+        answer = "".join(answer_parts)
+        await self._arecord_turn(session_id, query, answer)
+        if self.answer_cache is not None:
+            await self.answer_cache.astore(query, answer, self.knowledge_base.version, vector)
+    
+    @staticmethod
+    def _format_context(inputs: Dict[str, Any]) -> str:
+        """Retrieved documents as prompt context, as the stuff documents chain formats them."""
+        return "\n\n".join(doc.page_content for doc in inputs["context"])
+    
+    @staticmethod
+    def _unpack_structured(response: Dict[str, Any]) -> Dict[str, Any]:
+        """Flatten the structured answer into the plain chain's response shape."""
+        structured = response["answer"]
+        if structured is None:
+            raise OutputParserException("Strategist response did not match the structured output schema")
+        return {**response, "answer": structured.answer, "queries": [query for query in structured.queries if query]}
+    
+    @staticmethod
+    def _question_key(query: str) -> str:
+        """Questions differing only in case and spacing share a key."""
+        return " ".join(query.lower().split())
+    
+    def _is_first_turn(self, session_id: str) -> bool:
+        return not self.get_session_history(session_id).messages
+    
+    def _record_turn(self, session_id: str, query: str, answer: str):
+        """Add a turn answered outside the history wrapper to the session."""
+        self.get_session_history(session_id).add_messages([HumanMessage(content=query), AIMessage(content=answer)])
+    
+    async def _ais_first_turn(self, session_id: str) -> bool:
+        # Session stores may hit SQLite (and an LLM summarizer), so they are used from worker threads
+        history = await asyncio.to_thread(self.get_session_history, session_id)
+        return not await history.aget_messages()
+    
+    async def _arecord_turn(self, session_id: str, query: str, answer: str):
+        """Add a turn answered outside the history wrapper to the session, off the event loop."""
+        history = await asyncio.to_thread(self.get_session_history, session_id)
+        await history.aadd_messages([HumanMessage(content=query), AIMessage(content=answer)])
+    
     def get_session_history(self, session_id: str):
         """Get or create chat history for the session."""
-        if session_id not in self.store:
-            self.store[session_id] = ChatMessageHistory()
-        return self.store[session_id]
+        return self.store.get_history(session_id)
     
     def reset_session(self, session_id: str):
         """Reset the conversation history for a session."""
-        if session_id in self.store:
-            self.store[session_id].clear()
\ No newline at end of file
+        self.store.reset(session_id)
\ No newline at end of file
@@ -1,18 +1,37 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from .routes import advisor_routes
+from services.metrics import REGISTRY, RequestMetricsMiddleware
+from services.scryfall_service import ScryfallService
+from config import WARMUP_ON_STARTUP
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start building the workflow in the background so the app accepts connections immediately."""
+    warm_up = asyncio.create_task(advisor_routes.warm_up()) if WARMUP_ON_STARTUP else None
+    yield
+    if warm_up is not None:
+        # The build thread itself can't be interrupted; this only stops waiting on it
+        warm_up.cancel()
+
 # Create FastAPI app
 app = FastAPI(
     title="MTG Card Advisor API",
     description="API for Magic: The Gathering strategy advice and card recommendations",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Request IDs and per-request timing
+app.add_middleware(RequestMetricsMiddleware)
+
 # Include routers from route modules
 app.include_router(advisor_routes.router, tags=["advisor"])
 
@@ -20,4 +39,20 @@ app.include_router(advisor_routes.router, tags=["advisor"])
 @app.get("/health", tags=["system"])
 async def health_check():
     """System health check endpoint."""
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/ready", tags=["system"])
+async def readiness_check():
+    """Readiness probe: 200 once the workflow is built, 503 while warming up or if warm-up failed."""
+    status = advisor_routes.readiness()
+    return JSONResponse(status, status_code=200 if status["status"] == "ready" else 503)
+
+@app.get("/cache/stats", tags=["system"])
+async def cache_stats():
+    """Scryfall cache hit/miss/eviction counters and occupancy, for sizing the cache."""
+    return {"scryfall": ScryfallService.cache_info()}
+
+@app.get("/metrics", tags=["system"])
+async def metrics():
+    """Node, LLM, retriever and Scryfall timings and counters in Prometheus text format."""
+    return Response(REGISTRY.render(), media_type=REGISTRY.CONTENT_TYPE)
\ No newline at end of file
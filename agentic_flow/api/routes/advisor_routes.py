@@ -1,76 +1,229 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-from workflows.advisor_workflow import CardAdvisorWorkflow
-from config import GOOGLE_API_KEY
+from typing import TYPE_CHECKING, AsyncIterator, List, Dict, Any, Optional, Tuple
+import asyncio
+import base64
+import logging
+import threading
+import time
+import orjson
+from services.admission import AdmissionController, Overloaded
+from services.deadline import DeadlineExceeded, deadline
+from services.deck_analysis import analyze_deck, format_deck_summary, parse_decklist
+from services.scryfall_service import AsyncScryfallService
+from utils.response_formatters import format_ndjson_line, format_sse_event, group_card_results
+from config import (
+    GOOGLE_API_KEY, BATCH_CONCURRENCY, BATCH_MAX_MESSAGES, QUERY_MAX_CONCURRENCY, QUERY_MAX_QUEUE,
+    QUERY_QUEUE_TIMEOUT, QUERY_DEADLINE
+)
+
+# The workflow pulls in the LLM, LangGraph and vector store stacks, so it is
+# imported only when first built
+if TYPE_CHECKING:
+    from workflows.advisor_workflow import CardAdvisorWorkflow
+
+logger = logging.getLogger(__name__)
 
 # Create router
 router = APIRouter()
 
 # Initialize workflow (lazy initialization to avoid startup penalty)
 _workflow = None
+_workflow_lock = threading.Lock()
+_warm_up_error: Optional[Exception] = None
+
+# Sheds /api/query load past what the LLM and Scryfall can serve in time
+query_admission = AdmissionController("/api/query", QUERY_MAX_CONCURRENCY, QUERY_MAX_QUEUE, QUERY_QUEUE_TIMEOUT)
 
-def get_workflow():
-    """Dependency to get the workflow instance."""
+async def admit_query() -> AsyncIterator[None]:
+    """
+    Dependency holding an /api/query admission slot and the request deadline.
+    
+    Declared ahead of get_workflow, so overloaded requests are shed before they
+    take a threadpool slot or wait on the warm-up.
+    """
+    with deadline(QUERY_DEADLINE):
+        try:
+            async with query_admission.admit():
+                yield
+        except Overloaded as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail,
+                                headers={"Retry-After": str(e.retry_after)})
+
+def get_workflow() -> "CardAdvisorWorkflow":
+    """Dependency to get the workflow instance, building it on first use."""
     global _workflow
     if _workflow is None:
-        _workflow = CardAdvisorWorkflow(api_key=GOOGLE_API_KEY)
+        # Concurrent first requests (and the warm-up) wait for a single build
+        with _workflow_lock:
+            if _workflow is None:
+                from workflows.advisor_workflow import CardAdvisorWorkflow
+                _workflow = CardAdvisorWorkflow(api_key=GOOGLE_API_KEY)
     return _workflow
 
+async def warm_up():
+    """Build the workflow and card index in worker threads, so the first request doesn't pay for them."""
+    global _warm_up_error
+    start = time.perf_counter()
+    try:
+        # The card index first: /ready reports ready once the workflow exists
+        await asyncio.to_thread(AsyncScryfallService.load_local_store)
+        await asyncio.to_thread(get_workflow)
+    except Exception as e:
+        _warm_up_error = e
+        logger.exception("Workflow warm-up failed")
+        return
+    _warm_up_error = None
+    logger.info(f"Workflow warm-up finished in {time.perf_counter() - start:.1f}s")
+
+def readiness() -> Dict[str, Any]:
+    """Whether the workflow is built and requests can be served without waiting on it."""
+    if _workflow is not None:
+        return {"status": "ready"}
+    if _warm_up_error is not None:
+        return {"status": "failed", "detail": str(_warm_up_error)}
+    return {"status": "warming_up"}
+
 # Define request/response models
 class QueryRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
 
+class BatchQueryRequest(BaseModel):
+    messages: List[str]
+    concurrency: Optional[int] = None
+
 class ResetRequest(BaseModel):
     session_id: str
 
+class DeckAnalysisRequest(BaseModel):
+    decklist: str
+    message: Optional[str] = None
+    session_id: Optional[str] = None
+
 class CardResponse(BaseModel):
+    """Mirrors services.card.Card."""
+    id: str
+    oracle_id: str
     name: str
     mana_cost: str
+    cmc: float
     type_line: str
     oracle_text: str
-    image_uri: str
-    scryfall_uri: str
+    colors: List[str]
+    color_identity: List[str]
+    keywords: List[str]
+    power: Optional[str]
+    toughness: Optional[str]
     rarity: str
     set_name: str
+    released_at: str
+    layout: str
+    image_uri: str
+    scryfall_uri: str
+    edhrec_rank: Optional[int]
+    legal: List[str]
+    banned: List[str]
+
+class QueryCardsResponse(BaseModel):
+    query: str
+    cards: List[CardResponse]
 
 class QueryResponse(BaseModel):
     answer: str
     session_id: str
     queries: List[str]
-    cards: List[CardResponse]
+    cards: List[QueryCardsResponse]
+    partial: bool = False
 
 # Define endpoints
 @router.post("/api/query", response_model=QueryResponse)
 async def process_query(
     request: QueryRequest,
-    workflow: CardAdvisorWorkflow = Depends(get_workflow)
+    _: None = Depends(admit_query),
+    workflow: "CardAdvisorWorkflow" = Depends(get_workflow)
 ):
-    """Process a user query about MTG strategy and card suggestions."""
+    """
+    Process a user query about MTG strategy and card suggestions.
+    
+    Requests past the admission limits get 429 (queue full) or 503 (timed out
+    waiting), with Retry-After. Each request has QUERY_DEADLINE seconds: if the
+    card search misses it the strategy is returned alone with "partial" set, and
+    if the strategy misses it the request fails with 504.
+    """
     session_id = request.session_id or "default_session"
     
     try:
-        result = workflow.process_query(request.message, session_id)
-        
-        # In a production implementation, workflow.process_query would return
-        # structured data that could be directly mapped to QueryResponse
-        # This is a simplified version that assumes text parsing
+        result = await workflow.arun_query(request.message, session_id)
         
-        # For now, we're returning a simplified response
-        return {
-            "answer": result,
+        # Cards are serialized straight from their records, skipping response model validation
+        return _json_response({
+            "answer": result["answer"],
             "session_id": session_id,
-            "queries": [],  # In production, these would be extracted from the result
-            "cards": []     # In production, these would be extracted from the result
-        }
+            "queries": result["queries"],
+            "cards": group_card_results(result["cards"]),
+            "partial": result["partial"]
+        })
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail=f"Query not answered within {QUERY_DEADLINE:g}s")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+@router.post("/api/query/stream")
+async def stream_query(
+    request: QueryRequest,
+    workflow: "CardAdvisorWorkflow" = Depends(get_workflow)
+):
+    """Process a user query, streaming the answer and card results as server-sent events."""
+    session_id = request.session_id or "default_session"
+    
+    async def event_stream():
+        try:
+            async for event, data in workflow.astream_query(request.message, session_id):
+                yield format_sse_event(event, data)
+        except Exception as e:
+            # Headers are already sent, so errors are reported in-band
+            yield format_sse_event("error", {"detail": f"Error processing query: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/api/batch-query")
+async def batch_query(
+    request: BatchQueryRequest,
+    workflow: "CardAdvisorWorkflow" = Depends(get_workflow)
+):
+    """
+    Answer many independent messages, streaming results as NDJSON.
+    
+    Each line is one message's result as it completes, in completion order; its
+    "index" gives the message's position in the request. Concurrency is capped at
+    BATCH_CONCURRENCY.
+    """
+    if not request.messages:
+        raise HTTPException(status_code=400, detail="No messages given")
+    if len(request.messages) > BATCH_MAX_MESSAGES:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_MESSAGES} messages per batch")
+    concurrency = max(1, min(request.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY))
+    
+    async def result_stream():
+        try:
+            async for result in workflow.aprocess_batch(request.messages, concurrency):
+                yield format_ndjson_line(result)
+        except Exception as e:
+            # Headers are already sent, so errors are reported in-band
+            yield format_ndjson_line({"error": f"Error processing batch: {str(e)}"})
+    
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
 @router.post("/api/reset")
 async def reset_session(
     request: ResetRequest,
-    workflow: CardAdvisorWorkflow = Depends(get_workflow)
+    workflow: "CardAdvisorWorkflow" = Depends(get_workflow)
 ):
     """Reset a conversation session."""
     try:
@@ -79,17 +232,70 @@ async def reset_session(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error resetting session: {str(e)}")
 
+@router.post("/api/deck/analyze")
+async def analyze_decklist(
+    request: DeckAnalysisRequest,
+    workflow: "CardAdvisorWorkflow" = Depends(get_workflow)
+):
+    """
+    Resolve a decklist's cards and compute its statistics.
+    
+    With a message, the strategist also answers it using the deck statistics as context.
+    """
+    entries = parse_decklist(request.decklist)
+    if not entries:
+        raise HTTPException(status_code=400, detail="No cards found in decklist")
+    
+    try:
+        cards = await AsyncScryfallService.get_cards([{"name": entry.name} for entry in entries])
+        stats = analyze_deck(entries, cards)
+        response = {"stats": stats, "summary": format_deck_summary(stats)}
+        
+        if request.message:
+            session_id = request.session_id or "default_session"
+            message = f"{response['summary']}\n\n{request.message}"
+            response.update(answer=await workflow.aprocess_query(message, session_id), session_id=session_id)
+        return response
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing deck: {str(e)}")
+
 # Advanced endpoint for direct Scryfall queries (optional)
 @router.post("/api/advanced-search")
 async def advanced_search(
     query: str,
     limit: int = 10,
-    workflow: CardAdvisorWorkflow = Depends(get_workflow)
+    cursor: Optional[str] = None,
+    workflow: "CardAdvisorWorkflow" = Depends(get_workflow)
 ):
-    """Perform a direct Scryfall search using the provided query."""
+    """
+    Perform a direct Scryfall search using the provided query.
+    
+    Results are paginated: pass the returned next_cursor to get the following
+    cards. next_cursor is null once the results are exhausted.
+    """
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    page, offset = _decode_cursor(cursor) if cursor else (1, 0)
+    
     try:
-        # This would use the query agent's fetch_cards method directly
-        cards = workflow.query_agent.fetch_cards([query], max_cards_per_query=limit)
-        return {"cards": cards}
+        cards, position = await workflow.query_agent.afetch_page(query, limit=limit, page=page, offset=offset)
+        return _json_response({"cards": cards, "next_cursor": _encode_cursor(position) if position else None})
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error searching cards: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error searching cards: {str(e)}")
+
+def _json_response(content: Dict[str, Any]) -> Response:
+    return Response(orjson.dumps(content), media_type="application/json")
+
+def _encode_cursor(position: Tuple[int, int]) -> str:
+    """Opaque cursor for a (page, offset) position in a search's results."""
+    return base64.urlsafe_b64encode(f"{position[0]}:{position[1]}".encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        page, offset = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split(":")
+        page, offset = int(page), int(offset)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if page < 1 or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return page, offset
@@ -0,0 +1,106 @@
+"""
+Concurrent throughput of /api/query: blocking workflow path vs. async path.
+
+Runs the FastAPI app in-process on a single event loop (like one uvicorn
+worker) with fake LLM, embedding and Scryfall backends, fires requests at a
+fixed concurrency, and probes /health while the load runs.
+
+Usage (from agentic_flow/):
+    python -m benchmarks.concurrency --requests 40 --concurrency 10
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.fakes import add_backend_arguments, setup_backends
+from benchmarks.results import percentile, write_results
+
+
+async def run_load(client, path, total, concurrency, message=lambda i: "Red aggro ideas?"):
+    """Send `total` requests with at most `concurrency` in flight; return per-request latencies."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(path, json={"message": message(i), "session_id": f"bench-{i}"})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies
+
+
+async def probe_health(client, stop, interval=0.05):
+    """
+    Measure /health latency until `stop` is set.
+
+    Latency is taken from when the probe was due, so time spent waiting for a
+    blocked event loop to schedule it is included.
+    """
+    latencies = []
+    while not stop.is_set():
+        due = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        await client.get("/health")
+        latencies.append(time.perf_counter() - due)
+    return latencies
+
+
+async def benchmark(mode, total, concurrency):
+    """Run one load test against either the blocking or the async query path."""
+    import httpx
+    from api.app import app
+    from api.routes.advisor_routes import QueryRequest, get_workflow
+
+    if mode == "blocking" and not any(route.path == "/bench/blocking-query" for route in app.routes):
+        # The handler as it was before the async path: a sync workflow call inside an async route
+        @app.post("/bench/blocking-query")
+        async def blocking_query(request: QueryRequest):
+            return {"answer": get_workflow().process_query(request.message, request.session_id)}
+
+    path = "/bench/blocking-query" if mode == "blocking" else "/api/query"
+    get_workflow()  # build outside the timed section
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        stop = asyncio.Event()
+        probe = asyncio.create_task(probe_health(client, stop))
+        start = time.perf_counter()
+        latencies = await run_load(client, path, total, concurrency)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        health = await probe
+
+    return {
+        "mode": mode,
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "latency_p50_s": round(statistics.median(latencies), 3),
+        "latency_p95_s": round(percentile(latencies, 95), 3),
+        "health_max_s": round(max(health), 3) if health else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Blocking vs. async /api/query throughput")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=10)
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    server = setup_backends(args)
+    try:
+        results = [asyncio.run(benchmark(mode, args.requests, args.concurrency)) for mode in ("blocking", "async")]
+    finally:
+        if server:
+            server.stop()
+    write_results("concurrency", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
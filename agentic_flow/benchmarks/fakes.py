@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import tempfile
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import httpx
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from services.routing import RULES, classify_message
+
+FAKE_STRATEGY = (
+    "1. Strategic Analysis: Aggressive red decks want cheap creatures with haste.\n"
+    "2. Parameter-Based Card Suggestions: Red creatures with mana value 2 or less, "
+    "instants that deal damage, and creatures with haste."
+)
+FAKE_QUERIES = '["c:r t:creature mv<=2", "c:r t:instant o:damage", "c:r kw:haste"]'
+FAKE_RULES_ANSWER = (
+    "Spells and abilities go on the stack and resolve last in, first out; each player "
+    "gets priority to respond before the top object resolves."
+)
+
+# Variants whose text depends on the prompt, so distinct questions miss every cache
+VARYING_STRATEGY = FAKE_STRATEGY + " (ref {seed})"
+VARYING_QUERIES = '["c:r t:creature mv<=2 o:{seed}", "c:r t:instant o:damage o:{seed}", "c:r kw:haste o:{seed}"]'
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic chat model simulating a remote LLM.
+
+    The first token arrives after `latency` seconds and the rest at `token_rate`
+    tokens per second (whitespace-separated words count as tokens). A "{seed}"
+    placeholder in the response is replaced by a digest of the last message.
+    With `rules_response` set, messages read as rules questions get that instead.
+    Structured output fills `answer` with the response and `queries` with
+    `structured_queries` (a JSON array; empty for rules answers).
+    """
+
+    response: str = FAKE_STRATEGY
+    rules_response: Optional[str] = None
+    structured_queries: str = "[]"
+    latency: float = 0.5
+    token_rate: Optional[float] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep(self.latency + self._generation_time(len(tokens)))
+        return self._result(tokens)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self.latency + self._generation_time(len(tokens)))
+        return self._result(tokens)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for i, token in enumerate(self._tokens(messages)):
+            if i:
+                time.sleep(self._generation_time(1))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for i, token in enumerate(self._tokens(messages)):
+            if i:
+                await asyncio.sleep(self._generation_time(1))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> RunnableLambda:
+        def build(messages: List[BaseMessage], message: BaseMessage):
+            rules = self.rules_response is not None and message.content == self.rules_response
+            queries = [] if rules else json.loads(self._seeded(self.structured_queries, messages))
+            return schema(answer=message.content, queries=queries)
+
+        def respond(prompt):
+            messages = prompt.to_messages()
+            return build(messages, self.invoke(messages))
+
+        async def arespond(prompt):
+            messages = prompt.to_messages()
+            return build(messages, await self.ainvoke(messages))
+
+        return RunnableLambda(respond, afunc=arespond)
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        """Split the (seeded) response into tokens that concatenate back to it."""
+        text = self.response
+        if self.rules_response and messages and classify_message(str(messages[-1].content)) == RULES:
+            text = self.rules_response
+        text = self._seeded(text, messages)
+        words = text.split(" ")
+        return [word + " " for word in words[:-1]] + [words[-1]]
+
+    @staticmethod
+    def _seeded(text: str, messages: List[BaseMessage]) -> str:
+        if "{seed}" in text:
+            seed = hashlib.sha256(str(messages[-1].content).encode()).hexdigest()[:8] if messages else "0"
+            text = text.replace("{seed}", seed)
+        return text
+
+    def _generation_time(self, tokens: int) -> float:
+        return tokens / self.token_rate if self.token_rate else 0.0
+
+    @staticmethod
+    def _result(tokens: List[str]) -> ChatResult:
+        text = "".join(tokens)
+        message = AIMessage(
+            content=text,
+            usage_metadata={"input_tokens": 0, "output_tokens": len(tokens), "total_tokens": len(tokens)}
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class FakeEmbeddings(DeterministicFakeEmbedding):
+    """Deterministic embeddings with a simulated per-call delay."""
+
+    latency: float = 0.0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        return super().embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return super().embed_query(text)
+
+
+def install_fakes(llm_latency: float = 0.5, scryfall_latency: float = 0.1, token_rate: Optional[float] = None,
+                  embedding_latency: float = 0.0, scryfall_url: Optional[str] = None,
+                  scryfall_rate_limit: Optional[float] = None, vary_responses: bool = False) -> str:
+    """
+    Route LLM, embedding and Scryfall traffic to offline fakes.
+
+    Must be called before the workflow is built. The knowledge base is indexed
+    into a temporary directory so the real persisted index is left untouched.
+
+    Args:
+        llm_latency: Seconds before a fake LLM's first token
+        scryfall_latency: Seconds per in-process fake Scryfall call (ignored with scryfall_url)
+        token_rate: Fake LLM tokens per second after the first; None for instant
+        embedding_latency: Seconds per fake embedding call
+        scryfall_url: Send Scryfall traffic to this server (e.g. a StubScryfallServer)
+            instead of answering in-process
+        scryfall_rate_limit: Override the Scryfall requests-per-second limit
+        vary_responses: Derive fake LLM output from the prompt, so distinct questions
+            produce distinct strategies and queries
+
+    Returns:
+        The temporary knowledge base index directory
+    """
+    import services.knowledge_service as knowledge_service
+    from agents.base_agent import Agent
+    from agents.query_agent import QueryAgent
+    from services.rate_limiter import TokenBucket
+    from services.scryfall_service import AsyncScryfallService, ScryfallService
+
+    strategy = VARYING_STRATEGY if vary_responses else FAKE_STRATEGY
+    queries = VARYING_QUERIES if vary_responses else FAKE_QUERIES
+
+    def init_llm(agent):
+        if isinstance(agent, QueryAgent):
+            return FakeChatModel(response=queries, latency=llm_latency, token_rate=token_rate)
+        return FakeChatModel(response=strategy, rules_response=FAKE_RULES_ANSWER, structured_queries=queries,
+                             latency=llm_latency, token_rate=token_rate)
+
+    async def fake_get(path, params=None):
+        await asyncio.sleep(scryfall_latency)
+        query = (params or {}).get("q", "")
+        cards = [
+            {"name": f"{query} #{i}", "mana_cost": "{R}", "type_line": "Creature", "oracle_text": ""}
+            for i in range(10)
+        ]
+        return httpx.Response(200, json={"data": cards}, request=httpx.Request("GET", path))
+
+    index_dir = tempfile.mkdtemp(prefix="urza-bench-index-")
+    Agent._init_llm = init_llm
+    knowledge_service.GoogleGenerativeAIEmbeddings = (
+        lambda **kwargs: FakeEmbeddings(size=64, latency=embedding_latency)
+    )
+    knowledge_service.KNOWLEDGE_INDEX_DIR = index_dir
+    if scryfall_url:
+        AsyncScryfallService.BASE_URL = ScryfallService.BASE_URL = scryfall_url
+    else:
+        AsyncScryfallService._get = staticmethod(fake_get)
+    if scryfall_rate_limit:
+        AsyncScryfallService._rate_limiter = TokenBucket(rate=scryfall_rate_limit, capacity=scryfall_rate_limit)
+    return index_dir
+
+
+def add_backend_arguments(parser: argparse.ArgumentParser):
+    """Command-line options shared by the benchmarks for configuring the fakes."""
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds to a fake LLM's first token")
+    parser.add_argument("--token-rate", type=float, default=None, help="Fake LLM tokens per second")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Seconds per fake embedding call")
+    parser.add_argument("--scryfall-latency", type=float, default=0.1, help="Seconds per fake Scryfall call")
+    parser.add_argument("--scryfall-rate-limit", type=float, default=None,
+                        help="Override the Scryfall requests-per-second limit")
+    parser.add_argument("--stub-server", action="store_true",
+                        help="Serve Scryfall from a local HTTP stub instead of in-process")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+
+
+def setup_backends(args: argparse.Namespace, vary_responses: bool = False):
+    """
+    Install the fakes described by parsed command-line options.
+
+    Returns:
+        The running StubScryfallServer when --stub-server is given, else None
+    """
+    server = None
+    if args.stub_server:
+        from benchmarks.stub_scryfall import StubScryfallServer
+        server = StubScryfallServer(latency=args.scryfall_latency).start()
+    install_fakes(
+        llm_latency=args.llm_latency,
+        scryfall_latency=args.scryfall_latency,
+        token_rate=args.token_rate,
+        embedding_latency=args.embedding_latency,
+        scryfall_url=server.url if server else None,
+        scryfall_rate_limit=args.scryfall_rate_limit,
+        vary_responses=vary_responses,
+    )
+    return server
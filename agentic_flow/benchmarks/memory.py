@@ -0,0 +1,80 @@
+"""
+Memory growth of the workflow over many conversation sessions.
+
+Runs one or more turns in each of many distinct sessions and records traced
+Python heap size and process peak RSS at regular checkpoints. Steady growth
+per session points at state that is never evicted.
+
+Usage (from agentic_flow/):
+    python -m benchmarks.memory --sessions 2000 --turns 2 --llm-latency 0 --scryfall-latency 0 --scryfall-rate-limit 1000
+"""
+import argparse
+import asyncio
+import gc
+import resource
+import sys
+import time
+import tracemalloc
+
+from benchmarks.fakes import add_backend_arguments, setup_backends
+from benchmarks.results import write_results
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def run_sessions(workflow, sessions, turns, checkpoint, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def conversation(i):
+        async with semaphore:
+            for turn in range(turns):
+                await workflow.aprocess_query(f"Deck idea {i}, follow-up {turn}?", f"memory-{i}")
+
+    checkpoints = []
+    tracemalloc.start()
+    start = time.perf_counter()
+    for done in range(0, sessions, checkpoint):
+        batch = range(done, min(done + checkpoint, sessions))
+        await asyncio.gather(*(conversation(i) for i in batch))
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+        checkpoints.append({
+            "sessions": batch.stop,
+            "elapsed_s": round(time.perf_counter() - start, 2),
+            "traced_mb": round(current / (1024 * 1024), 2),
+            "peak_rss_mb": _peak_rss_mb(),
+            "session_store": workflow.strategist.store.info(),
+        })
+    tracemalloc.stop()
+
+    first, last = checkpoints[0], checkpoints[-1]
+    growth = (last["traced_mb"] - first["traced_mb"]) / max(1, last["sessions"] - first["sessions"])
+    return {"checkpoints": checkpoints, "traced_kb_per_session": round(growth * 1024, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory growth over many sessions")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=1, help="Turns per session")
+    parser.add_argument("--checkpoint", type=int, default=100, help="Sessions between measurements")
+    parser.add_argument("--concurrency", type=int, default=10)
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    server = setup_backends(args, vary_responses=True)
+    try:
+        from workflows.advisor_workflow import CardAdvisorWorkflow
+        workflow = CardAdvisorWorkflow()
+        results = asyncio.run(run_sessions(workflow, args.sessions, args.turns, args.checkpoint, args.concurrency))
+    finally:
+        if server:
+            server.stop()
+    write_results("memory", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
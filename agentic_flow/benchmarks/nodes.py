@@ -0,0 +1,76 @@
+"""
+Per-node latency of CardAdvisorWorkflow (strategist, card_fetcher, response_builder).
+
+Streams graph updates and times each node from the previous node's completion,
+with fake LLM, embedding and Scryfall backends. Questions are distinct per
+iteration so caches only help where the workflow itself repeats work. Every
+`--rules-every`th question is a rules question, and end-to-end latency is also
+reported per path ("total.cards", "total.rules") to show what skipping the card
+search saves.
+
+Usage (from agentic_flow/):
+    python -m benchmarks.nodes --iterations 20 --output nodes.json
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+
+from benchmarks.fakes import add_backend_arguments, setup_backends
+from benchmarks.results import summarize, write_results
+
+
+async def time_nodes(workflow, iterations, rules_every=0):
+    """Run the graph `iterations` times; return per-node, end-to-end and per-path latencies."""
+    from langchain_core.messages import HumanMessage
+
+    timings = defaultdict(list)
+    for i in range(iterations):
+        if rules_every and i % rules_every == rules_every - 1:
+            message = f"How does the stack work when a trigger resolves, variant {i}?"
+        else:
+            message = f"Ideas for a red aggro deck, variant {i}?"
+        state = {
+            "messages": [HumanMessage(content=message)],
+            "strategy": None,
+            "queries": None,
+            "cards": None,
+            "route": None,
+            "partial": False,
+            "session_id": f"nodes-{i}",
+        }
+        route = None
+        start = previous = time.perf_counter()
+        async for update in workflow.workflow.astream(state, stream_mode="updates"):
+            now = time.perf_counter()
+            for node, values in update.items():
+                timings[node].append(now - previous)
+                route = (values or {}).get("route", route)
+            previous = now
+        total = time.perf_counter() - start
+        timings["total"].append(total)
+        timings[f"total.{route}"].append(total)
+    return {node: summarize(values) for node, values in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-node workflow latency")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--rules-every", type=int, default=2,
+                        help="Make every Nth question a rules question; 0 for none")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    server = setup_backends(args, vary_responses=True)
+    try:
+        from workflows.advisor_workflow import CardAdvisorWorkflow
+        workflow = CardAdvisorWorkflow()
+        results = asyncio.run(time_nodes(workflow, args.iterations, args.rules_every))
+    finally:
+        if server:
+            server.stop()
+    write_results("nodes", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
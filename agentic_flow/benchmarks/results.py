@@ -0,0 +1,50 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from typing import Any, Dict, List, Optional
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Latency summary in seconds."""
+    return {
+        "count": len(values),
+        "mean_s": round(statistics.fmean(values), 4),
+        "p50_s": round(percentile(values, 50), 4),
+        "p95_s": round(percentile(values, 95), 4),
+        "max_s": round(max(values), 4),
+    }
+
+
+def git_revision() -> Optional[str]:
+    """Commit the benchmark ran against, so results can be compared across commits."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(benchmark: str, params: Dict[str, Any], results: Any, output: Optional[str] = None) -> Dict[str, Any]:
+    """Print the results as JSON, also writing them to `output` when given."""
+    report = {
+        "benchmark": benchmark,
+        "commit": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "params": params,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    return report
@@ -0,0 +1,92 @@
+"""
+Cold-start cost of the API: time to import the app, time until /ready, and
+latency of the first /api/query, with and without background warm-up.
+
+Every run happens in a fresh interpreter so imports are cold. Backends are the
+usual fakes; the knowledge base is indexed from scratch into a temporary
+directory on each run.
+
+Usage (from agentic_flow/):
+    python -m benchmarks.startup --runs 3 --output startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.results import summarize, write_results
+
+RESULT_PREFIX = "STARTUP_RESULT "
+MODES = {"lazy": "false", "warmup": "true"}
+
+
+def measure(args) -> dict:
+    """One cold start in this process; WARMUP_ON_STARTUP is set by the parent."""
+    start = time.perf_counter()
+    from api.app import app
+    import_s = time.perf_counter() - start
+
+    # Fakes are installed after the timed import, but before anything builds the workflow
+    from benchmarks.fakes import setup_backends
+    from fastapi.testclient import TestClient
+    server = setup_backends(args)
+    try:
+        with TestClient(app) as client:
+            started = time.perf_counter()
+            ready_s = None
+            if args.child == "warmup":
+                while client.get("/ready").status_code != 200:
+                    time.sleep(0.05)
+                ready_s = time.perf_counter() - started
+            request_start = time.perf_counter()
+            response = client.post("/api/query", json={"message": "Ideas for a red aggro deck?"})
+            response.raise_for_status()
+            first_request_s = time.perf_counter() - request_start
+    finally:
+        if server:
+            server.stop()
+    return {"import_s": import_s, "ready_s": ready_s, "first_request_s": first_request_s}
+
+
+def run_cold(mode: str, argv) -> dict:
+    """Run `measure` in a fresh interpreter and return its result."""
+    env = {**os.environ, "WARMUP_ON_STARTUP": MODES[mode]}
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", *argv, "--child", mode],
+        env=env, capture_output=True, text=True, check=True
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"No result from {mode} run:\n{completed.stderr[-2000:]}")
+
+
+def main():
+    from benchmarks.fakes import add_backend_arguments
+
+    parser = argparse.ArgumentParser(description="API cold-start cost")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", choices=sorted(MODES), help=argparse.SUPPRESS)
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    if args.child:
+        print(RESULT_PREFIX + json.dumps(measure(args)), flush=True)
+        return
+
+    argv = [arg for arg in sys.argv[1:] if arg != "--output" and arg != args.output]
+    results = {}
+    for mode in MODES:
+        runs = [run_cold(mode, argv) for _ in range(args.runs)]
+        results[mode] = {
+            metric: summarize([run[metric] for run in runs])
+            for metric in ("import_s", "ready_s", "first_request_s")
+            if runs[0][metric] is not None
+        }
+    write_results("startup", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Local HTTP server imitating the parts of the Scryfall API the advisor uses.
+
+Cards are generated deterministically from the request, so repeated runs see
+identical payloads. Every request is delayed by a configurable latency.
+
+Usage (from agentic_flow/):
+    python -m benchmarks.stub_scryfall --port 8765 --latency 0.1
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+COLORS = ["W", "U", "B", "R", "G"]
+TYPES = ["Creature — Goblin Warrior", "Instant", "Sorcery", "Enchantment", "Artifact", "Creature — Elf Druid"]
+
+
+def make_card(seed: str) -> Dict[str, Any]:
+    """Build a Scryfall-shaped card whose fields are derived from the seed."""
+    digest = hashlib.sha256(seed.encode()).digest()
+    color = COLORS[digest[0] % len(COLORS)]
+    mana_value = digest[1] % 6 + 1
+    type_line = TYPES[digest[2] % len(TYPES)]
+    card_id = hashlib.sha256(f"id:{seed}".encode()).hexdigest()
+    card = {
+        "object": "card",
+        "id": f"{card_id[:8]}-{card_id[8:12]}-{card_id[12:16]}-{card_id[16:20]}-{card_id[20:32]}",
+        "oracle_id": hashlib.sha256(f"oracle:{seed}".encode()).hexdigest()[:32],
+        "name": f"Stub Card {digest.hex()[:8]}",
+        "mana_cost": "{" + str(mana_value - 1) + "}{" + color + "}" if mana_value > 1 else "{" + color + "}",
+        "cmc": float(mana_value),
+        "type_line": type_line,
+        "oracle_text": f"When this enters, it deals {digest[3] % 4 + 1} damage to any target.",
+        "colors": [color],
+        "color_identity": [color],
+        "keywords": ["Haste"] if digest[4] % 2 else [],
+        "rarity": ["common", "uncommon", "rare", "mythic"][digest[5] % 4],
+        "edhrec_rank": int.from_bytes(digest[6:9], "big") % 30000 + 1,
+        "legalities": {"standard": "not_legal", "modern": "legal", "commander": "legal"},
+        "prices": {"usd": f"{digest[9] / 10:.2f}"},
+    }
+    if type_line.startswith("Creature"):
+        card["power"] = str(digest[10] % 5 + 1)
+        card["toughness"] = str(digest[11] % 5 + 1)
+    return card
+
+
+class StubScryfallHandler(BaseHTTPRequestHandler):
+    """Serves /cards/search, /cards/named, /cards/collection and /cards/:id."""
+
+    server: "StubScryfallServer"
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/cards/search":
+            self._search(params)
+        elif url.path == "/cards/named":
+            name = params.get("exact") or params.get("fuzzy")
+            if not name:
+                self._send(400, self._error(400, "Missing name"))
+            else:
+                self._send(200, {**make_card(name), "name": name})
+        elif url.path.startswith("/cards/"):
+            self._send(200, {**make_card(url.path), "id": url.path.rsplit("/", 1)[-1]})
+        else:
+            self._send(404, self._error(404, "Not found"))
+
+    def do_POST(self):
+        time.sleep(self.server.latency)
+        if urlparse(self.path).path != "/cards/collection":
+            self._send(404, self._error(404, "Not found"))
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        identifiers = json.loads(self.rfile.read(length) or b"{}").get("identifiers", [])
+        if len(identifiers) > 75:
+            self._send(422, self._error(422, "Too many identifiers"))
+            return
+        cards = []
+        for identifier in identifiers:
+            card = make_card(json.dumps(identifier, sort_keys=True))
+            cards.append({**card, **{key: value for key, value in identifier.items() if key in ("id", "name")}})
+        self._send(200, {"object": "list", "not_found": [], "data": cards})
+
+    def _search(self, params: Dict[str, str]):
+        query = params.get("q", "")
+        if not query or "none" in query.split():
+            self._send(404, self._error(404, "Your query didn't match any cards."))
+            return
+        page = int(params.get("page", 1))
+        total = self.server.cards_per_query
+        page_size = self.server.page_size
+        start = (page - 1) * page_size
+        cards = [make_card(f"{query}:{i}") for i in range(start, min(start + page_size, total))]
+        payload = {"object": "list", "total_cards": total, "has_more": start + page_size < total, "data": cards}
+        if payload["has_more"]:
+            host = f"http://{self.server.server_address[0]}:{self.server.server_address[1]}"
+            next_params = {**params, "page": page + 1}
+            payload["next_page"] = f"{host}/cards/search?" + "&".join(f"{k}={v}" for k, v in next_params.items())
+        self._send(200, payload)
+
+    @staticmethod
+    def _error(status: int, details: str) -> Dict[str, Any]:
+        return {"object": "error", "status": status, "details": details}
+
+    def _send(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubScryfallServer(ThreadingHTTPServer):
+    """Threaded stub server; use as a context manager to run it in the background."""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.1,
+                 cards_per_query: int = 20, page_size: int = 175):
+        """
+        Initialize the server.
+
+        Args:
+            port: Port to listen on; 0 picks a free one
+            latency: Seconds every request is delayed by
+            cards_per_query: Total cards matched by any search
+            page_size: Cards per search page
+        """
+        super().__init__((host, port), StubScryfallHandler)
+        self.latency = latency
+        self.cards_per_query = cards_per_query
+        self.page_size = page_size
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubScryfallServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-scryfall", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "StubScryfallServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Scryfall API server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per request")
+    parser.add_argument("--cards-per-query", type=int, default=20)
+    args = parser.parse_args()
+
+    server = StubScryfallServer(port=args.port, latency=args.latency, cards_per_query=args.cards_per_query)
+    print(f"Stub Scryfall listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
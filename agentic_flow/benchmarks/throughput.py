@@ -0,0 +1,62 @@
+"""
+End-to-end /api/query throughput across a range of concurrency levels.
+
+Runs the FastAPI app in-process with fake backends; each request asks a
+distinct question so responses are not served from the answer caches.
+
+Usage (from agentic_flow/):
+    python -m benchmarks.throughput --levels 1 4 16 --requests 32 --output throughput.json
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.concurrency import run_load
+from benchmarks.fakes import add_backend_arguments, setup_backends
+from benchmarks.results import summarize, write_results
+
+
+async def sweep(levels, total):
+    import httpx
+    from api.app import app
+    from api.routes.advisor_routes import get_workflow
+
+    get_workflow()  # build outside the timed section
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for concurrency in levels:
+            start = time.perf_counter()
+            latencies = await run_load(
+                client, "/api/query", total, concurrency,
+                message=lambda i: f"Red aggro ideas, c{concurrency} #{i}?"
+            )
+            elapsed = time.perf_counter() - start
+            results.append({
+                "concurrency": concurrency,
+                "requests": total,
+                "elapsed_s": round(elapsed, 3),
+                "throughput_rps": round(total / elapsed, 2),
+                "latency": summarize(latencies),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/api/query throughput vs. concurrency")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=32, help="Requests per concurrency level")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    server = setup_backends(args, vary_responses=True)
+    try:
+        results = asyncio.run(sweep(args.levels, args.requests))
+    finally:
+        if server:
+            server.stop()
+    write_results("throughput", vars(args), results, args.output)
+
+
+if __name__ == "__main__":
+    main()
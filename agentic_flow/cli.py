@@ -1,16 +1,40 @@
-from agent import StrategistAgent
 import argparse
 
+def run_knowledge_base_command(action):
+    """Update or rebuild the persisted knowledge base index."""
+    from services.knowledge_service import KnowledgeBaseRetriever
+
+    retriever = KnowledgeBaseRetriever().initialize(update=False)
+    if action == "rebuild":
+        retriever.rebuild()
+    else:
+        retriever.update()
+    print(f"Knowledge base index is up to date (version {retriever.version})")
+
 def main():
     parser = argparse.ArgumentParser(description="Card Game Strategist Agent")
     parser.add_argument("--query", type=str, help="User query")
+    subparsers = parser.add_subparsers(dest="command")
+    kb_parser = subparsers.add_parser("kb", help="Manage the persisted knowledge base index")
+    kb_parser.add_argument(
+        "action",
+        choices=["update", "rebuild"],
+        help="'update' embeds new/changed documents and drops deleted ones; 'rebuild' re-embeds everything"
+    )
     args = parser.parse_args()
-    
+
+    if args.command == "kb":
+        run_knowledge_base_command(args.action)
+        return
+
+    # Only the strategist is loaded; the API stack (FastAPI, workflow, Scryfall) is never imported
+    from agents.strategist_agent import StrategistAgent
     agent = StrategistAgent()
-    
+    session_id = "cli"
+
     if args.query:
         # Process a single query
-        response = agent.process_query(args.query)
+        response = agent.process({"query": args.query, "session_id": session_id})
         print(f"Response: {response['answer']}")
     else:
         # Interactive mode
@@ -20,12 +44,12 @@ def main():
             if query.lower() == "exit":
                 break
             if query.lower() == "reset":
-                agent.reset_conversation()
+                agent.reset_session(session_id)
                 print("Conversation history reset.")
                 continue
-                
-            response = agent.process_query(query)
+
+            response = agent.process({"query": query, "session_id": session_id})
             print(f"\nStrategist: {response['answer']}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -7,11 +7,104 @@ env_path = Path('.') / '.env'
 load_dotenv(dotenv_path=env_path)
 
 # API Keys
+# Checked when a model client is created, so offline tools can import config without one
 GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY environment variable is not set")
 
 # Agent Configuration
 STRATEGIST_MODEL = os.environ.get("STRATEGIST_MODEL", "gemini-1.5-flash-001")
 QUERY_MODEL = os.environ.get("QUERY_MODEL", "gemini-1.5-flash-001")
-KNOWLEDGE_BASE_DIR = os.environ.get("KNOWLEDGE_BASE_DIR", "knowledge_base")
\ No newline at end of file
+# Single-pass mode: the strategist returns its Scryfall queries in a structured response,
+# saving the separate query generation round trip
+STRATEGIST_SINGLE_PASS = os.environ.get("STRATEGIST_SINGLE_PASS", "false").lower() == "true"
+KNOWLEDGE_BASE_DIR = os.environ.get("KNOWLEDGE_BASE_DIR", "knowledge_base")
+# Where the persisted vector index and its manifest are stored
+KNOWLEDGE_INDEX_DIR = os.environ.get("KNOWLEDGE_INDEX_DIR", "knowledge_index")
+# "chroma", or "hybrid" for an in-process NumPy cosine + BM25 index
+KNOWLEDGE_BACKEND = os.environ.get("KNOWLEDGE_BACKEND", "chroma")
+# Weight of embedding similarity in the hybrid score; the rest goes to BM25
+KNOWLEDGE_HYBRID_ALPHA = float(os.environ.get("KNOWLEDGE_HYBRID_ALPHA", "0.5"))
+# Ingestion: processes parsing PDFs (0 = one per CPU), chunks per embedding call,
+# embedding calls in flight, and retries of a failed call
+KNOWLEDGE_INGEST_WORKERS = int(os.environ.get("KNOWLEDGE_INGEST_WORKERS", "0"))
+KNOWLEDGE_EMBED_BATCH_SIZE = int(os.environ.get("KNOWLEDGE_EMBED_BATCH_SIZE", "100"))
+KNOWLEDGE_EMBED_CONCURRENCY = int(os.environ.get("KNOWLEDGE_EMBED_CONCURRENCY", "4"))
+KNOWLEDGE_EMBED_MAX_RETRIES = int(os.environ.get("KNOWLEDGE_EMBED_MAX_RETRIES", "5"))
+
+# Workflow Routing
+# Skip query generation and card search for messages classified as pure rules questions
+ADAPTIVE_ROUTING = os.environ.get("ADAPTIVE_ROUTING", "true").lower() == "true"
+
+# Card Ranking (opt-in)
+# Re-rank over-fetched search results locally by similarity to the strategy and EDHREC rank,
+# keeping the best CARD_RANKING_TOP_N distinct cards across all queries. Costs an embedding
+# call per request; when disabled, each query keeps Scryfall's top 5
+CARD_RANKING_ENABLED = os.environ.get("CARD_RANKING_ENABLED", "false").lower() == "true"
+CARD_RANKING_CANDIDATES = int(os.environ.get("CARD_RANKING_CANDIDATES", "25"))
+CARD_RANKING_TOP_N = int(os.environ.get("CARD_RANKING_TOP_N", "15"))
+CARD_RANKING_EDHREC_WEIGHT = float(os.environ.get("CARD_RANKING_EDHREC_WEIGHT", "0.3"))
+CARD_RANKING_CACHE_SIZE = int(os.environ.get("CARD_RANKING_CACHE_SIZE", "10000"))
+
+# Strategist Answer Cache
+# Opt-in cache of first-turn answers, matched by question embedding similarity
+STRATEGIST_CACHE_ENABLED = os.environ.get("STRATEGIST_CACHE_ENABLED", "false").lower() == "true"
+STRATEGIST_CACHE_THRESHOLD = float(os.environ.get("STRATEGIST_CACHE_THRESHOLD", "0.95"))
+STRATEGIST_CACHE_TTL = float(os.environ.get("STRATEGIST_CACHE_TTL", "86400"))
+STRATEGIST_CACHE_MAX_ENTRIES = int(os.environ.get("STRATEGIST_CACHE_MAX_ENTRIES", "1000"))
+# Concurrent identical first-turn questions share one in-flight answer
+STRATEGIST_SINGLE_FLIGHT = os.environ.get("STRATEGIST_SINGLE_FLIGHT", "true").lower() == "true"
+
+# Retrieval Cache
+# Memoizes follow-up question rewrites and knowledge base search results
+RETRIEVAL_CACHE_ENABLED = os.environ.get("RETRIEVAL_CACHE_ENABLED", "true").lower() == "true"
+RETRIEVAL_CACHE_TTL = float(os.environ.get("RETRIEVAL_CACHE_TTL", "3600"))
+RETRIEVAL_CACHE_MAX_BYTES = int(os.environ.get("RETRIEVAL_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Metrics
+# Collect timing histograms and counters, exported in Prometheus format at /metrics
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+
+# Startup
+# Build the workflow (knowledge base, models) in the background when the API starts,
+# instead of inside the first request; /ready reports when it is done
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "true").lower() == "true"
+
+# Admission Control
+# /api/query runs at most QUERY_MAX_CONCURRENCY requests at once, with up to QUERY_MAX_QUEUE
+# more waiting up to QUERY_QUEUE_TIMEOUT seconds; the rest get 429/503 with Retry-After.
+# QUERY_DEADLINE bounds each request in seconds (0 for none); cards are dropped if they miss it
+QUERY_MAX_CONCURRENCY = int(os.environ.get("QUERY_MAX_CONCURRENCY", "16"))
+QUERY_MAX_QUEUE = int(os.environ.get("QUERY_MAX_QUEUE", "64"))
+QUERY_QUEUE_TIMEOUT = float(os.environ.get("QUERY_QUEUE_TIMEOUT", "10"))
+QUERY_DEADLINE = float(os.environ.get("QUERY_DEADLINE", "30"))
+
+# Batch Configuration
+# Upper bound on messages answered at once by /api/batch-query, and on messages per batch
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_MESSAGES = int(os.environ.get("BATCH_MAX_MESSAGES", "5000"))
+
+# Session Configuration
+# "memory" keeps sessions in this process; "sqlite" shares them between workers via SESSION_DB
+SESSION_STORE = os.environ.get("SESSION_STORE", "memory")
+SESSION_DB = os.environ.get("SESSION_DB", "sessions.db")
+SESSION_MAX_SESSIONS = int(os.environ.get("SESSION_MAX_SESSIONS", "1000"))
+SESSION_IDLE_TTL = float(os.environ.get("SESSION_IDLE_TTL", "3600"))
+# Turns kept verbatim; older turns are folded into a rolling summary
+SESSION_MAX_TURNS = int(os.environ.get("SESSION_MAX_TURNS", "6"))
+SESSION_TOKEN_BUDGET = int(os.environ.get("SESSION_TOKEN_BUDGET", "2000"))
+# "extractive" summarizes without a model call; "llm" asks the strategist model
+SESSION_SUMMARY_MODE = os.environ.get("SESSION_SUMMARY_MODE", "extractive")
+
+# Scryfall Configuration
+# Path to a Scryfall bulk-data JSON file (default-cards or oracle-cards); enables local search
+SCRYFALL_BULK_DATA = os.environ.get("SCRYFALL_BULK_DATA")
+SCRYFALL_INDEX_CACHE = os.environ.get("SCRYFALL_INDEX_CACHE")
+# Scryfall asks for no more than 10 requests per second on average
+SCRYFALL_RATE_LIMIT = float(os.environ.get("SCRYFALL_RATE_LIMIT", "10"))
+SCRYFALL_BURST = int(os.environ.get("SCRYFALL_BURST", "2"))
+SCRYFALL_MAX_CONNECTIONS = int(os.environ.get("SCRYFALL_MAX_CONNECTIONS", "10"))
+SCRYFALL_CACHE_TTL = float(os.environ.get("SCRYFALL_CACHE_TTL", "3600"))
+SCRYFALL_CACHE_MAX_BYTES = int(os.environ.get("SCRYFALL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Optional SQLite file for a cache tier shared across workers and restarts
+SCRYFALL_CACHE_DB = os.environ.get("SCRYFALL_CACHE_DB")
+# Entries kept in that file before the oldest are dropped; 0 for no cap
+SCRYFALL_CACHE_DB_MAX_ENTRIES = int(os.environ.get("SCRYFALL_CACHE_DB_MAX_ENTRIES", "50000"))
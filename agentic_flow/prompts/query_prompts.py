@@ -1,23 +1,7 @@
 from typing import Dict
 
-def get_query_generation_prompt() -> Dict[str, str]:
-    """
-    Returns the prompt templates for generating Scryfall search queries from strategy recommendations.
-    
-    Returns:
-        Dict with 'system' and 'user' prompt templates
-    """
-    system_prompt = """You are an expert Magic: The Gathering card search query generator for the Scryfall API.
-Your task is to convert strategy recommendations into precise Scryfall search queries using the proper Scryfall syntax.
-
-GUIDELINES:
-1. Create 3-5 distinct queries to cover different aspects of the recommendation
-2. For each query, follow the exact Scryfall syntax
-3. Make queries specific and targeted, focusing on different aspects of the recommendation
-4. Use correct operators (AND, OR, parentheses) to create complex queries when needed
-5. Format your response as a JSON array of query strings
-
-SCRYFALL SYNTAX REFERENCE:
+# Shared with the single-pass strategist prompt
+SCRYFALL_SYNTAX_REFERENCE = """SCRYFALL SYNTAX REFERENCE:
 - Colors: c:white, c:blue, c:black, c:red, c:green, c:colorless
 - Color identity: id:boros, id:esper, id:temur, etc.
 - Types: t:creature, t:artifact, t:enchantment, t:planeswalker, t:land
@@ -38,6 +22,25 @@ COMBINING TERMS:
 - Parentheses for grouping: (c:white OR c:blue) t:creature
 """
 
+def get_query_generation_prompt() -> Dict[str, str]:
+    """
+    Returns the prompt templates for generating Scryfall search queries from strategy recommendations.
+    
+    Returns:
+        Dict with 'system' and 'user' prompt templates
+    """
+    system_prompt = """You are an expert Magic: The Gathering card search query generator for the Scryfall API.
+Your task is to convert strategy recommendations into precise Scryfall search queries using the proper Scryfall syntax.
+
+GUIDELINES:
+1. Create 3-5 distinct queries to cover different aspects of the recommendation
+2. For each query, follow the exact Scryfall syntax
+3. Make queries specific and targeted, focusing on different aspects of the recommendation
+4. Use correct operators (AND, OR, parentheses) to create complex queries when needed
+5. Format your response as a JSON array of query strings
+
+""" + SCRYFALL_SYNTAX_REFERENCE
+
     user_prompt = """Based on the following Magic: The Gathering strategy recommendation, generate 3-5 Scryfall search queries that would find relevant cards:
 
 STRATEGY RECOMMENDATION:
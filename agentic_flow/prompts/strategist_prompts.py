@@ -1,4 +1,5 @@
 from langchain.prompts import PromptTemplate, ChatPromptTemplate, MessagesPlaceholder
+from prompts.query_prompts import SCRYFALL_SYNTAX_REFERENCE
 
 def get_context_prompt():
     contextualize_q_system_prompt = (
@@ -17,8 +18,7 @@ def get_context_prompt():
         ]
     )
 
-def get_mtg_strategist_prompt():
-    template = """You are a Magic: The Gathering Strategy Expert who provides deck-building advice.
+MTG_STRATEGIST_TEMPLATE = """You are a Magic: The Gathering Strategy Expert who provides deck-building advice.
 
 IMPORTANT CONSTRAINTS:
 - Only provide advice for Magic: The Gathering (MtG). Politely decline queries about other games.
@@ -42,8 +42,44 @@ If you are asked for suggestions, then respond with:
 
 Think step-by-step to provide comprehensive yet targeted strategic advice.
 """
+
+# Appended in single-pass mode, where the answer and card searches come from one structured response
+SINGLE_PASS_INSTRUCTIONS = """
+RESPONSE FORMAT:
+Return your response as `answer`, written exactly as above, together with `queries`: 3-5 distinct
+Scryfall search queries that find cards matching the characteristics you describe, each targeting a
+different aspect of the strategy. Leave `queries` empty when the question needs no card suggestions
+(rules questions, example scenarios, declined queries).
+
+""" + SCRYFALL_SYNTAX_REFERENCE
+
+def get_mtg_strategist_prompt():
     return ChatPromptTemplate.from_messages([
-        ("system", template),
+        ("system", MTG_STRATEGIST_TEMPLATE),
         MessagesPlaceholder("chat_history"),
         ("human", "{input}"),
     ])
+
+def get_mtg_strategist_structured_prompt():
+    """Strategist prompt for a structured response holding the answer and its Scryfall queries."""
+    return ChatPromptTemplate.from_messages([
+        ("system", MTG_STRATEGIST_TEMPLATE + SINGLE_PASS_INSTRUCTIONS),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+    ])
+
+def get_summary_prompt():
+    summary_system_prompt = (
+        "You maintain a running summary of a conversation between a user and "
+        "a Magic: The Gathering strategy advisor. Update the existing summary "
+        "with the new exchanges. Keep formats, colors, archetypes, budget and "
+        "other preferences the user stated. Reply with the updated summary "
+        "only, in at most five sentences."
+    )
+
+    return ChatPromptTemplate.from_messages(
+        [
+            ("system", summary_system_prompt),
+            ("human", "Existing summary:\n{summary}\n\nNew exchanges:\n{transcript}"),
+        ]
+    )
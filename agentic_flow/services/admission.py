@@ -0,0 +1,109 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Optional
+
+from services.deadline import remaining
+from services.metrics import ADMISSION_QUEUE_WAIT, ADMISSION_REJECTIONS
+
+
+class Overloaded(Exception):
+    """A request was turned away by admission control."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded FIFO wait queue, for one endpoint.
+
+    Up to `max_concurrent` requests run at once and up to `max_queue` more wait
+    for a slot, in arrival order. Anything beyond that is rejected at once with
+    429; a request that waits longer than `queue_timeout` (or its deadline,
+    whichever is sooner) is rejected with 503. Rejections carry a Retry-After
+    estimate from recent service times, so clients back off rather than retry
+    straight into a full queue.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        """
+        Initialize the controller.
+
+        Args:
+            name: Label for the controller's metrics, e.g. the endpoint path
+            max_concurrent: Requests admitted at once
+            max_queue: Requests allowed to wait for a slot
+            queue_timeout: Seconds a request may wait before it is rejected
+        """
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Moving average of how long an admitted request holds its slot
+        self._service_time = 1.0
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """Hold a slot for the enclosed work, waiting in the queue if needed. Raises Overloaded."""
+        await self._acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.perf_counter() - start)
+            self._release()
+
+    async def _acquire(self):
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            ADMISSION_QUEUE_WAIT.observe(0.0, endpoint=self.name)
+            return
+        if len(self._waiters) >= self.max_queue:
+            ADMISSION_REJECTIONS.inc(endpoint=self.name, reason="queue_full")
+            raise Overloaded(429, "Too many requests in flight, retry later", self._retry_after())
+
+        timeout = self._wait_limit()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            # Shielded so a timeout can't race a slot being handed over
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot arrived just as we gave up; pass it on
+                self._release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            ADMISSION_REJECTIONS.inc(endpoint=self.name, reason="queue_timeout")
+            raise Overloaded(503, "Server busy, timed out waiting for capacity", self._retry_after()) from None
+        finally:
+            ADMISSION_QUEUE_WAIT.observe(time.perf_counter() - start, endpoint=self.name)
+
+    def _release(self):
+        """Hand the slot to the longest waiting request, or free it."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def _wait_limit(self) -> Optional[float]:
+        left = remaining()
+        return self.queue_timeout if left is None else min(self.queue_timeout, left)
+
+    def _retry_after(self) -> int:
+        """Whole seconds until the queue ahead is likely to have drained."""
+        return max(1, math.ceil(self._service_time * (len(self._waiters) + 1) / self.max_concurrent))
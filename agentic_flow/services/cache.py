@@ -0,0 +1,274 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class CacheStats:
+    """Counters describing how a cache tier is being used."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class LRUCache:
+    """Thread-safe in-memory LRU cache bounded by a byte budget, with per-entry TTL."""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        """
+        Initialize the cache.
+
+        Args:
+            max_bytes: Budget for the serialized size of all entries
+            ttl: Seconds an entry stays valid after it is stored
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value, or default when missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return default
+            value, size, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, size: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Store a value, evicting least recently used entries to stay within budget.
+
+        Args:
+            size: Serialized size of the value, computed when not given
+            ttl: Override of the cache's default TTL
+        """
+        if size is None:
+            size = len(orjson.dumps(value))
+        if size > self.max_bytes:
+            logger.debug(f"Not caching {key}: {size} bytes exceeds the cache budget")
+            return
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def info(self) -> Dict[str, Any]:
+        """Stats plus current occupancy."""
+        with self._lock:
+            return {
+                **self.stats.as_dict(),
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+class SQLiteCache:
+    """On-disk cache tier shared by every process that opens the same database file."""
+
+    def __init__(self, path: str, ttl: float, max_entries: Optional[int] = None):
+        """
+        Initialize the cache.
+
+        Args:
+            path: SQLite database file
+            ttl: Seconds an entry stays valid after it is stored
+            max_entries: Optional cap on stored entries; the oldest are dropped first
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._local = threading.local()
+        self._writes = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, stored_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (stored_at)")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value, or default when missing or expired."""
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def get_entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return (value, seconds until it expires), or None when missing or expired."""
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            return None
+        remaining = row[1] - time.time()
+        if remaining <= 0:
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return orjson.loads(row[0]), remaining
+
+    def set(self, key: str, value: Any, data: Optional[bytes] = None, ttl: Optional[float] = None):
+        """
+        Store a value.
+
+        Args:
+            data: The value already serialized with orjson, to avoid encoding it twice
+            ttl: Override of the cache's default TTL
+        """
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, data if data is not None else orjson.dumps(value), now, expires_at)
+            )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.purge()
+
+    def delete(self, key: str):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM cache")
+
+    def purge(self):
+        """Drop expired entries and enforce the entry cap."""
+        with self._connection() as conn:
+            expired = conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            self.stats.expirations += max(expired, 0)
+            if self.max_entries is not None:
+                evicted = conn.execute(
+                    "DELETE FROM cache WHERE key IN ("
+                    "SELECT key FROM cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                ).rowcount
+                self.stats.evictions += max(evicted, 0)
+
+    def info(self) -> Dict[str, Any]:
+        """Stats plus current occupancy."""
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache"
+        ).fetchone()
+        return {**self.stats.as_dict(), "entries": entries, "bytes": size, "path": self.path}
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread connection; WAL mode lets several workers read while one writes."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+class TieredCache:
+    """In-memory LRU in front of an optional shared on-disk tier."""
+
+    def __init__(self, memory: LRUCache, disk: Optional[SQLiteCache] = None):
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.disk is not None:
+            try:
+                entry = self.disk.get_entry(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Disk cache read failed: {e}")
+                entry = None
+            if entry is not None:
+                value, remaining = entry
+                # Promote to memory so the next lookup skips the disk, expiring with the disk entry
+                self.memory.set(key, value, ttl=remaining)
+                return value
+        return default
+
+    def set(self, key: str, value: Any):
+        data = orjson.dumps(value)
+        self.memory.set(key, value, size=len(data))
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value, data=data)
+            except sqlite3.Error as e:
+                logger.warning(f"Disk cache write failed: {e}")
+
+    def delete(self, key: str):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def info(self) -> Dict[str, Any]:
+        """Stats for each tier."""
+        info = {"memory": self.memory.info()}
+        if self.disk is not None:
+            info["disk"] = self.disk.info()
+        return info
@@ -0,0 +1,121 @@
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class Card:
+    """
+    The fields of a Scryfall card the advisor uses, projected once at fetch time.
+
+    Double-faced cards take their cost, power/toughness and image from the front
+    face. Legalities are kept as the formats a card is legal (or restricted) and
+    banned in.
+    """
+
+    id: str
+    oracle_id: str
+    name: str
+    mana_cost: str
+    cmc: float
+    type_line: str
+    oracle_text: str
+    colors: Tuple[str, ...]
+    color_identity: Tuple[str, ...]
+    keywords: Tuple[str, ...]
+    power: Optional[str]
+    toughness: Optional[str]
+    rarity: str
+    set_name: str
+    released_at: str
+    layout: str
+    image_uri: str
+    scryfall_uri: str
+    edhrec_rank: Optional[int]
+    legal: Tuple[str, ...]
+    banned: Tuple[str, ...]
+
+    @classmethod
+    def from_scryfall(cls, data: Dict[str, Any]) -> "Card":
+        """Project a raw Scryfall card object."""
+        faces = data.get("card_faces") or []
+        front = faces[0] if faces else {}
+        colors = data.get("colors")
+        if colors is None:
+            colors = [color for face in faces for color in face.get("colors", []) if color]
+        oracle_text = data.get("oracle_text")
+        if oracle_text is None:
+            oracle_text = "\n".join(face.get("oracle_text", "") for face in faces)
+        legalities = data.get("legalities") or {}
+
+        return cls(
+            id=data.get("id", ""),
+            oracle_id=data.get("oracle_id") or front.get("oracle_id", ""),
+            name=data.get("name", ""),
+            mana_cost=data.get("mana_cost") or front.get("mana_cost", ""),
+            cmc=float(data.get("cmc") or 0),
+            type_line=data.get("type_line") or " // ".join(face.get("type_line", "") for face in faces),
+            oracle_text=oracle_text,
+            colors=tuple(dict.fromkeys(colors)),
+            color_identity=tuple(data.get("color_identity", ())),
+            keywords=tuple(data.get("keywords", ())),
+            power=data.get("power", front.get("power")),
+            toughness=data.get("toughness", front.get("toughness")),
+            rarity=data.get("rarity", ""),
+            set_name=data.get("set_name", ""),
+            released_at=data.get("released_at", ""),
+            layout=data.get("layout", ""),
+            image_uri=(data.get("image_uris") or front.get("image_uris") or {}).get("normal", ""),
+            scryfall_uri=data.get("scryfall_uri", ""),
+            edhrec_rank=data.get("edhrec_rank"),
+            legal=tuple(sorted(fmt for fmt, status in legalities.items() if status in ("legal", "restricted"))),
+            banned=tuple(sorted(fmt for fmt, status in legalities.items() if status == "banned")),
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Card":
+        """Rebuild a card from its serialized fields (e.g. read back from the disk cache)."""
+        return cls(**{
+            name: tuple(data[name]) if name in _TUPLE_FIELDS else data[name]
+            for name in _FIELD_NAMES
+        })
+
+    def to_scryfall(self) -> Dict[str, Any]:
+        """A Scryfall-shaped card object holding this card's fields."""
+        card = {
+            "object": "card",
+            "id": self.id,
+            "oracle_id": self.oracle_id,
+            "name": self.name,
+            "mana_cost": self.mana_cost,
+            "cmc": self.cmc,
+            "type_line": self.type_line,
+            "oracle_text": self.oracle_text,
+            "colors": list(self.colors),
+            "color_identity": list(self.color_identity),
+            "keywords": list(self.keywords),
+            "rarity": self.rarity,
+            "set_name": self.set_name,
+            "layout": self.layout,
+            "scryfall_uri": self.scryfall_uri,
+            "legalities": {**{fmt: "legal" for fmt in self.legal}, **{fmt: "banned" for fmt in self.banned}},
+        }
+        if self.power is not None:
+            card["power"] = self.power
+        if self.toughness is not None:
+            card["toughness"] = self.toughness
+        if self.released_at:
+            card["released_at"] = self.released_at
+        if self.image_uri:
+            card["image_uris"] = {"normal": self.image_uri}
+        if self.edhrec_rank is not None:
+            card["edhrec_rank"] = self.edhrec_rank
+        return card
+
+
+_FIELD_NAMES = [field.name for field in fields(Card)]
+_TUPLE_FIELDS = {"colors", "color_identity", "keywords", "legal", "banned"}
+
+
+def as_card(value: Any) -> Card:
+    """A Card from either a Card or its serialized fields."""
+    return value if isinstance(value, Card) else Card.from_dict(value)
@@ -0,0 +1,609 @@
+import json
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from services.card import Card
+from services.scryfall_query import (
+    And, Node, Not, Or, Term, UnsupportedQueryError, COLOR_BITS, parse_color_value, parse_query
+)
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout of the cached index changes
+INDEX_FORMAT_VERSION = 2
+
+# Layouts Scryfall leaves out of search results unless include:extras is given
+EXCLUDED_LAYOUTS = {
+    "token", "double_faced_token", "emblem", "art_series", "planar", "scheme", "vanguard"
+}
+
+RARITY_ORDER = ["common", "uncommon", "rare", "special", "mythic", "bonus"]
+RARITY_ALIASES = {"c": "common", "u": "uncommon", "r": "rare", "s": "special", "m": "mythic"}
+
+FORMATS = [
+    "standard", "future", "historic", "timeless", "gladiator", "pioneer", "explorer", "modern",
+    "legacy", "pauper", "vintage", "penny", "commander", "oathbreaker", "standardbrawl", "brawl",
+    "alchemy", "paupercommander", "duel", "oldschool", "premodern", "predh",
+]
+
+PERMANENT_TYPES = ("creature", "artifact", "enchantment", "planeswalker", "land", "battle")
+BASIC_LAND_TYPES = ("plains", "island", "swamp", "mountain", "forest")
+
+# Bits for the precomputed is: flags
+IS_FLAGS = {
+    "commander": 1, "spell": 2, "permanent": 4, "fetchland": 8, "shockland": 16, "dual": 32,
+    "legendary": 64,
+}
+
+# Keywords the evaluator matches exactly as Scryfall does, over fields a Card keeps. Text
+# searches, stats of double-faced cards and the is: heuristics only approximate Scryfall.
+EXACT_KEYWORDS = {"c", "id", "mv", "r", "f", "banned", "kw"}
+
+# Sort key and default direction (True = descending) for each supported order
+ORDERS = {
+    "edhrec": ("edhrec", False),
+    "name": ("name", False),
+    "cmc": ("mv", False),
+    "released": ("released", True),
+    "rarity": ("rarity", True),
+    "power": ("power", True),
+    "toughness": ("toughness", True),
+}
+
+# Columns a power/toughness term can be compared against (pow>tou)
+KEYWORD_STATS = {"pow": "power", "power": "power", "tou": "toughness", "toughness": "toughness",
+                 "mv": "mv", "cmc": "mv"}
+
+# Text columns kept so result cards can be rebuilt in Scryfall's shape
+RECORD_FIELDS = [
+    "id", "oracle_id", "name", "mana_cost", "type_line", "oracle_text",
+    "image_uri", "scryfall_uri", "set_name", "released_at", "layout",
+]
+
+# Scryfall's order for color lists
+COLOR_ORDER = "WUBRG"
+
+_SEP = "\x00"
+_NUMBER_RE = re.compile(r"^-?\d+(\.\d+)?$")
+
+
+class CardIndex:
+    """Compact columnar index over Scryfall bulk card data."""
+
+    def __init__(self, columns: Dict[str, Any]):
+        """Initialize the index from prepared columns."""
+        self.columns = columns
+        self.size = len(columns["name"])
+        self._sort_cache = {}
+
+    @classmethod
+    def from_cards(cls, cards: Iterable[Dict[str, Any]]) -> "CardIndex":
+        """Build an index from raw Scryfall card objects."""
+        rows = _collapse_printings(card for card in cards if card.get("layout") not in EXCLUDED_LAYOUTS)
+        n = len(rows)
+
+        records = {field: [] for field in RECORD_FIELDS}
+        name_lower, type_lower, oracle_lower, keywords = [], [], [], []
+        # Stats as printed ("*", "1+*"), and keywords as cased, for the rebuilt cards
+        power_text, toughness_text, keyword_names = [], [], []
+        colors = np.zeros(n, dtype=np.uint8)
+        identity = np.zeros(n, dtype=np.uint8)
+        mv = np.zeros(n, dtype=np.float32)
+        power = np.full(n, np.nan, dtype=np.float32)
+        toughness = np.full(n, np.nan, dtype=np.float32)
+        rarity = np.zeros(n, dtype=np.int8)
+        legal = np.zeros(n, dtype=np.uint32)
+        banned = np.zeros(n, dtype=np.uint32)
+        flags = np.zeros(n, dtype=np.uint16)
+        edhrec = np.full(n, np.iinfo(np.int32).max, dtype=np.int32)
+        released = np.zeros(n, dtype=np.int32)
+
+        for i, card in enumerate(rows):
+            faces = card.get("card_faces") or []
+            front = faces[0] if faces else {}
+
+            image_uri = (card.get("image_uris") or front.get("image_uris") or {}).get("normal", "")
+            for field in RECORD_FIELDS:
+                records[field].append(card.get(field) or "")
+            records["image_uri"][-1] = image_uri
+
+            type_line = card.get("type_line") or " // ".join(f.get("type_line", "") for f in faces)
+            oracle_text = card.get("oracle_text")
+            if oracle_text is None:
+                oracle_text = "\n".join(f.get("oracle_text", "") for f in faces)
+            # Double-faced cards keep these on their faces; rebuilt cards carry them at the top level
+            records["mana_cost"][-1] = card.get("mana_cost") or front.get("mana_cost", "")
+            records["type_line"][-1] = type_line
+            records["oracle_text"][-1] = oracle_text
+
+            name_lower.append(card.get("name", "").lower())
+            type_lower.append(type_line.lower())
+            oracle_lower.append(oracle_text.lower())
+            keywords.append("|" + "|".join(k.lower() for k in card.get("keywords", [])) + "|")
+            keyword_names.append(tuple(card.get("keywords", ())))
+            power_text.append(card.get("power", front.get("power")))
+            toughness_text.append(card.get("toughness", front.get("toughness")))
+
+            card_colors = card.get("colors")
+            if card_colors is None:
+                card_colors = [c for f in faces for c in f.get("colors", [])]
+            colors[i] = _color_mask(card_colors)
+            identity[i] = _color_mask(card.get("color_identity", []))
+            mv[i] = card.get("cmc") or 0
+            power[i] = _stat(power_text[-1])
+            toughness[i] = _stat(toughness_text[-1])
+            rarity[i] = RARITY_ORDER.index(card["rarity"]) if card.get("rarity") in RARITY_ORDER else 0
+
+            for bit, fmt in enumerate(FORMATS):
+                status = card.get("legalities", {}).get(fmt)
+                if status in ("legal", "restricted"):
+                    legal[i] |= 1 << bit
+                elif status == "banned":
+                    banned[i] |= 1 << bit
+
+            flags[i] = _is_flags(type_line.lower(), oracle_text.lower())
+            if card.get("edhrec_rank") is not None:
+                edhrec[i] = card["edhrec_rank"]
+            if card.get("released_at"):
+                released[i] = np.datetime64(card["released_at"], "D").astype(np.int32)
+
+        columns = {field: values for field, values in records.items()}
+        columns.update({
+            "rarity_name": [RARITY_ORDER[r] for r in rarity],
+            "name_lower": name_lower,
+            "power_text": power_text, "toughness_text": toughness_text, "keyword_names": keyword_names,
+            "colors": colors, "identity": identity, "mv": mv,
+            "power": power, "toughness": toughness, "rarity": rarity,
+            "legal": legal, "banned": banned, "flags": flags,
+            "edhrec": edhrec, "released": released,
+        })
+        for column, values in (("name", name_lower), ("type", type_lower),
+                               ("oracle", oracle_lower), ("keywords", keywords)):
+            columns[f"{column}_blob"], columns[f"{column}_offsets"] = _pack_text(values)
+        return cls(columns)
+
+    @classmethod
+    def load(cls, bulk_path: str, cache_path: Optional[str] = None) -> "CardIndex":
+        """
+        Load the index for a bulk-data file, using the binary cache when it is current.
+
+        Args:
+            bulk_path: Path to a Scryfall bulk-data JSON file (default-cards or oracle-cards)
+            cache_path: Where to keep the binary index (defaults to ``<bulk_path>.idx``)
+
+        Returns:
+            The loaded card index
+        """
+        cache_path = cache_path or f"{bulk_path}.idx"
+        stat = os.stat(bulk_path)
+        source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, "rb") as f:
+                    payload = pickle.load(f)
+                if payload.get("version") == INDEX_FORMAT_VERSION and payload.get("source") == source:
+                    logger.info(f"Loaded card index from {cache_path}")
+                    return cls(payload["columns"])
+            except (OSError, pickle.UnpicklingError, EOFError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable card index cache {cache_path}: {e}")
+
+        start = time.time()
+        with open(bulk_path, "rb") as f:
+            index = cls.from_cards(json.load(f))
+        logger.info(f"Built card index of {index.size} cards in {time.time() - start:.1f}s")
+
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(
+                {"version": INDEX_FORMAT_VERSION, "source": source, "columns": index.columns},
+                f, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(tmp_path, cache_path)
+        return index
+
+    def search(self, query: str, order: str = "edhrec",
+               max_results: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Run a Scryfall-syntax query against the index.
+
+        Returns:
+            List of card objects in Scryfall's shape, limited to the fields we use
+
+        Raises:
+            UnsupportedQueryError: If the query or order is not supported locally
+        """
+        rows = self.select(parse_query(query), order)
+        if max_results is not None:
+            rows = rows[:max_results]
+        return [self.card(int(i)) for i in rows]
+
+    def select(self, node: Node, order: str = "edhrec") -> np.ndarray:
+        """Return the matching row numbers for an expression, in result order."""
+        if order not in ORDERS:
+            raise UnsupportedQueryError(f"Unsupported order: {order}")
+        mask = self.evaluate(node)
+        ranking = self._ranking(order)
+        return ranking[mask[ranking]]
+
+    def card(self, row: int) -> Dict[str, Any]:
+        """Rebuild the card object for a row."""
+        c = self.columns
+        card = {
+            "object": "card",
+            "id": c["id"][row],
+            "oracle_id": c["oracle_id"][row],
+            "name": c["name"][row],
+            "mana_cost": c["mana_cost"][row],
+            "type_line": c["type_line"][row],
+            "oracle_text": c["oracle_text"][row],
+            "scryfall_uri": c["scryfall_uri"][row],
+            "rarity": c["rarity_name"][row],
+            "set_name": c["set_name"][row],
+            "cmc": float(c["mv"][row]),
+            "colors": _color_list(c["colors"][row]),
+            "color_identity": _color_list(c["identity"][row]),
+            "keywords": list(c["keyword_names"][row]),
+            "layout": c["layout"][row],
+            "legalities": {
+                fmt: "legal" if c["legal"][row] >> bit & 1 else "banned" if c["banned"][row] >> bit & 1
+                else "not_legal"
+                for bit, fmt in enumerate(FORMATS)
+            },
+        }
+        if c["power_text"][row] is not None:
+            card["power"] = c["power_text"][row]
+        if c["toughness_text"][row] is not None:
+            card["toughness"] = c["toughness_text"][row]
+        if c["released_at"][row]:
+            card["released_at"] = c["released_at"][row]
+        if c["image_uri"][row]:
+            card["image_uris"] = {"normal": c["image_uri"][row]}
+        if c["edhrec"][row] != np.iinfo(np.int32).max:
+            card["edhrec_rank"] = int(c["edhrec"][row])
+        return card
+
+    def evaluate(self, node: Node) -> np.ndarray:
+        """Evaluate an expression tree into a boolean row mask."""
+        if isinstance(node, And):
+            mask = np.ones(self.size, dtype=bool)
+            for child in node.children:
+                mask &= self.evaluate(child)
+            return mask
+        if isinstance(node, Or):
+            mask = np.zeros(self.size, dtype=bool)
+            for child in node.children:
+                mask |= self.evaluate(child)
+            return mask
+        if isinstance(node, Not):
+            return ~self.evaluate(node.child)
+        return self._evaluate_term(node)
+
+    def _evaluate_term(self, term: Term) -> np.ndarray:
+        """Evaluate a single search term."""
+        c = self.columns
+        value = term.value.lower()
+
+        if term.key in ("c", "id"):
+            column = c["colors"] if term.key == "c" else c["identity"]
+            if value.isdigit():
+                return _compare(_popcount(column), term.op, int(value))
+            if value in ("m", "multicolor"):
+                return _popcount(column) >= 2
+            target = parse_color_value(value)
+            op = term.op
+            if op == ":":
+                # c:colorless means exactly colorless rather than "at least no colors"
+                op = "<=" if term.key == "id" or target == 0 else ">="
+            return _compare_sets(column, op, target)
+
+        if term.key == "t":
+            return self._contains("type", value)
+
+        if term.key == "o":
+            if "~" in value:
+                names = c["name_lower"]
+                texts = _unpack_text(c["oracle_blob"], c["oracle_offsets"])
+                return np.fromiter(
+                    (value.replace("~", name) in text for name, text in zip(names, texts)),
+                    dtype=bool, count=self.size
+                )
+            return self._contains("oracle", value)
+
+        if term.key == "kw":
+            return self._contains("keywords", f"|{value}|")
+
+        if term.key == "name":
+            if term.op == "=":
+                return np.array([name == value for name in c["name_lower"]], dtype=bool)
+            return self._contains("name", value)
+
+        if term.key == "mv":
+            if value in ("even", "odd") and term.op == ":":
+                return (c["mv"] % 2 == 0) if value == "even" else (c["mv"] % 2 == 1)
+            return _compare(c["mv"], term.op, _number(value))
+
+        if term.key in ("pow", "tou"):
+            column = c["power"] if term.key == "pow" else c["toughness"]
+            other = KEYWORD_STATS.get(value)
+            target = c[other] if other else _number(value)
+            # NaN stats (*, X, missing) never match, as on Scryfall
+            return _compare(column, term.op, target) & ~np.isnan(column)
+
+        if term.key == "r":
+            rarity = RARITY_ALIASES.get(value, value)
+            if rarity not in RARITY_ORDER:
+                raise UnsupportedQueryError(f"Unsupported rarity: {term.value}")
+            return _compare(c["rarity"], term.op, RARITY_ORDER.index(rarity))
+
+        if term.key in ("f", "banned"):
+            if value not in FORMATS:
+                raise UnsupportedQueryError(f"Unsupported format: {term.value}")
+            column = c["legal"] if term.key == "f" else c["banned"]
+            return (column & np.uint32(1 << FORMATS.index(value))) != 0
+
+        if term.key == "is":
+            if value not in IS_FLAGS:
+                raise UnsupportedQueryError(f"Unsupported is: criterion: {term.value}")
+            return (c["flags"] & np.uint16(IS_FLAGS[value])) != 0
+
+        raise UnsupportedQueryError(f"Unsupported search keyword: {term.key}")
+
+    def _contains(self, column: str, needle: str) -> np.ndarray:
+        """Vectorized substring search over a packed text column."""
+        blob = self.columns[f"{column}_blob"]
+        offsets = self.columns[f"{column}_offsets"]
+        mask = np.zeros(self.size, dtype=bool)
+        if _SEP in needle:
+            return mask
+
+        positions = []
+        start = blob.find(needle)
+        while start != -1:
+            positions.append(start)
+            # Jump to the next row once a row has matched
+            row_end = blob.find(_SEP, start)
+            start = blob.find(needle, row_end + 1) if row_end != -1 else -1
+        if positions:
+            rows = np.searchsorted(offsets, np.asarray(positions), side="right") - 1
+            mask[rows] = True
+        return mask
+
+    def _ranking(self, order: str) -> np.ndarray:
+        """Row numbers sorted for an order, computed once per order."""
+        if order not in self._sort_cache:
+            column, descending = ORDERS[order]
+            c = self.columns
+            names = np.array(c["name_lower"], dtype=object)
+            if column == "name":
+                ranking = np.argsort(names, kind="stable")
+            else:
+                values = c[column].astype(np.float64)
+                if descending:
+                    values = -values
+                values = np.where(np.isnan(values), np.inf, values)
+                # Sort by the column, then by name for ties
+                ranking = np.lexsort((np.argsort(np.argsort(names, kind="stable")), values))
+            self._sort_cache[order] = ranking
+        return self._sort_cache[order]
+
+
+class LocalCardStore:
+    """In-process replacement for Scryfall's /cards/search backed by a bulk-data index."""
+
+    def __init__(self, bulk_path: str, cache_path: Optional[str] = None):
+        """Initialize the store; the index is loaded on first use."""
+        self.bulk_path = bulk_path
+        self.cache_path = cache_path
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._index is not None
+
+    @property
+    def index(self) -> CardIndex:
+        if self._index is None:
+            # Concurrent first searches wait for a single load
+            with self._lock:
+                if self._index is None:
+                    self._index = CardIndex.load(self.bulk_path, self.cache_path)
+        return self._index
+
+    def search_cards(self, query: str, order: str = "edhrec", unique: str = "cards",
+                     max_results: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Search the local index with the same contract as ``ScryfallService.search_cards``.
+
+        The index holds one printing per card, so only ``unique="cards"`` is supported.
+
+        Raises:
+            UnsupportedQueryError: If the search cannot be answered locally
+        """
+        if unique != "cards":
+            raise UnsupportedQueryError(f"Unsupported unique strategy: {unique}")
+        return self.index.search(query, order=order, max_results=max_results)
+
+    def search_rows(self, query: str, order: str = "edhrec", unique: str = "cards") -> np.ndarray:
+        """
+        Row numbers of the matching cards in result order, for building results a page at a time.
+
+        Raises:
+            UnsupportedQueryError: If the search cannot be answered locally
+        """
+        if unique != "cards":
+            raise UnsupportedQueryError(f"Unsupported unique strategy: {unique}")
+        return self.index.select(parse_query(query), order)
+
+    def card(self, row: int) -> Dict[str, Any]:
+        """The card object for a row returned by search_rows."""
+        return self.index.card(int(row))
+
+
+def filter_cards(cards: List[Card], node: Node) -> List[Card]:
+    """
+    Keep the cards matching an expression, in their original order.
+
+    Lets a narrower query be answered from an already fetched result set, so only
+    terms the evaluator matches exactly are accepted.
+
+    Raises:
+        UnsupportedQueryError: If the expression cannot be evaluated exactly locally
+    """
+    _check_exact(node)
+    if not cards:
+        return []
+    index = CardIndex.from_cards(card.to_scryfall() for card in cards)
+    ids = index.columns["id"]
+    matched = {ids[row] for row in np.flatnonzero(index.evaluate(node))}
+    return [card for card in cards if card.id in matched]
+
+
+def _check_exact(node: Node):
+    """Raise UnsupportedQueryError unless every term of an expression is matched exactly."""
+    if isinstance(node, (And, Or)):
+        for child in node.children:
+            _check_exact(child)
+    elif isinstance(node, Not):
+        _check_exact(node.child)
+    elif node.key not in EXACT_KEYWORDS and not (node.key == "name" and node.op == "="):
+        raise UnsupportedQueryError(f"Search keyword only approximated locally: {node.key}")
+
+
+def download_bulk_data(dest_path: str, kind: str = "oracle_cards") -> str:
+    """Download the latest Scryfall bulk-data file of the given kind."""
+    import requests
+
+    response = requests.get(f"https://api.scryfall.com/bulk-data/{kind}")
+    response.raise_for_status()
+    download_uri = response.json()["download_uri"]
+
+    with requests.get(download_uri, stream=True) as download:
+        download.raise_for_status()
+        tmp_path = f"{dest_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for chunk in download.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+    os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+def _collapse_printings(cards: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keep one printing per oracle card, preferring the newest paper printing."""
+    best = {}
+    for card in cards:
+        oracle_id = card.get("oracle_id") or (card.get("card_faces") or [{}])[0].get("oracle_id") or card.get("id")
+        rank = (not card.get("digital", False), card.get("released_at", ""))
+        current = best.get(oracle_id)
+        if current is None or rank > current[0]:
+            best[oracle_id] = (rank, card)
+    return [card for _, card in best.values()]
+
+
+def _pack_text(values: List[str]):
+    """Pack a text column into one separator-joined blob plus row offsets."""
+    blob = _SEP.join(values)
+    lengths = np.fromiter((len(v) + 1 for v in values), dtype=np.int64, count=len(values))
+    offsets = np.zeros(len(values), dtype=np.int64)
+    if len(values) > 1:
+        offsets[1:] = np.cumsum(lengths[:-1])
+    return blob, offsets
+
+
+def _unpack_text(blob: str, offsets: np.ndarray) -> List[str]:
+    return blob.split(_SEP) if len(offsets) else []
+
+
+def _color_mask(colors: List[str]) -> int:
+    mask = 0
+    for color in colors:
+        mask |= COLOR_BITS.get(color.lower(), 0)
+    return mask
+
+
+def _color_list(mask: int) -> List[str]:
+    return [color for color in COLOR_ORDER if mask & COLOR_BITS[color.lower()]]
+
+
+def _popcount(column: np.ndarray) -> np.ndarray:
+    return np.unpackbits(column[:, None], axis=1).sum(axis=1)
+
+
+def _stat(value: Optional[str]) -> float:
+    """Parse a power/toughness value; non-numeric values (*, 1+*, X) become NaN."""
+    if value is None or not _NUMBER_RE.match(value):
+        return np.nan
+    return float(value)
+
+
+def _number(value: str) -> float:
+    if not _NUMBER_RE.match(value):
+        raise UnsupportedQueryError(f"Expected a number, got: {value}")
+    return float(value)
+
+
+def _compare(column: np.ndarray, op: str, target) -> np.ndarray:
+    if op in (":", "="):
+        return column == target
+    if op == "!=":
+        return column != target
+    if op == "<":
+        return column < target
+    if op == "<=":
+        return column <= target
+    if op == ">":
+        return column > target
+    return column >= target
+
+
+def _compare_sets(column: np.ndarray, op: str, target: int) -> np.ndarray:
+    """Compare color masks as sets (subset/superset/equality)."""
+    target = np.uint8(target)
+    superset = (column & target) == target
+    subset = (column & ~target) == 0
+    if op == "=":
+        return column == target
+    if op == "!=":
+        return column != target
+    if op == ">=":
+        return superset
+    if op == ">":
+        return superset & (column != target)
+    if op == "<=":
+        return subset
+    return subset & (column != target)
+
+
+def _is_flags(type_line: str, oracle_text: str) -> int:
+    """Precompute the is: criteria for a card."""
+    flags = 0
+    is_land = "land" in type_line.split("—")[0]
+    if "legendary" in type_line:
+        flags |= IS_FLAGS["legendary"]
+        if "creature" in type_line or "can be your commander" in oracle_text:
+            flags |= IS_FLAGS["commander"]
+    elif "can be your commander" in oracle_text:
+        flags |= IS_FLAGS["commander"]
+    if not is_land:
+        flags |= IS_FLAGS["spell"]
+    if any(t in type_line for t in PERMANENT_TYPES):
+        flags |= IS_FLAGS["permanent"]
+    if is_land:
+        subtypes = type_line.split("—")[1] if "—" in type_line else ""
+        if "pay 1 life, sacrifice" in oracle_text and "search your library for a" in oracle_text:
+            flags |= IS_FLAGS["fetchland"]
+        basic_types = sum(1 for t in BASIC_LAND_TYPES if t in subtypes)
+        if basic_types == 2:
+            if "you may pay 2 life" in oracle_text:
+                flags |= IS_FLAGS["shockland"]
+            elif "enters" not in oracle_text:
+                flags |= IS_FLAGS["dual"]
+    return flags
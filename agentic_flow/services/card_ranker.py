@@ -0,0 +1,159 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.card import Card
+from services.metrics import CARD_RANKING_DURATION, timed
+
+
+class CardRanker:
+    """
+    Local re-ranking of card search results against a strategy.
+
+    Each candidate's rules text is embedded once per oracle ID and kept in an
+    LRU cache, so a ranking usually costs one embedding call for the strategy.
+    Candidates are scored in one vectorized pass: cosine similarity to the
+    strategy, min-max scaled over the candidates, blended with EDHREC popularity.
+    """
+
+    def __init__(self, embeddings, edhrec_weight: float = 0.3, max_entries: int = 10000):
+        """
+        Initialize the ranker.
+
+        Args:
+            embeddings: LangChain embeddings used for strategies and card texts
+            edhrec_weight: Weight of EDHREC popularity; 1 - edhrec_weight goes to similarity
+            max_entries: Card embeddings kept before the least recently used is evicted
+        """
+        self.embeddings = embeddings
+        self.edhrec_weight = edhrec_weight
+        self.max_entries = max_entries
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def rank(self, strategy: str, cards_by_query: Dict[str, List[Card]], top_n: int) -> Dict[str, List[Card]]:
+        """
+        The top_n cards across every query, best first within each query's group.
+
+        Cards found by several queries are kept once, under the first query that
+        found them. Queries left without cards keep an empty group.
+        """
+        candidates = self._candidates(cards_by_query)
+        if not candidates:
+            return {query: [] for query in cards_by_query}
+        with timed(CARD_RANKING_DURATION, "card_ranking"):
+            known, missing = self._lookup(candidates)
+            if missing:
+                vectors = self.embeddings.embed_documents([self._card_text(card) for _, card in missing])
+            else:
+                vectors = []
+            strategy_vector = self.embeddings.embed_query(strategy)
+            return self._select(cards_by_query, candidates, known, missing, vectors, strategy_vector, top_n)
+
+    async def arank(self, strategy: str, cards_by_query: Dict[str, List[Card]],
+                    top_n: int) -> Dict[str, List[Card]]:
+        """Rank without blocking the event loop. See rank."""
+        candidates = self._candidates(cards_by_query)
+        if not candidates:
+            return {query: [] for query in cards_by_query}
+        with timed(CARD_RANKING_DURATION, "card_ranking"):
+            known, missing = self._lookup(candidates)
+            if missing:
+                vectors = await self.embeddings.aembed_documents([self._card_text(card) for _, card in missing])
+            else:
+                vectors = []
+            strategy_vector = await self.embeddings.aembed_query(strategy)
+            return self._select(cards_by_query, candidates, known, missing, vectors, strategy_vector, top_n)
+
+    def clear(self):
+        with self._lock:
+            self._vectors.clear()
+
+    def _select(self, cards_by_query: Dict[str, List[Card]], candidates: List[Tuple[str, Card]],
+                known: Dict[str, np.ndarray], missing: List[Tuple[str, Card]],
+                vectors: Sequence[Sequence[float]], strategy_vector: Sequence[float],
+                top_n: int) -> Dict[str, List[Card]]:
+        """Cache new card embeddings, score every candidate and group the best by query."""
+        for (_, card), vector in zip(missing, vectors):
+            known[self._card_key(card)] = self._normalize(np.asarray(vector, dtype=np.float32))
+        with self._lock:
+            for _, card in missing:
+                key = self._card_key(card)
+                self._vectors[key] = known[key]
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+        matrix = np.stack([known[self._card_key(card)] for _, card in candidates])
+
+        scores = self._scores(matrix, self._normalize(np.asarray(strategy_vector, dtype=np.float32)),
+                              [card.edhrec_rank for _, card in candidates])
+        best = np.argsort(-scores, kind="stable")[:top_n]
+        ranked: Dict[str, List[Card]] = {query: [] for query in cards_by_query}
+        for row in best:
+            query, card = candidates[row]
+            ranked[query].append(card)
+        return ranked
+
+    def _scores(self, matrix: np.ndarray, strategy_vector: np.ndarray,
+                edhrec_ranks: List[Optional[int]]) -> np.ndarray:
+        similarity = matrix @ strategy_vector
+        spread = similarity.max() - similarity.min()
+        similarity = (similarity - similarity.min()) / spread if spread > 0 else np.ones_like(similarity)
+
+        # Log-scaled so the gap between rank 10 and 100 counts more than 10000 and 10090;
+        # unranked cards get no popularity
+        ranks = np.array([rank if rank else np.nan for rank in edhrec_ranks], dtype=np.float64)
+        popularity = np.zeros(len(ranks), dtype=np.float32)
+        ranked = ~np.isnan(ranks)
+        if ranked.any():
+            logs = np.log1p(ranks[ranked])
+            top = logs.max()
+            popularity[ranked] = 1 - logs / top if top > 0 else 1
+        return (1 - self.edhrec_weight) * similarity + self.edhrec_weight * popularity
+
+    def _candidates(self, cards_by_query: Dict[str, List[Card]]) -> List[Tuple[str, Card]]:
+        """(query, card) for each distinct card, under the first query that found it."""
+        seen = set()
+        candidates = []
+        for query, cards in cards_by_query.items():
+            for card in cards:
+                key = self._card_key(card)
+                if key not in seen:
+                    seen.add(key)
+                    candidates.append((query, card))
+        return candidates
+
+    def _lookup(self, candidates: List[Tuple[str, Card]]
+                ) -> Tuple[Dict[str, np.ndarray], List[Tuple[str, Card]]]:
+        """Cached embeddings of the candidates by card key, and the candidates not cached yet."""
+        known = {}
+        missing = []
+        with self._lock:
+            for query, card in candidates:
+                key = self._card_key(card)
+                vector = self._vectors.get(key)
+                if vector is None:
+                    missing.append((query, card))
+                else:
+                    self._vectors.move_to_end(key)
+                    known[key] = vector
+        return known, missing
+
+    @staticmethod
+    def _card_key(card: Card) -> str:
+        return card.oracle_id or card.name
+
+    @staticmethod
+    def _card_text(card: Card) -> str:
+        """What a card does, as embedded: name, types, keywords and rules text."""
+        parts = [card.name, card.type_line]
+        if card.keywords:
+            parts.append(", ".join(card.keywords))
+        parts.append(card.oracle_text)
+        return "\n".join(part for part in parts if part)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Iterator, Optional, TypeVar, Union
+
+T = TypeVar("T")
+
+# Absolute time.monotonic() by which the current request must finish, or a function giving
+# it for work shared between requests; None for no deadline. Tasks copy it when created, so
+# it follows a request into every stage it starts
+_deadline: ContextVar[Union[None, float, Callable[[], Optional[float]]]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The current request's deadline passed before the work finished."""
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Give the enclosed work `seconds` to finish; None or 0 for no deadline. Never extends an outer one."""
+    expires = time.monotonic() + seconds if seconds else None
+    outer = expiry()
+    if outer is not None and (expires is None or outer < expires):
+        expires = outer
+    token = _deadline.set(expires)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def shared_deadline(expires: Callable[[], Optional[float]]) -> Iterator[None]:
+    """Run the enclosed work under a deadline that may move, e.g. the latest of the requests sharing it."""
+    token = _deadline.set(expires)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def expiry() -> Optional[float]:
+    """The current deadline as a time.monotonic() value, or None without one."""
+    expires = _deadline.get()
+    return expires() if callable(expires) else expires
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline (0 once passed), or None without one."""
+    expires = expiry()
+    return None if expires is None else max(0.0, expires - time.monotonic())
+
+
+def check_deadline():
+    """Raise DeadlineExceeded if the current deadline has passed."""
+    if remaining() == 0:
+        raise DeadlineExceeded("Deadline exceeded")
+
+
+async def within_deadline(awaitable: Awaitable[T]) -> T:
+    """Await, cancelling the work and raising DeadlineExceeded if the current deadline passes first."""
+    timeout = remaining()
+    if timeout is None:
+        return await awaitable
+    task = asyncio.ensure_future(awaitable)
+    try:
+        # wait() rather than wait_for(), so the work's own timeouts can't pass for the deadline
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    if not done:
+        task.cancel()
+        await asyncio.wait({task})
+        raise DeadlineExceeded("Deadline exceeded")
+    return task.result()
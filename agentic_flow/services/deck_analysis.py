@@ -0,0 +1,138 @@
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from services.card import Card
+
+# "4 Lightning Bolt", "4x Lightning Bolt (M10) 146", "Sol Ring"
+DECKLIST_LINE_RE = re.compile(
+    r"^(?:(?P<quantity>\d+)\s*x?\s+)?(?P<name>.+?)(?:\s+\([A-Za-z0-9]+\)(?:\s+\S+)?)?(?:\s+\*[A-Za-z]+\*)?$"
+)
+SECTION_HEADERS = {"deck", "main", "mainboard", "commander", "companion", "sideboard", "maybeboard"}
+# Sections that are not part of the deck being played
+EXCLUDED_SECTIONS = {"sideboard", "maybeboard"}
+
+CARD_TYPES = ("creature", "instant", "sorcery", "artifact", "enchantment", "planeswalker", "land", "battle")
+PIP_COLORS = "WUBRGC"
+LEGALITY_FORMATS = ("standard", "pioneer", "modern", "legacy", "vintage", "pauper", "commander", "brawl")
+# Mana values at or above this share the curve's last bucket
+CURVE_CAP = 7
+
+_SYMBOL_RE = re.compile(r"\{([^}]+)\}")
+
+
+class DeckEntry(NamedTuple):
+    quantity: int
+    name: str
+    section: str
+
+
+def parse_decklist(text: str) -> List[DeckEntry]:
+    """
+    Parse a decklist in the common "quantity name" text format.
+
+    Section headers ("Commander", "Sideboard", ...), "SB:" prefixes, comments
+    and set/collector-number suffixes are understood. Repeated cards within a
+    section are merged.
+    """
+    entries: Dict[tuple, int] = {}
+    section = "main"
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        header = line.lstrip("/# ").rstrip(":").lower()
+        if header in SECTION_HEADERS:
+            section = "main" if header in ("deck", "mainboard") else header
+            continue
+        if line.startswith(("#", "//")):
+            continue
+
+        line_section = section
+        if line.upper().startswith("SB:"):
+            line_section, line = "sideboard", line[3:].strip()
+        match = DECKLIST_LINE_RE.match(line)
+        if not match:
+            continue
+        key = (match.group("name"), line_section)
+        entries[key] = entries.get(key, 0) + int(match.group("quantity") or 1)
+
+    return [DeckEntry(quantity, name, section) for (name, section), quantity in entries.items()]
+
+
+def analyze_deck(entries: List[DeckEntry], cards: List[Optional[Card]]) -> Dict[str, Any]:
+    """
+    Compute deck statistics from parsed entries and their resolved cards.
+
+    Args:
+        entries: Parsed decklist entries
+        cards: The card for each entry, in order; None for unresolved names
+
+    Returns:
+        Card counts, mana curve and average mana value (nonland cards), color pips,
+        color identity, type breakdown and per-format legality
+    """
+    played = [(entry, card) for entry, card in zip(entries, cards)
+              if entry.section not in EXCLUDED_SECTIONS and card is not None]
+    not_found = [entry.name for entry, card in zip(entries, cards) if card is None]
+
+    quantity = np.array([entry.quantity for entry, _ in played], dtype=np.int32)
+    mana_value = np.array([card.cmc for _, card in played], dtype=np.float32)
+    types = np.array([[card_type in card.type_line.lower() for card_type in CARD_TYPES] for _, card in played],
+                     dtype=bool).reshape(len(played), len(CARD_TYPES))
+    pips = np.array([_pip_counts(card.mana_cost) for _, card in played],
+                    dtype=np.int32).reshape(len(played), len(PIP_COLORS))
+    legal = np.array([[fmt in card.legal for fmt in LEGALITY_FORMATS] for _, card in played],
+                     dtype=bool).reshape(len(played), len(LEGALITY_FORMATS))
+
+    nonland = ~types[:, CARD_TYPES.index("land")]
+    curve = np.bincount(np.minimum(mana_value[nonland], CURVE_CAP).astype(np.int64),
+                        weights=quantity[nonland], minlength=CURVE_CAP + 1)
+    nonland_count = int(quantity[nonland].sum())
+    identity = {color for _, card in played for color in card.color_identity}
+
+    return {
+        "total_cards": int(quantity.sum()),
+        "unique_cards": len(played),
+        "not_found": not_found,
+        "mana_curve": {(str(mv) if mv < CURVE_CAP else f"{CURVE_CAP}+"): int(count) for mv, count in enumerate(curve)},
+        "average_mana_value": round(float(mana_value[nonland] @ quantity[nonland]) / nonland_count, 2)
+        if nonland_count else 0.0,
+        "color_pips": dict(zip(PIP_COLORS, (quantity @ pips).tolist())),
+        "color_identity": "".join(color for color in "WUBRG" if color in identity),
+        "types": dict(zip(CARD_TYPES, (quantity @ types).tolist())),
+        "legality": {
+            fmt: {
+                "legal": bool(legal[:, i].all()),
+                "illegal_cards": [played[row][1].name for row in np.flatnonzero(~legal[:, i])],
+            }
+            for i, fmt in enumerate(LEGALITY_FORMATS)
+        },
+    }
+
+
+def format_deck_summary(stats: Dict[str, Any]) -> str:
+    """Render deck statistics as a compact text block for the strategist's context."""
+    curve = ", ".join(f"{mv}: {count}" for mv, count in stats["mana_curve"].items() if count)
+    pips = ", ".join(f"{color}: {count}" for color, count in stats["color_pips"].items() if count)
+    types = ", ".join(f"{card_type} {count}" for card_type, count in stats["types"].items() if count)
+    legal = ", ".join(fmt for fmt, status in stats["legality"].items() if status["legal"]) or "none"
+    return (
+        f"Deck overview: {stats['total_cards']} cards ({stats['unique_cards']} unique), "
+        f"color identity {stats['color_identity'] or 'colorless'}.\n"
+        f"Mana curve (nonland): {curve or 'none'}; average mana value {stats['average_mana_value']}.\n"
+        f"Color pips: {pips or 'none'}.\n"
+        f"Types: {types or 'none'}.\n"
+        f"Legal in: {legal}."
+    )
+
+
+def _pip_counts(mana_cost: str) -> List[int]:
+    """Colored pips per color; hybrid symbols count toward each of their colors."""
+    counts = [0] * len(PIP_COLORS)
+    for symbol in _SYMBOL_RE.findall(mana_cost):
+        for part in set(symbol.split("/")):
+            if part in PIP_COLORS:
+                counts[PIP_COLORS.index(part)] += 1
+    return counts
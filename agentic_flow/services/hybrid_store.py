@@ -0,0 +1,278 @@
+import json
+import math
+import os
+import re
+import threading
+import uuid
+from collections import Counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens for the lexical index."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed set of texts, scored with one vectorized pass per query term."""
+
+    def __init__(self, texts: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(texts)
+        lengths = np.zeros(self.size, dtype=np.float32)
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[row] = sum(counts.values())
+            for term, count in counts.items():
+                rows, tfs = postings.setdefault(term, ([], []))
+                rows.append(row)
+                tfs.append(count)
+        average = float(lengths.mean()) if self.size else 0.0
+        # Per-row length normalization, precomputed once
+        self._norm = k1 * (1 - b + b * lengths / average) if average else np.full(self.size, k1, np.float32)
+        self._postings = {
+            term: (np.array(rows, dtype=np.int32), np.array(tfs, dtype=np.float32))
+            for term, (rows, tfs) in postings.items()
+        }
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            rows, tfs = posting
+            idf = math.log(1 + (self.size - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + self._norm[rows])
+        return scores
+
+
+class _Index(NamedTuple):
+    """One consistent view of the store, replaced as a whole on reload."""
+
+    ids: List[str]
+    texts: List[str]
+    metadatas: List[dict]
+    rows: Dict[str, int]
+    matrix: np.ndarray
+    bm25: BM25Index
+    version: Optional[Tuple[int, int]]
+
+
+class HybridVectorStore(VectorStore):
+    """
+    Small-corpus vector store: brute-force cosine over a memory-mapped float32
+    matrix, blended with BM25 so exact rules terms and card names rank well.
+
+    Layout in `persist_directory`:
+        chunks.json         ids, texts and metadata of every chunk, the dimension
+                            and the name of the embeddings file
+        embeddings-*.f32    row-normalized embeddings, one row per chunk
+
+    Each write puts the embeddings in a new file and then atomically replaces
+    chunks.json, so a reader always pairs chunks with their own embeddings.
+    Readers notice the new chunks.json and reload, so several workers can share
+    one directory.
+    """
+
+    CHUNKS_FILE = "chunks.json"
+    # Written by earlier versions, which had no embeddings name in chunks.json
+    EMBEDDINGS_FILE = "embeddings.f32"
+
+    def __init__(self, embedding: Embeddings, persist_directory: str, alpha: float = 0.5):
+        """
+        Initialize the store.
+
+        Args:
+            embedding: Embeddings used for chunks and queries
+            persist_directory: Directory holding the store's files
+            alpha: Weight of the dense (cosine) score; 1 - alpha goes to BM25
+        """
+        self.embedding = embedding
+        self.persist_directory = persist_directory
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        os.makedirs(persist_directory, exist_ok=True)
+        self._index = self._load()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas, ids)
+
+    def add_embeddings(self, texts: List[str], embeddings: Sequence[Sequence[float]],
+                       metadatas: Optional[List[dict]] = None, ids: Optional[List[str]] = None) -> List[str]:
+        """Add chunks whose embeddings were computed elsewhere."""
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [f"chunk-{len(self._index.ids) + i}" for i in range(len(texts))]
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            index = self._current()
+            replaced = set(ids)
+            keep = [row for row, chunk_id in enumerate(index.ids) if chunk_id not in replaced]
+            self._write(
+                [index.ids[row] for row in keep] + ids,
+                [index.texts[row] for row in keep] + texts,
+                [index.metadatas[row] for row in keep] + metadatas,
+                np.vstack([index.matrix[keep], vectors]) if keep else vectors,
+            )
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock:
+            index = self._current()
+            drop = set(ids or [])
+            keep = [row for row, chunk_id in enumerate(index.ids) if chunk_id not in drop]
+            self._write(
+                [index.ids[row] for row in keep],
+                [index.texts[row] for row in keep],
+                [index.metadatas[row] for row in keep],
+                index.matrix[keep],
+            )
+        return True
+
+    def delete_collection(self):
+        with self._lock:
+            self._write([], [], [], np.zeros((0, 0), np.float32))
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Chunks by ID, shaped like Chroma's get()."""
+        index = self._current()
+        rows = [index.rows[chunk_id] for chunk_id in ids if chunk_id in index.rows] if ids else range(len(index.ids))
+        return {
+            "ids": [index.ids[row] for row in rows],
+            "documents": [index.texts[row] for row in rows],
+            "metadatas": [index.metadatas[row] for row in rows],
+        }
+
+    def search_ids(self, query: str, k: int = 4) -> List[str]:
+        """IDs of the k best chunks for the query, by blended dense and BM25 score."""
+        index = self._current()
+        return [index.ids[row] for row, _ in self._search(index, query, k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        index = self._current()
+        return [
+            (Document(id=index.ids[row], page_content=index.texts[row], metadata=index.metadatas[row]), score)
+            for row, score in self._search(index, query, k)
+        ]
+
+    def _select_relevance_score_fn(self):
+        # Blended scores already grow with relevance
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   persist_directory: str = "hybrid_index", ids: Optional[List[str]] = None,
+                   **kwargs: Any) -> "HybridVectorStore":
+        store = cls(embedding, persist_directory, **kwargs)
+        store.add_texts(texts, metadatas, ids)
+        return store
+
+    def _search(self, index: _Index, query: str, k: int) -> List[Tuple[int, float]]:
+        """Rows of the k best chunks with their blended scores, best first."""
+        if not index.ids:
+            return []
+        vector = self._normalize(np.asarray(self.embedding.embed_query(query), dtype=np.float32))
+        dense = index.matrix @ vector
+        lexical = index.bm25.scores(query)
+        top = lexical.max()
+        if top > 0:
+            lexical /= top
+        scores = self.alpha * dense + (1 - self.alpha) * lexical
+
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(row), float(scores[row])) for row in best]
+
+    def _write(self, ids, texts, metadatas, matrix: np.ndarray):
+        """Write a new embeddings file, atomically switch chunks.json to it, then reload."""
+        chunks_path = os.path.join(self.persist_directory, self.CHUNKS_FILE)
+        embeddings_file = f"embeddings-{uuid.uuid4().hex}.f32" if ids else None
+        if embeddings_file:
+            np.ascontiguousarray(matrix, dtype=np.float32).tofile(
+                os.path.join(self.persist_directory, embeddings_file)
+            )
+        with open(f"{chunks_path}.tmp", "w") as f:
+            json.dump({"dim": int(matrix.shape[1]) if ids else None, "embeddings": embeddings_file,
+                       "ids": ids, "texts": texts, "metadatas": metadatas}, f)
+        os.replace(f"{chunks_path}.tmp", chunks_path)
+        self._index = self._load()
+        self._remove_stale_embeddings(embeddings_file)
+
+    def _remove_stale_embeddings(self, keep: Optional[str]):
+        """Delete embeddings files chunks.json no longer names."""
+        for name in os.listdir(self.persist_directory):
+            if name != keep and name.startswith("embeddings") and name.endswith(".f32"):
+                try:
+                    # Workers still mapping the file keep their pages until they reload
+                    os.remove(os.path.join(self.persist_directory, name))
+                except OSError:
+                    pass
+
+    def _current(self) -> _Index:
+        """The loaded index, reloaded first if another process has rewritten the store."""
+        if self._version() != self._index.version:
+            self._index = self._load()
+        return self._index
+
+    def _version(self) -> Optional[Tuple[int, int]]:
+        """Identity of the current chunks.json; every atomic replace gives it a new inode."""
+        try:
+            stat = os.stat(os.path.join(self.persist_directory, self.CHUNKS_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load(self) -> _Index:
+        chunks_path = os.path.join(self.persist_directory, self.CHUNKS_FILE)
+        while True:
+            version = self._version()
+            chunks = {"dim": None, "ids": [], "texts": [], "metadatas": []}
+            if version is not None:
+                with open(chunks_path) as f:
+                    chunks = json.load(f)
+            ids = chunks["ids"]
+            if not ids:
+                matrix = np.zeros((0, 0), dtype=np.float32)
+                break
+            embeddings_path = os.path.join(self.persist_directory, chunks.get("embeddings") or self.EMBEDDINGS_FILE)
+            try:
+                # Memory-mapped read-only: pages are shared between workers and loaded on demand
+                matrix = np.memmap(embeddings_path, dtype=np.float32, mode="r", shape=(len(ids), chunks["dim"]))
+                break
+            except FileNotFoundError:
+                # A writer replaced the store between reading chunks.json and opening its embeddings
+                if self._version() == version:
+                    raise
+        return _Index(
+            ids=ids,
+            texts=chunks["texts"],
+            metadatas=chunks["metadatas"],
+            rows={chunk_id: row for row, chunk_id in enumerate(ids)},
+            matrix=matrix,
+            bm25=BM25Index(chunks["texts"]),
+            version=version,
+        )
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
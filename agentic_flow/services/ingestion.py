@@ -0,0 +1,195 @@
+import logging
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+class IngestedFile(NamedTuple):
+    """One document's chunks with their embeddings, ready to be written to the index."""
+
+    path: str
+    chunks: List[Document]
+    vectors: List[List[float]]
+
+
+def load_and_split(file_path: str, chunk_size: int, chunk_overlap: int) -> List[Document]:
+    """Parse a PDF and split it into chunks. Runs in a worker process."""
+    # Imported here so workers only load the PDF and splitter stacks
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return splitter.split_documents(PyPDFLoader(file_path).load())
+
+
+class IngestionPipeline:
+    """
+    Streaming PDF ingestion: parse and split in a process pool, embed in batches.
+
+    Documents are parsed a few at a time, so only the files being parsed or
+    embedded are held in memory, however large the corpus. Their chunks are
+    streamed into embedding calls of `batch_size` texts, with at most
+    `concurrency` calls in flight; a batch can span several documents. Failed
+    calls are retried with exponential backoff. Each document is yielded once
+    all of its chunks are embedded, so callers can persist progress per file.
+    """
+
+    def __init__(self, embeddings: Embeddings, chunk_size: int, chunk_overlap: int, workers: int = 0,
+                 batch_size: int = 100, concurrency: int = 4, max_retries: int = 5, retry_delay: float = 1.0):
+        """
+        Initialize the pipeline.
+
+        Args:
+            embeddings: Embeddings used for the chunks
+            chunk_size: Characters per chunk
+            chunk_overlap: Characters shared by consecutive chunks
+            workers: Processes parsing PDFs; 0 for one per CPU
+            batch_size: Chunks per embedding call
+            concurrency: Embedding calls in flight at once
+            max_retries: Retries of a failed embedding call before giving up
+            retry_delay: Seconds before the first retry; doubled on each further one
+        """
+        self.embeddings = embeddings
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+    def run(self, directory: str, paths: Sequence[str]) -> Iterator[IngestedFile]:
+        """
+        Parse, split and embed the given documents, yielding each as it completes.
+
+        Args:
+            directory: Directory the paths are relative to
+            paths: Relative paths of the PDFs to ingest
+
+        Yields:
+            Each document's chunks and embeddings, in completion order
+        """
+        if not paths:
+            return
+        start = time.perf_counter()
+        pending: Dict[str, Tuple[List[Document], List[Optional[List[float]]]]] = {}
+        remaining: Dict[str, int] = {}
+        in_flight: Dict[Future, List[Tuple[str, int]]] = {}
+        batch: List[Tuple[str, int]] = []
+        files_done = chunks_done = 0
+
+        def finish(future: Future) -> Iterator[IngestedFile]:
+            nonlocal files_done, chunks_done
+            slots = in_flight.pop(future)
+            for (path, index), vector in zip(slots, future.result()):
+                pending[path][1][index] = vector
+                remaining[path] -= 1
+                if remaining[path] == 0:
+                    chunks, vectors = pending.pop(path)
+                    del remaining[path]
+                    files_done += 1
+                    chunks_done += len(chunks)
+                    self._report(files_done, len(paths), chunks_done, start)
+                    yield IngestedFile(path, chunks, vectors)
+
+        def submit(executor: ThreadPoolExecutor) -> Iterator[IngestedFile]:
+            # Wait for a free slot first, so no more than `concurrency` batches are in flight
+            while len(in_flight) >= self.concurrency:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from finish(future)
+            texts = [pending[path][0][index].page_content for path, index in batch]
+            in_flight[executor.submit(self._embed, texts)] = list(batch)
+            batch.clear()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed") as executor:
+            try:
+                for path, chunks in self._parse(directory, paths):
+                    if not chunks:
+                        files_done += 1
+                        self._report(files_done, len(paths), chunks_done, start)
+                        yield IngestedFile(path, [], [])
+                        continue
+                    pending[path] = (chunks, [None] * len(chunks))
+                    remaining[path] = len(chunks)
+                    for index in range(len(chunks)):
+                        batch.append((path, index))
+                        if len(batch) == self.batch_size:
+                            yield from submit(executor)
+                if batch:
+                    yield from submit(executor)
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from finish(future)
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"Ingested {files_done} documents, {chunks_done} chunks in {elapsed:.1f}s "
+            f"({chunks_done / elapsed if elapsed else 0:.1f} chunks/s)"
+        )
+
+    def _parse(self, directory: str, paths: Sequence[str]) -> Iterator[Tuple[str, List[Document]]]:
+        """Parsed and split documents, in completion order."""
+        workers = min(self.workers, len(paths))
+        if workers <= 1:
+            # Not worth starting a pool for
+            for path in paths:
+                yield path, load_and_split(os.path.join(directory, path), self.chunk_size, self.chunk_overlap)
+            return
+
+        # Spawned rather than forked: the parent may hold threads (HTTP clients, event loops)
+        context = multiprocessing.get_context("spawn")
+        queued = iter(paths)
+        running: Dict[Future, str] = {}
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        try:
+            # Keep each worker busy plus one parsed file waiting, no more
+            for path in queued:
+                running[self._submit_parse(executor, directory, path)] = path
+                if len(running) > workers:
+                    break
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = running.pop(future)
+                    next_path = next(queued, None)
+                    if next_path is not None:
+                        running[self._submit_parse(executor, directory, next_path)] = next_path
+                    yield path, future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _submit_parse(self, executor: ProcessPoolExecutor, directory: str, path: str) -> Future:
+        return executor.submit(load_and_split, os.path.join(directory, path), self.chunk_size, self.chunk_overlap)
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch, retrying failed calls with exponential backoff and jitter."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_delay * 2 ** attempt * random.uniform(0.5, 1.5)
+                logger.warning(f"Embedding batch of {len(texts)} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    @staticmethod
+    def _report(files_done: int, files_total: int, chunks_done: int, start: float):
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"Ingestion progress: {files_done}/{files_total} documents, {chunks_done} chunks, "
+            f"{chunks_done / elapsed if elapsed else 0:.1f} chunks/s"
+        )
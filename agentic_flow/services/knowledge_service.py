@@ -1,42 +1,246 @@
-from config import GOOGLE_API_KEY, KNOWLEDGE_BASE_DIR
+import hashlib
+import json
+import logging
+import os
+from config import (
+    GOOGLE_API_KEY, KNOWLEDGE_BASE_DIR, KNOWLEDGE_INDEX_DIR, KNOWLEDGE_BACKEND, KNOWLEDGE_HYBRID_ALPHA,
+    KNOWLEDGE_INGEST_WORKERS, KNOWLEDGE_EMBED_BATCH_SIZE, KNOWLEDGE_EMBED_CONCURRENCY, KNOWLEDGE_EMBED_MAX_RETRIES
+)
+from filelock import FileLock
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+from services.ingestion import IngestionPipeline
+
+logger = logging.getLogger(__name__)
 
 class KnowledgeBaseRetriever:
     """Service for retrieving information from the knowledge base."""
-    
-    def __init__(self, embedding_model="models/text-embedding-004"):
-        """Initialize the knowledge base retriever."""
+
+    COLLECTION_NAME = "knowledge_base"
+    MANIFEST_FILE = "manifest.json"
+    # Chunks buffered across documents before a write; the hybrid store rewrites its whole matrix per write
+    WRITE_BATCH_CHUNKS = 5000
+
+    def __init__(self, embedding_model="models/text-embedding-004", chunk_size=1500, chunk_overlap=150,
+                 index_dir=None, backend=None):
+        """
+        Initialize the knowledge base retriever.
+
+        Args:
+            backend: "chroma", or "hybrid" for the NumPy dense + BM25 store
+        """
         self.knowledge_dir = KNOWLEDGE_BASE_DIR
+        self.backend = backend or KNOWLEDGE_BACKEND
+        if self.backend not in ("chroma", "hybrid"):
+            raise ValueError(f"Unknown knowledge base backend: {self.backend}")
+        self.index_dir = index_dir or KNOWLEDGE_INDEX_DIR
+        if self.backend == "hybrid":
+            # Separate index and manifest, so switching backends doesn't invalidate the other
+            self.index_dir = os.path.join(self.index_dir, "hybrid")
         self.embedding_model = embedding_model
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
         self.vector_store = None
         self.embeddings = None
-    
-    def initialize(self):
-        """Initialize the vector store with documents from the knowledge base."""
+        self.manifest = None
+
+    @property
+    def settings(self):
+        """Settings that invalidate every stored chunk when they change."""
+        return {
+            "embedding_model": self.embedding_model,
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+        }
+
+    @property
+    def version(self):
+        """Short digest identifying the indexed content, for keying downstream caches."""
+        manifest = self.manifest or self._load_manifest()
+        files = {path: entry["sha256"] for path, entry in manifest["files"].items()}
+        payload = json.dumps({"settings": manifest["settings"], "files": files}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    def initialize(self, update=True):
+        """
+        Open the persisted vector store, bringing it up to date with the knowledge base.
+
+        Args:
+            update: Embed new/changed documents and drop deleted ones before returning
+        """
         # Initialize embeddings
         self.embeddings = GoogleGenerativeAIEmbeddings(
-            model=self.embedding_model, 
+            model=self.embedding_model,
             google_api_key=GOOGLE_API_KEY
         )
-        
-        # Load documents
-        loader = DirectoryLoader(self.knowledge_dir, glob="**/*.pdf", loader_cls=PyPDFLoader)
-        documents = loader.load()
-        
-        # Split documents
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=150)
-        splits = text_splitter.split_documents(documents)
-        
-        # Create vector store
-        self.vector_store = Chroma.from_documents(documents=splits, embedding=self.embeddings)
-        
+
+        self.vector_store = self._open_store()
+        self.manifest = self._load_manifest()
+
+        if update:
+            self.update()
+
+        return self
+
+    def update(self):
+        """Incrementally sync the index with the documents on disk."""
+        if self.vector_store is None:
+            return self.initialize()
+
+        with FileLock(os.path.join(self.index_dir, ".lock")):
+            # Another worker may have updated the index while we waited
+            self.manifest = self._load_manifest()
+
+            if self.manifest["settings"] != self.settings:
+                logger.info("Knowledge base settings changed, rebuilding index")
+                self.vector_store.delete_collection()
+                self.vector_store = self._open_store()
+                self.manifest = {"settings": self.settings, "files": {}}
+
+            indexed = self.manifest["files"]
+            current = {path: self._file_hash(path) for path in self._list_documents()}
+
+            stale = [path for path in indexed if current.get(path) != indexed[path]["sha256"]]
+            deleted = sum(1 for path in stale if path not in current)
+            stale_ids = [chunk_id for path in stale for chunk_id in indexed.pop(path)["chunk_ids"]]
+            if stale_ids:
+                self.vector_store.delete(ids=stale_ids)
+
+            added = [path for path in current if path not in indexed]
+            pipeline = IngestionPipeline(
+                self.embeddings, self.chunk_size, self.chunk_overlap,
+                workers=KNOWLEDGE_INGEST_WORKERS,
+                batch_size=KNOWLEDGE_EMBED_BATCH_SIZE,
+                concurrency=KNOWLEDGE_EMBED_CONCURRENCY,
+                max_retries=KNOWLEDGE_EMBED_MAX_RETRIES,
+            )
+            buffered = {"ids": [], "chunks": [], "vectors": [], "files": {}}
+
+            def flush():
+                if buffered["ids"]:
+                    self._add_embedded(buffered["ids"], buffered["chunks"], buffered["vectors"])
+                indexed.update(buffered["files"])
+                # Saved after each write so an interrupted run keeps its progress
+                self._save_manifest()
+                for items in buffered.values():
+                    items.clear()
+
+            for ingested in pipeline.run(self.knowledge_dir, added):
+                path = ingested.path
+                # Chunk IDs depend on path and content, so identical copies don't collide
+                prefix = hashlib.sha256(f"{path}:{current[path]}".encode()).hexdigest()[:16]
+                chunk_ids = [f"{prefix}-{i}" for i in range(len(ingested.chunks))]
+                buffered["ids"].extend(chunk_ids)
+                buffered["chunks"].extend(ingested.chunks)
+                buffered["vectors"].extend(ingested.vectors)
+                buffered["files"][path] = {"sha256": current[path], "chunk_ids": chunk_ids}
+                if len(buffered["ids"]) >= self.WRITE_BATCH_CHUNKS:
+                    flush()
+            flush()
+            logger.info(
+                f"Knowledge base index up to date: {len(added)} embedded, "
+                f"{deleted} dropped, {len(indexed)} documents total"
+            )
+
         return self
-    
+
+    def rebuild(self):
+        """Drop the persisted index and re-embed every document."""
+        if self.vector_store is None:
+            self.initialize(update=False)
+        with FileLock(os.path.join(self.index_dir, ".lock")):
+            self.vector_store.delete_collection()
+            self.vector_store = self._open_store()
+            self.manifest = {"settings": self.settings, "files": {}}
+            self._save_manifest()
+        return self.update()
+
     def get_retriever(self, k=5):
         """Return the retriever with top k results."""
-        if not self.vector_store:
+        if self.vector_store is None:
+            self.initialize()
+        return self.vector_store.as_retriever(search_kwargs={"k": k})
+
+    def search_ids(self, query, k=5):
+        """Chunk IDs of the k chunks most similar to the query, best first."""
+        if self.vector_store is None:
             self.initialize()
-        return self.vector_store.as_retriever(search_kwargs={"k": k})
\ No newline at end of file
+        if self.backend == "hybrid":
+            return self.vector_store.search_ids(query, k)
+        embedding = self.embeddings.embed_query(query)
+        result = self.vector_store._collection.query(query_embeddings=[embedding], n_results=k, include=[])
+        return result["ids"][0]
+
+    def get_documents(self, chunk_ids):
+        """Documents for the given chunk IDs, in the same order; unknown IDs are skipped."""
+        if not chunk_ids:
+            return []
+        result = self.vector_store.get(ids=list(chunk_ids), include=["documents", "metadatas"])
+        by_id = {
+            chunk_id: Document(page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+        }
+        return [by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in by_id]
+
+    def _open_store(self):
+        """Open (or create) the persisted vector store."""
+        os.makedirs(self.index_dir, exist_ok=True)
+        if self.backend == "hybrid":
+            from services.hybrid_store import HybridVectorStore
+            return HybridVectorStore(self.embeddings, self.index_dir, alpha=KNOWLEDGE_HYBRID_ALPHA)
+
+        # Imported here so the hybrid backend doesn't pay for loading Chroma
+        from langchain_community.vectorstores import Chroma
+        return Chroma(
+            collection_name=self.COLLECTION_NAME,
+            embedding_function=self.embeddings,
+            persist_directory=self.index_dir
+        )
+
+    def _add_embedded(self, chunk_ids, chunks, vectors):
+        """Write chunks with precomputed embeddings, replacing any with the same IDs."""
+        texts = [chunk.page_content for chunk in chunks]
+        metadatas = [chunk.metadata for chunk in chunks]
+        if self.backend == "hybrid":
+            self.vector_store.add_embeddings(texts, vectors, metadatas, chunk_ids)
+            return
+        # Chroma caps the size of a single write
+        step = self.vector_store._client.get_max_batch_size()
+        for i in range(0, len(chunk_ids), step):
+            self.vector_store._collection.upsert(
+                ids=chunk_ids[i:i + step], embeddings=vectors[i:i + step],
+                documents=texts[i:i + step], metadatas=metadatas[i:i + step]
+            )
+
+    def _list_documents(self):
+        """Relative paths of every PDF under the knowledge base directory."""
+        paths = []
+        for root, _, files in os.walk(self.knowledge_dir):
+            for name in files:
+                if name.lower().endswith(".pdf"):
+                    paths.append(os.path.relpath(os.path.join(root, name), self.knowledge_dir))
+        return sorted(paths)
+
+    def _file_hash(self, path):
+        """SHA-256 of a knowledge base file's contents."""
+        digest = hashlib.sha256()
+        with open(os.path.join(self.knowledge_dir, path), "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _load_manifest(self):
+        """Read the manifest of indexed files, or an empty one."""
+        path = os.path.join(self.index_dir, self.MANIFEST_FILE)
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        return {"settings": self.settings, "files": {}}
+
+    def _save_manifest(self):
+        """Atomically write the manifest of indexed files."""
+        path = os.path.join(self.index_dir, self.MANIFEST_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
@@ -0,0 +1,89 @@
+"""
+LangChain callback metrics, kept apart from services.metrics so that importing
+the metrics registry doesn't pull in LangChain. Importing this module registers
+the handler for every chain and model run.
+"""
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+from config import METRICS_ENABLED
+from services.metrics import LLM_DURATION, LLM_TOKENS, NODE_DURATION, RETRIEVER_DURATION, record
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback handler timing graph nodes, LLM calls and retrieval.
+
+    Registered as a configure hook, so it is attached to every chain and model
+    run without threading callbacks through each call site.
+    """
+
+    # Run in the caller's context so request correlation works for async runs too
+    run_inline = True
+
+    # Run name create_retrieval_chain gives its (history-aware) retrieval step
+    RETRIEVER_RUN_NAME = "retrieve_documents"
+
+    def __init__(self):
+        self._runs: Dict[Any, Tuple[str, str, float]] = {}  # run_id -> (kind, label, start)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        name = kwargs.get("name")
+        if name and metadata and metadata.get("langgraph_node") == name and metadata.get("langgraph_step"):
+            self._runs[run_id] = ("node", name, time.perf_counter())
+        elif name == self.RETRIEVER_RUN_NAME:
+            self._runs[run_id] = ("retriever", "", time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        kind, label, start = run
+        elapsed = time.perf_counter() - start
+        if kind == "node":
+            NODE_DURATION.observe(elapsed, node=label)
+            record(f"node.{label}", elapsed)
+        else:
+            RETRIEVER_DURATION.observe(elapsed)
+            record("retriever", elapsed)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._runs.pop(run_id, None)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start_llm(run_id, serialized, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start_llm(run_id, serialized, metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        _, model, start = run
+        elapsed = time.perf_counter() - start
+        LLM_DURATION.observe(elapsed, model=model)
+        record("llm", elapsed)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    LLM_TOKENS.inc(usage.get("input_tokens", 0), model=model, kind="prompt")
+                    LLM_TOKENS.inc(usage.get("output_tokens", 0), model=model, kind="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._runs.pop(run_id, None)
+
+    def _start_llm(self, run_id, serialized, metadata):
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name") or "unknown"
+        self._runs[run_id] = ("llm", model, time.perf_counter())
+
+
+_callback_handler_var: ContextVar[Optional[MetricsCallbackHandler]] = ContextVar(
+    "metrics_callback_handler", default=MetricsCallbackHandler() if METRICS_ENABLED else None
+)
+register_configure_hook(_callback_handler_var, inheritable=True)
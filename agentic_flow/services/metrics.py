@@ -0,0 +1,257 @@
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Request correlation: set by RequestMetricsMiddleware for the duration of a request
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Unlabeled counters are exported from the start, even while zero
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labelnames else {(): 0.0}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0.0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # key -> bucket counts + [sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels: Any) -> int:
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        return int(series[-1]) if series else 0
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        for key, values in series:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {_format_value(cumulative)}"
+            le = _format_labels(self.labelnames, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{le} {_format_value(values[-1])}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(values[-2])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(values[-1])}"
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "urza_http_request_duration_seconds", "HTTP request latency, until the last body chunk is sent.",
+    ["method", "route", "status"]
+)
+NODE_DURATION = REGISTRY.histogram(
+    "urza_node_duration_seconds", "Latency of each advisor workflow graph node.", ["node"]
+)
+WORKFLOW_DURATION = REGISTRY.histogram(
+    "urza_workflow_duration_seconds",
+    "End-to-end advisor workflow latency, by path (cards, or rules when the card search is skipped).", ["path"]
+)
+LLM_DURATION = REGISTRY.histogram(
+    "urza_llm_duration_seconds", "Latency of each LLM call.", ["model"]
+)
+LLM_TOKENS = REGISTRY.counter(
+    "urza_llm_tokens_total", "Tokens consumed by LLM calls, by kind (prompt or completion).", ["model", "kind"]
+)
+RETRIEVER_DURATION = REGISTRY.histogram(
+    "urza_retriever_duration_seconds", "Latency of knowledge base retrieval, including question rewriting."
+)
+CARD_RANKING_DURATION = REGISTRY.histogram(
+    "urza_card_ranking_duration_seconds", "Latency of re-ranking fetched cards against the strategy."
+)
+ADMISSION_QUEUE_WAIT = REGISTRY.histogram(
+    "urza_admission_queue_wait_seconds", "Time requests waited for an admission slot.", ["endpoint"]
+)
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "urza_admission_rejections_total",
+    "Requests turned away by admission control, by reason (queue_full or queue_timeout).", ["endpoint", "reason"]
+)
+DEADLINE_EXCEEDED = REGISTRY.counter(
+    "urza_deadline_exceeded_total", "Workflow stages cut off by the request deadline.", ["stage"]
+)
+SCRYFALL_REQUEST_DURATION = REGISTRY.histogram(
+    "urza_scryfall_request_duration_seconds", "Latency of Scryfall API requests.", ["endpoint", "status"]
+)
+SCRYFALL_CACHE_REQUESTS = REGISTRY.counter(
+    "urza_scryfall_cache_requests_total", "Scryfall search cache lookups, by result (hit, subsumed or miss).", ["result"]
+)
+SCRYFALL_RATE_LIMIT_SLEEP = REGISTRY.counter(
+    "urza_scryfall_rate_limit_sleep_seconds_total", "Time spent waiting on the Scryfall rate limiter."
+)
+SINGLE_FLIGHT_CALLS = REGISTRY.counter(
+    "urza_single_flight_calls_total",
+    "Coalesced calls, by role: leaders do the work, followers share an in-flight result.", ["group", "role"]
+)
+
+
+def record(name: str, seconds: float):
+    """Add a duration to the current request's timing breakdown, if inside a request."""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timed(histogram: Histogram, name: str, **labels: Any):
+    """Observe the duration of the block in a histogram and the request breakdown."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        histogram.observe(elapsed, **labels)
+        record(name, elapsed)
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware assigning each request an ID and timing it.
+
+    The ID comes from the X-Request-ID header when present and is echoed back
+    in the response. When the response finishes, a log line with the request's
+    timing breakdown (nodes, LLM, retriever, Scryfall) is written under that ID,
+    tying the aggregate /metrics histograms back to individual requests.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1") or uuid.uuid4().hex
+        timings: Dict[str, float] = {}
+        id_token = request_id_var.set(request_id)
+        timings_token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode("latin-1"))
+                ]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                self._finish(scope, status, request_id, timings, time.perf_counter() - start)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(id_token)
+            _request_timings.reset(timings_token)
+
+    @staticmethod
+    def _finish(scope, status: int, request_id: str, timings: Dict[str, float], elapsed: float):
+        route = scope.get("route")
+        route_path = getattr(route, "path", None) or "unmatched"
+        HTTP_REQUEST_DURATION.observe(elapsed, method=scope["method"], route=route_path, status=status)
+        if route_path == "/metrics":
+            return
+        breakdown = " ".join(f"{name}={seconds:.3f}" for name, seconds in sorted(timings.items()))
+        logger.info(
+            f"request_id={request_id} {scope['method']} {scope['path']} {status} {elapsed:.3f}s {breakdown}".rstrip()
+        )
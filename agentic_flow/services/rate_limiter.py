@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by every thread and event loop in the process."""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate: Tokens added per second (the sustained request rate)
+            capacity: Maximum tokens held at once (the allowed burst)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        # A thread lock rather than an asyncio.Lock, so callers on different
+        # event loops (and plain threads) draw from the same bucket
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token, returning how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    async def acquire(self) -> float:
+        """Wait for a token without blocking the event loop. Returns the time waited."""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def acquire_sync(self) -> float:
+        """Wait for a token on the calling thread. Returns the time waited."""
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List
+
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+from services.cache import LRUCache
+
+
+class CachedHistoryAwareRetriever:
+    """History-aware retriever that memoizes question rewrites and retrieval results.
+
+    Drop-in replacement for `create_history_aware_retriever`: it takes the same
+    {"input", "chat_history"} mapping and returns documents. Two caches sit in
+    front of the expensive steps:
+
+    - (history digest, question) -> standalone question, saving the rewrite LLM call
+    - standalone question -> chunk IDs, saving the embedding and vector search
+
+    Both are cleared when the knowledge base version changes. With no history the
+    question is used as is, without a rewrite call.
+    """
+
+    def __init__(self, llm, knowledge_base, prompt, k: int = 5, ttl: float = 3600,
+                 max_bytes: int = 8 * 1024 * 1024):
+        """
+        Initialize the retriever.
+
+        Args:
+            llm: Model used to rewrite follow-up questions
+            knowledge_base: KnowledgeBaseRetriever providing search_ids/get_documents
+            prompt: Contextualization prompt taking "input" and "chat_history"
+            k: Number of chunks to retrieve
+            ttl: Seconds a cached rewrite or retrieval stays valid
+            max_bytes: Budget for each of the two caches
+        """
+        self.knowledge_base = knowledge_base
+        self.k = k
+        self.rewrite_chain = prompt | llm | StrOutputParser()
+        self.rewrites = LRUCache(max_bytes, ttl)
+        self.retrievals = LRUCache(max_bytes, ttl)
+        self.version = None
+        self._lock = threading.Lock()
+
+    def as_runnable(self):
+        """Runnable usable wherever the history-aware retriever chain was."""
+        return RunnableLambda(self.retrieve, afunc=self.aretrieve).with_config(run_name="chat_retriever_chain")
+
+    def retrieve(self, inputs: Dict[str, Any], config: RunnableConfig = None) -> List[Document]:
+        self._check_version()
+        question = inputs["input"]
+        history = inputs.get("chat_history") or []
+
+        if history:
+            key = self._rewrite_key(history, question)
+            standalone = self.rewrites.get(key)
+            if standalone is None:
+                standalone = self.rewrite_chain.invoke(inputs, config)
+                self.rewrites.set(key, standalone, size=len(standalone))
+        else:
+            standalone = question
+
+        chunk_ids = self.retrievals.get(standalone)
+        if chunk_ids is None:
+            chunk_ids = self.knowledge_base.search_ids(standalone, k=self.k)
+            self.retrievals.set(standalone, chunk_ids)
+        return self.knowledge_base.get_documents(chunk_ids)
+
+    async def aretrieve(self, inputs: Dict[str, Any], config: RunnableConfig = None) -> List[Document]:
+        self._check_version()
+        question = inputs["input"]
+        history = inputs.get("chat_history") or []
+
+        if history:
+            key = self._rewrite_key(history, question)
+            standalone = self.rewrites.get(key)
+            if standalone is None:
+                standalone = await self.rewrite_chain.ainvoke(inputs, config)
+                self.rewrites.set(key, standalone, size=len(standalone))
+        else:
+            standalone = question
+
+        chunk_ids = self.retrievals.get(standalone)
+        if chunk_ids is None:
+            # The vector store client is synchronous
+            chunk_ids = await asyncio.to_thread(self.knowledge_base.search_ids, standalone, self.k)
+            self.retrievals.set(standalone, chunk_ids)
+        return await asyncio.to_thread(self.knowledge_base.get_documents, chunk_ids)
+
+    def clear(self):
+        self.rewrites.clear()
+        self.retrievals.clear()
+
+    def info(self) -> Dict[str, Any]:
+        return {"version": self.version, "rewrites": self.rewrites.info(), "retrievals": self.retrievals.info()}
+
+    def _check_version(self):
+        """Drop every cached entry when the indexed content changes."""
+        version = self.knowledge_base.version
+        with self._lock:
+            if version != self.version:
+                self.clear()
+                self.version = version
+
+    @staticmethod
+    def _rewrite_key(history, question: str) -> str:
+        """Digest of the conversation so far plus the new question."""
+        payload = json.dumps([[message.type, message.content] for message in history] + [question])
+        return hashlib.sha256(payload.encode()).hexdigest()
@@ -0,0 +1,37 @@
+import re
+
+# The strategist prompt asks for this section whenever it suggests cards
+SUGGESTIONS_SECTION = re.compile(r"parameter[- ]based card suggestions|card suggestions\s*:", re.IGNORECASE)
+
+# Asking for cards or help building a deck
+CARD_TERMS = re.compile(
+    r"\b(decks?|decklists?|build(?:ing|s)?|brew(?:ing)?|suggest(?:ions?)?|recommend(?:ations?)?|"
+    r"ideas?|archetypes?|sideboard|commander|edh|budget|upgrades?|synerg(?:y|ies)|combos?|ramp|"
+    r"removal|finishers?|win ?cons?|(?:what|which|good|best|cheap) cards?)\b",
+    re.IGNORECASE,
+)
+
+# Asking how the game works
+RULES_TERMS = re.compile(
+    r"\b(rules?|stack|priority|resolves?|resolution|layers?|state[- ]based|triggers?|triggered|"
+    r"how does|how do|what happens|when can|can i|is it legal|timing|phase|step|combat damage|"
+    r"replacement effects?|mulligan|turn structure|comprehensive rules|cr \d+)\b",
+    re.IGNORECASE,
+)
+
+CARDS = "cards"
+RULES = "rules"
+
+
+def classify_message(question: str, answer: str = "") -> str:
+    """
+    Route a message to the card search (CARDS) or straight to the answer (RULES).
+
+    A cheap local heuristic: the answer's card suggestions section, or any deck
+    building language in the question, means cards are wanted. Only questions
+    that read as pure rules questions skip the search, so ambiguous messages keep
+    the full pipeline.
+    """
+    if SUGGESTIONS_SECTION.search(answer) or CARD_TERMS.search(question):
+        return CARDS
+    return RULES if RULES_TERMS.search(question) else CARDS
@@ -0,0 +1,303 @@
+from dataclasses import dataclass
+from typing import List, Tuple, Union
+import re
+
+
+class QuerySyntaxError(ValueError):
+    """Raised when a Scryfall query cannot be parsed."""
+
+
+class UnsupportedQueryError(ValueError):
+    """Raised when a query uses syntax the local evaluator does not implement."""
+
+
+# Canonical keyword names and the aliases Scryfall accepts for them
+KEYWORD_ALIASES = {
+    "c": "c", "color": "c",
+    "id": "id", "identity": "id", "ci": "id",
+    "t": "t", "type": "t",
+    "o": "o", "oracle": "o",
+    "kw": "kw", "keyword": "kw",
+    "mv": "mv", "cmc": "mv", "manavalue": "mv",
+    "pow": "pow", "power": "pow",
+    "tou": "tou", "toughness": "tou",
+    "r": "r", "rarity": "r",
+    "f": "f", "format": "f", "legal": "f",
+    "banned": "banned",
+    "is": "is",
+    "name": "name",
+}
+
+OPERATORS = (":", "=", "!=", "<", "<=", ">", ">=")
+
+# Bit assigned to each color in a color mask
+COLOR_BITS = {"w": 1, "u": 2, "b": 4, "r": 8, "g": 16}
+
+# Named colors and color combinations, as accepted by c: and id:
+COLOR_NAMES = {
+    "white": "w", "blue": "u", "black": "b", "red": "r", "green": "g",
+    "colorless": "", "c": "",
+    "azorius": "wu", "dimir": "ub", "rakdos": "br", "gruul": "rg", "selesnya": "gw",
+    "orzhov": "wb", "izzet": "ur", "golgari": "bg", "boros": "rw", "simic": "gu",
+    "bant": "gwu", "esper": "wub", "grixis": "ubr", "jund": "brg", "naya": "rgw",
+    "abzan": "wbg", "jeskai": "urw", "sultai": "bgu", "mardu": "rwb", "temur": "gur",
+    "silverquill": "wb", "prismari": "ur", "witherbloom": "bg", "lorehold": "rw", "quandrix": "gu",
+    "chaos": "ubrg", "aggression": "brgw", "altruism": "rgwu", "growth": "gwub", "artifice": "wubr",
+    "wubrg": "wubrg", "rainbow": "wubrg", "fivecolor": "wubrg",
+}
+
+
+def parse_color_value(value: str) -> int:
+    """
+    Convert a color value (``red``, ``wr``, ``boros``) into a color bitmask.
+
+    Raises:
+        UnsupportedQueryError: If the value is not a recognised color expression
+    """
+    value = value.lower()
+    letters = COLOR_NAMES.get(value, value)
+    mask = 0
+    for letter in letters:
+        if letter not in COLOR_BITS:
+            raise UnsupportedQueryError(f"Unsupported color value: {value}")
+        mask |= COLOR_BITS[letter]
+    return mask
+
+_TERM_RE = re.compile(r"^([A-Za-z]+)(!=|<=|>=|[:=<>])(.*)$", re.DOTALL)
+
+
+@dataclass(frozen=True)
+class Term:
+    """A single search criterion such as ``t:creature`` or ``mv<=2``."""
+    key: str
+    op: str
+    value: str
+
+
+@dataclass(frozen=True)
+class Not:
+    """Negation of a sub-expression (``-t:creature``, ``-(...)``)."""
+    child: "Node"
+
+
+@dataclass(frozen=True)
+class And:
+    """Implicit conjunction of sub-expressions."""
+    children: Tuple["Node", ...]
+
+
+@dataclass(frozen=True)
+class Or:
+    """Explicit ``OR`` of sub-expressions."""
+    children: Tuple["Node", ...]
+
+
+Node = Union[Term, Not, And, Or]
+
+
+def parse_query(query: str) -> Node:
+    """
+    Parse a Scryfall search query into an expression tree.
+
+    Args:
+        query: The search query in Scryfall syntax
+
+    Returns:
+        The root node of the parsed expression
+
+    Raises:
+        QuerySyntaxError: If the query is malformed
+    """
+    tokens = _tokenize(query)
+    if not tokens:
+        raise QuerySyntaxError("Empty query")
+    parser = _Parser(tokens)
+    node = parser.parse_or()
+    if parser.pos != len(tokens):
+        raise QuerySyntaxError(f"Unexpected token {tokens[parser.pos]!r} in query: {query}")
+    return node
+
+
+def _tokenize(query: str) -> List[str]:
+    """Split a query into parentheses, negation markers and raw terms."""
+    tokens = []
+    i, n = 0, len(query)
+    while i < n:
+        ch = query[i]
+        if ch.isspace():
+            i += 1
+            continue
+        if ch in "()":
+            tokens.append(ch)
+            i += 1
+            continue
+        if ch == "-" and i + 1 < n and query[i + 1] == "(":
+            tokens.append("-")
+            i += 1
+            continue
+
+        start = i
+        while i < n and not query[i].isspace() and query[i] not in "()":
+            if query[i] == '"':
+                end = query.find('"', i + 1)
+                if end == -1:
+                    raise QuerySyntaxError(f"Unterminated quote in query: {query}")
+                i = end + 1
+            else:
+                i += 1
+        tokens.append(query[start:i])
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser over the token list."""
+
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def parse_or(self) -> Node:
+        children = [self.parse_and()]
+        while self._peek() is not None and self._peek().upper() == "OR":
+            self.pos += 1
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(tuple(children))
+
+    def parse_and(self) -> Node:
+        children = []
+        while True:
+            token = self._peek()
+            if token is None or token == ")" or token.upper() == "OR":
+                break
+            if token.upper() == "AND":
+                self.pos += 1
+                continue
+            children.append(self.parse_unary())
+        if not children:
+            raise QuerySyntaxError("Expected a search term")
+        return children[0] if len(children) == 1 else And(tuple(children))
+
+    def parse_unary(self) -> Node:
+        token = self._peek()
+        if token == "-":
+            self.pos += 1
+            return Not(self.parse_unary())
+        if token == "(":
+            self.pos += 1
+            node = self.parse_or()
+            if self._peek() != ")":
+                raise QuerySyntaxError("Unbalanced parentheses")
+            self.pos += 1
+            return node
+        self.pos += 1
+        return _parse_term(token)
+
+
+def _parse_term(token: str) -> Node:
+    """Convert a raw token into a (possibly negated) term."""
+    negated = token.startswith("-") and len(token) > 1
+    if negated:
+        token = token[1:]
+
+    if token.startswith("!"):
+        term = Term("name", "=", _unquote(token[1:]))
+    else:
+        match = _TERM_RE.match(token)
+        if match and match.group(1).lower() in KEYWORD_ALIASES:
+            key = KEYWORD_ALIASES[match.group(1).lower()]
+            term = Term(key, match.group(2), _unquote(match.group(3)))
+        elif match:
+            raise UnsupportedQueryError(f"Unsupported search keyword: {match.group(1)}")
+        else:
+            term = Term("name", ":", _unquote(token))
+
+    if not term.value:
+        raise QuerySyntaxError(f"Missing value in term: {token}")
+    return Not(term) if negated else term
+
+
+def _unquote(value: str) -> str:
+    """Strip surrounding double quotes from a term value."""
+    if len(value) >= 2 and value.startswith('"') and value.endswith('"'):
+        return value[1:-1]
+    if value.startswith("/"):
+        raise UnsupportedQueryError("Regular expression searches are not supported")
+    return value
+
+
+# Values that must be quoted to survive re-parsing as the same term
+_NEEDS_QUOTES_RE = re.compile(r'[\s():!"]|^-|^(and|or)$', re.IGNORECASE)
+
+
+def canonicalize(node: Node) -> Node:
+    """
+    Rewrite an expression into a canonical form with the same meaning.
+
+    Values are lowercased, color values become WUBRG-ordered letters, nested
+    AND/OR groups are flattened (dropping redundant parentheses), duplicate
+    children are removed, children are sorted, and double negations cancel.
+    """
+    if isinstance(node, Term):
+        return _canonical_term(node)
+    if isinstance(node, Not):
+        child = canonicalize(node.child)
+        return child.child if isinstance(child, Not) else Not(child)
+
+    group = type(node)
+    children = {}
+    for child in node.children:
+        child = canonicalize(child)
+        for part in (child.children if isinstance(child, group) else (child,)):
+            children.setdefault(format_query(part), part)
+    ordered = tuple(children[key] for key in sorted(children))
+    return ordered[0] if len(ordered) == 1 else group(ordered)
+
+
+def format_query(node: Node) -> str:
+    """Render an expression tree back into Scryfall syntax."""
+    if isinstance(node, Term):
+        value = f'"{node.value}"' if _NEEDS_QUOTES_RE.search(node.value) else node.value
+        if node.key == "name" and node.op == ":":
+            return value
+        if node.key == "name" and node.op == "=":
+            return f'!"{node.value}"'
+        return f"{node.key}{node.op}{value}"
+    if isinstance(node, Not):
+        inner = format_query(node.child)
+        return f"-{inner}" if isinstance(node.child, Term) else f"-({inner})"
+    if isinstance(node, And):
+        return " ".join(f"({format_query(child)})" if isinstance(child, Or) else format_query(child)
+                        for child in node.children)
+    return " or ".join(format_query(child) for child in node.children)
+
+
+def canonical_query(query: str) -> str:
+    """
+    Canonical text of a query, for use as a cache key.
+
+    Queries that cannot be parsed fall back to their whitespace-normalized text.
+    """
+    try:
+        return format_query(canonicalize(parse_query(query)))
+    except ValueError:
+        return " ".join(query.split())
+
+
+def conjuncts(node: Node) -> Tuple[Node, ...]:
+    """The top-level AND terms of an expression (the expression itself if it is not an AND)."""
+    return node.children if isinstance(node, And) else (node,)
+
+
+def _canonical_term(term: Term) -> Term:
+    value = term.value.lower()
+    if term.key in ("c", "id"):
+        try:
+            mask = parse_color_value(value)
+        except UnsupportedQueryError:
+            # Not a color (e.g. c:m for multicolored); keep it as written
+            return Term(term.key, term.op, value)
+        value = "".join(letter for letter in "wubrg" if mask & COLOR_BITS[letter]) or "c"
+    return Term(term.key, term.op, value)
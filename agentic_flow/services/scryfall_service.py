@@ -1,109 +1,548 @@
-import requests
-from typing import Dict, List, Any, Optional
+import asyncio
+import httpx
+import threading
 import time
+import weakref
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
 import logging
+from services.cache import LRUCache, SQLiteCache, TieredCache
+from services.deadline import check_deadline, remaining
+from services.card import Card, as_card
+from services.metrics import (
+    SCRYFALL_CACHE_REQUESTS, SCRYFALL_RATE_LIMIT_SLEEP, SCRYFALL_REQUEST_DURATION, record
+)
+from services.rate_limiter import TokenBucket
+from services.scryfall_query import (
+    And, UnsupportedQueryError, canonical_query, canonicalize, conjuncts, format_query, parse_query
+)
+from services.single_flight import SingleFlight
+from config import (
+    SCRYFALL_BULK_DATA, SCRYFALL_INDEX_CACHE, SCRYFALL_RATE_LIMIT, SCRYFALL_BURST,
+    SCRYFALL_MAX_CONNECTIONS, SCRYFALL_CACHE_TTL, SCRYFALL_CACHE_MAX_BYTES, SCRYFALL_CACHE_DB,
+    SCRYFALL_CACHE_DB_MAX_ENTRIES
+)
 
 logger = logging.getLogger(__name__)
 
-class ScryfallService:
-    """Service for interacting with the Scryfall API."""
-    
+class AsyncScryfallService:
+    """Asynchronous service for interacting with the Scryfall API."""
+
     BASE_URL = "https://api.scryfall.com"
-    
-    # Cache to avoid repetitive API calls
-    _cache = {}
-    _cache_timeout = 3600  # 1 hour cache timeout
-    _cache_timestamp = {}
-    
-    # Rate limiting settings
-    _last_request_time = 0
-    _min_request_interval = 0.1  # 100ms between requests to be courteous
-    
-    @classmethod
-    def search_cards(cls, query: str, order: str = "edhrec", unique: str = "cards", 
-                     max_results: Optional[int] = None) -> List[Dict[str, Any]]:
+    HEADERS = {"User-Agent": "Urza/1.0", "Accept": "application/json"}
+
+    # Bounded cache to avoid repetitive API calls, optionally backed by a shared disk tier
+    _cache = TieredCache(
+        LRUCache(max_bytes=SCRYFALL_CACHE_MAX_BYTES, ttl=SCRYFALL_CACHE_TTL),
+        SQLiteCache(SCRYFALL_CACHE_DB, ttl=SCRYFALL_CACHE_TTL, max_entries=SCRYFALL_CACHE_DB_MAX_ENTRIES or None)
+        if SCRYFALL_CACHE_DB else None
+    )
+
+    # Rate limiting shared by every caller in the process
+    _rate_limiter = TokenBucket(rate=SCRYFALL_RATE_LIMIT, capacity=SCRYFALL_BURST)
+
+    # Searches currently being fetched, shared by concurrent callers
+    _in_flight = SingleFlight("scryfall_search")
+
+    # Cards per page of /cards/search results
+    PAGE_SIZE = 175
+
+    # Most identifiers /cards/collection accepts per request
+    COLLECTION_BATCH_SIZE = 75
+
+    # Cache keys of complete (single-page) results -> (order, unique, canonical top-level terms),
+    # used to answer narrower queries by filtering a cached broader result
+    _complete_results = OrderedDict()
+    MAX_COMPLETE_RESULTS = 1024
+
+    # One pooled keep-alive client per event loop
+    _clients = weakref.WeakKeyDictionary()
+
+    # Optional in-process card store built from Scryfall bulk data
+    _local_store = None
+
+    @classmethod
+    async def search_cards(cls, query: str, order: str = "edhrec", unique: str = "cards",
+                           max_results: Optional[int] = None) -> List[Card]:
         """
         Search for cards using the Scryfall API.
-        
+
+        Only the first page of results (up to PAGE_SIZE cards) is fetched; use
+        iter_search to read further.
+
         Args:
             query: The search query in Scryfall syntax
             order: How to order the results (e.g., "edhrec", "name", "released")
             unique: The uniqueness strategy ("cards", "art", "prints")
             max_results: Maximum number of results to return
-            
+
         Returns:
-            List of card objects
+            List of cards
         """
-        # Create cache key
-        cache_key = f"{query}_{order}_{unique}"
-        
+        # Answer from the local bulk-data index when one is configured
+        local_store = await cls._aget_local_store()
+        if local_store is not None:
+            try:
+                cards = local_store.search_cards(query, order=order, unique=unique, max_results=max_results)
+                return [Card.from_scryfall(card) for card in cards]
+            except ValueError as e:
+                logger.debug(f"Local index cannot answer '{query}', using Scryfall API: {e}")
+
+        cards, _ = await cls._search_page(query, order, unique, 1)
+
+        # Limit results if needed
+        if max_results is not None:
+            return cards[:max_results]
+
+        return cards
+
+    @classmethod
+    async def iter_search(cls, query: str, order: str = "edhrec", unique: str = "cards",
+                          limit: Optional[int] = None) -> AsyncIterator[Card]:
+        """
+        Yield every card matching a query, fetching result pages lazily.
+
+        No page is requested beyond the one that reaches `limit`.
+
+        Args:
+            query: The search query in Scryfall syntax
+            order: How to order the results
+            unique: The uniqueness strategy
+            limit: Stop after this many cards; None for all of them
+        """
+        left = limit
+        async for _, cards, _ in cls.iter_pages(query, order=order, unique=unique, limit=limit):
+            for card in cards if left is None else cards[:left]:
+                yield card
+            if left is not None:
+                left -= len(cards)
+                if left <= 0:
+                    return
+
+    @classmethod
+    async def iter_pages(cls, query: str, order: str = "edhrec", unique: str = "cards", page: int = 1,
+                         limit: Optional[int] = None
+                         ) -> AsyncIterator[Tuple[int, List[Card], bool]]:
+        """
+        Yield a query's result pages, starting from `page`.
+
+        While the caller consumes one page, the next is already being fetched
+        in the background. Fetching stops at the last page, or once the pages
+        yielded so far hold `limit` cards.
+
+        Yields:
+            (page number, cards on the page, whether more pages follow)
+        """
+        local_store = await cls._aget_local_store()
+        if local_store is not None:
+            try:
+                rows = local_store.search_rows(query, order=order, unique=unique)
+            except ValueError as e:
+                logger.debug(f"Local index cannot answer '{query}', using Scryfall API: {e}")
+            else:
+                # Cards are built a page at a time, only for the pages read
+                seen = 0
+                for start in range((page - 1) * cls.PAGE_SIZE, len(rows), cls.PAGE_SIZE):
+                    has_more = start + cls.PAGE_SIZE < len(rows)
+                    cards = [Card.from_scryfall(local_store.card(row)) for row in rows[start:start + cls.PAGE_SIZE]]
+                    yield page, cards, has_more
+                    page += 1
+                    seen += len(cards)
+                    if limit is not None and seen >= limit:
+                        return
+                return
+
+        pending = asyncio.ensure_future(cls._search_page(query, order, unique, page))
+        seen = 0
+        try:
+            while pending is not None:
+                cards, has_more = await pending
+                pending = None
+                seen += len(cards)
+                if has_more and (limit is None or seen < limit):
+                    # Prefetch the next page while this one is consumed
+                    pending = asyncio.ensure_future(cls._search_page(query, order, unique, page + 1))
+                yield page, cards, has_more
+                page += 1
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    @classmethod
+    async def _search_page(cls, query: str, order: str, unique: str,
+                           page: int) -> Tuple[List[Card], bool]:
+        """Return one page of search results and whether more follow, from the cache when possible."""
+        # Equivalent spellings of a query share one cache key
+        canonical = canonical_query(query)
+        cache_key = cls._page_key(canonical, order, unique, page)
+
         # Check cache first
-        if cache_key in cls._cache:
-            cache_time = cls._cache_timestamp.get(cache_key, 0)
-            if time.time() - cache_time < cls._cache_timeout:
-                logger.debug(f"Cache hit for query: {query}")
-                cards = cls._cache[cache_key]
-                return cards[:max_results] if max_results else cards
-        
-        # Implement rate limiting
-        cls._rate_limit()
-        
+        entry = cls._cache.get(cache_key)
+        if entry is not None:
+            SCRYFALL_CACHE_REQUESTS.inc(result="hit")
+            logger.debug(f"Cache hit for query: {query} (page {page})")
+            return [as_card(card) for card in entry["data"]], entry["has_more"]
+
+        # Then try narrowing a cached complete result for a broader query
+        if page == 1:
+            cards = cls._filter_broader_result(canonical, order, unique)
+            if cards is not None:
+                SCRYFALL_CACHE_REQUESTS.inc(result="subsumed")
+                logger.debug(f"Answered query from a cached broader result: {query}")
+                cls._store_page(cache_key, cards, False, canonical, order, unique, page)
+                return cards, False
+        SCRYFALL_CACHE_REQUESTS.inc(result="miss")
+
+        # Concurrent misses for the same page share a single request
+        return await cls._in_flight.do(
+            cache_key, lambda: cls._fetch_page(query, order, unique, page, cache_key, canonical)
+        )
+
+    @classmethod
+    async def _fetch_page(cls, query: str, order: str, unique: str, page: int, cache_key: str,
+                          canonical: str) -> Tuple[List[Card], bool]:
+        """Fetch a page of search results from the API and cache it."""
         params = {
             "q": query,
             "order": order,
             "unique": unique
         }
-        
+        if page > 1:
+            params["page"] = page
+
         try:
-            logger.info(f"Searching Scryfall for: {query}")
-            response = requests.get(f"{cls.BASE_URL}/cards/search", params=params)
+            logger.info(f"Searching Scryfall for: {query}" + (f" (page {page})" if page > 1 else ""))
+            response = await cls._get("/cards/search", params=params)
             response.raise_for_status()
-            
+
             data = response.json()
-            cards = data.get("data", [])
-            
+            cards = [Card.from_scryfall(card) for card in data.get("data", [])]
+            has_more = bool(data.get("has_more"))
+
             # Update cache
-            cls._cache[cache_key] = cards
-            cls._cache_timestamp[cache_key] = time.time()
-            
-            # Limit results if needed
-            if max_results is not None:
-                return cards[:max_results]
-                
-            return cards
-        
-        except requests.exceptions.HTTPError as e:
+            cls._store_page(cache_key, cards, has_more, canonical, order, unique, page)
+            return cards, has_more
+
+        except httpx.HTTPStatusError as e:
             if e.response.status_code == 404:
                 logger.warning(f"No cards found for query: {query}")
-                return []
+                cls._store_page(cache_key, [], False, canonical, order, unique, page)
+                return [], False
             logger.error(f"HTTP error searching Scryfall: {e}")
             raise
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error searching Scryfall: {e}")
             raise
-    
+
+    @staticmethod
+    def _page_key(canonical: str, order: str, unique: str, page: int) -> str:
+        return f"{canonical}_{order}_{unique}_page{page}"
+
+    @classmethod
+    def _store_page(cls, cache_key: str, cards: List[Card], has_more: bool, canonical: str,
+                    order: str, unique: str, page: int):
+        """Cache a page of results, remembering first pages that hold every matching card."""
+        cls._cache.set(cache_key, {"data": cards, "has_more": has_more})
+        if page != 1 or has_more or unique != "cards":
+            return
+        try:
+            terms = frozenset(format_query(term) for term in conjuncts(parse_query(canonical)))
+        except ValueError:
+            return
+        cls._complete_results[cache_key] = (order, unique, terms)
+        cls._complete_results.move_to_end(cache_key)
+        while len(cls._complete_results) > cls.MAX_COMPLETE_RESULTS:
+            cls._complete_results.popitem(last=False)
+
+    @classmethod
+    def _filter_broader_result(cls, canonical: str, order: str,
+                               unique: str) -> Optional[List[Card]]:
+        """
+        Answer a conjunctive query from a cached complete result whose terms are a subset of its own.
+
+        Only applies when the extra terms are ones card_index.filter_cards evaluates exactly.
+
+        Returns:
+            The matching cards in the broader result's order, or None if no broader result applies
+        """
+        if unique != "cards" or not cls._complete_results:
+            return None
+        from services.card_index import filter_cards
+        try:
+            terms = {format_query(term): term for term in conjuncts(canonicalize(parse_query(canonical)))}
+        except ValueError:
+            return None
+
+        wanted = frozenset(terms)
+        candidates = sorted(
+            ((key, broader) for key, (broader_order, broader_unique, broader) in list(cls._complete_results.items())
+             if broader_order == order and broader_unique == unique and broader < wanted),
+            key=lambda item: len(item[1]), reverse=True
+        )
+        # Prefer the narrowest broader result still in the cache
+        for key, broader in candidates:
+            entry = cls._cache.get(key)
+            if entry is None:
+                cls._complete_results.pop(key, None)
+                continue
+            extra = [terms[term] for term in sorted(wanted - broader)]
+            try:
+                return filter_cards([as_card(card) for card in entry["data"]], extra[0] if len(extra) == 1 else And(tuple(extra)))
+            except UnsupportedQueryError:
+                # Only terms matched exactly as Scryfall does may narrow a result
+                continue
+        return None
+
     @classmethod
-    def get_card(cls, card_id: str) -> Optional[Dict[str, Any]]:
+    async def search_many(cls, queries: List[str], order: str = "edhrec", unique: str = "cards",
+                          max_results: Optional[int] = None) -> List[Union[List[Card], Exception]]:
+        """
+        Run several searches concurrently.
+
+        Returns:
+            One entry per query, in order: the card list, or the exception that query raised
+        """
+        return await asyncio.gather(
+            *(cls.search_cards(query, order=order, unique=unique, max_results=max_results)
+              for query in queries),
+            return_exceptions=True
+        )
+
+    @classmethod
+    async def get_card(cls, card_id: str) -> Optional[Card]:
         """Get a specific card by its Scryfall ID."""
-        # Implement rate limiting
-        cls._rate_limit()
-        
+        cache_key = cls._card_key({"id": card_id})
+        card = cls._cache.get(cache_key)
+        if card is not None:
+            return as_card(card)
         try:
-            response = requests.get(f"{cls.BASE_URL}/cards/{card_id}")
+            response = await cls._get(f"/cards/{card_id}")
             response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
+            card = Card.from_scryfall(response.json())
+            cls._cache.set(cache_key, card)
+            return card
+        except httpx.HTTPError as e:
             logger.error(f"Error fetching card {card_id}: {e}")
             return None
-    
-    @classmethod
-    def _rate_limit(cls):
-        """Implement rate limiting to be courteous to the Scryfall API."""
-        current_time = time.time()
-        time_since_last_request = current_time - cls._last_request_time
-        
-        if time_since_last_request < cls._min_request_interval:
-            sleep_time = cls._min_request_interval - time_since_last_request
-            time.sleep(sleep_time)
-        
-        cls._last_request_time = time.time()
\ No newline at end of file
+
+    @classmethod
+    async def get_cards(cls, identifiers: List[Dict[str, str]]) -> List[Optional[Card]]:
+        """
+        Resolve many cards at once through /cards/collection.
+
+        Cached cards are answered locally; the rest are requested in batches of
+        COLLECTION_BATCH_SIZE identifiers, concurrently under the shared rate limit.
+
+        Args:
+            identifiers: Scryfall card identifiers, e.g. {"name": "Sol Ring"} or {"id": "..."}
+
+        Returns:
+            One entry per identifier, in order: the card, or None if it was not found
+        """
+        keys = [cls._card_key(identifier) for identifier in identifiers]
+        found = {}
+        for key in set(keys):
+            card = cls._cache.get(key)
+            if card is not None:
+                found[key] = as_card(card)
+
+        missing = list({key: identifier for key, identifier in zip(keys, identifiers) if key not in found}.items())
+        batches = [missing[i:i + cls.COLLECTION_BATCH_SIZE]
+                   for i in range(0, len(missing), cls.COLLECTION_BATCH_SIZE)]
+        for batch in await asyncio.gather(*(cls._fetch_collection(batch) for batch in batches)):
+            found.update(batch)
+
+        return [found.get(key) for key in keys]
+
+    @classmethod
+    async def _fetch_collection(cls, batch: List[Tuple[str, Dict[str, str]]]) -> Dict[str, Card]:
+        """Fetch one /cards/collection batch, caching and returning the cards found by key."""
+        try:
+            response = await cls._post("/cards/collection", json={"identifiers": [i for _, i in batch]})
+            response.raise_for_status()
+            data = response.json()
+        except httpx.HTTPError as e:
+            logger.error(f"Error fetching card collection: {e}")
+            raise
+
+        # Cards come back in request order, with unmatched identifiers left out
+        not_found = {cls._card_key(identifier) for identifier in data.get("not_found", [])}
+        if not_found:
+            logger.warning(f"Cards not found: {len(not_found)} of {len(batch)}")
+        keys = [key for key, _ in batch if key not in not_found]
+        cards = {key: Card.from_scryfall(card) for key, card in zip(keys, data.get("data", []))}
+        for key, card in cards.items():
+            cls._cache.set(key, card)
+            cls._cache.set(cls._card_key({"id": card.id}), card)
+        return cards
+
+    @staticmethod
+    def _card_key(identifier: Dict[str, str]) -> str:
+        """Cache key for a card identifier; names are matched case-insensitively."""
+        return "card:" + "|".join(f"{field}={str(value).lower()}" for field, value in sorted(identifier.items()))
+
+    @classmethod
+    def cache_info(cls) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and occupancy for each cache tier."""
+        return cls._cache.info()
+
+    @classmethod
+    async def aclose(cls):
+        """Close the pooled client belonging to the running event loop."""
+        client = cls._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    @classmethod
+    async def _get(cls, path: str, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        """Issue a rate-limited GET request on the pooled client."""
+        return await cls._request("GET", path, params=params)
+
+    @classmethod
+    async def _post(cls, path: str, json: Dict[str, Any]) -> httpx.Response:
+        """Issue a rate-limited POST request on the pooled client."""
+        return await cls._request("POST", path, json=json)
+
+    @classmethod
+    async def _request(cls, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        # Under a request deadline, don't start what can't finish and don't wait past it
+        check_deadline()
+        waited = await cls._rate_limiter.acquire()
+        if waited:
+            SCRYFALL_RATE_LIMIT_SLEEP.inc(waited)
+            record("scryfall.rate_limit_wait", waited)
+        check_deadline()
+        timeout = remaining()
+        if timeout is not None:
+            configured = cls._get_client().timeout.read
+            kwargs.setdefault("timeout", min(timeout, configured) if configured else timeout)
+
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await cls._get_client().request(method, path, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            SCRYFALL_REQUEST_DURATION.observe(elapsed, endpoint=cls._endpoint(path), status=status)
+            record("scryfall", elapsed)
+
+    @staticmethod
+    def _endpoint(path: str) -> str:
+        """Metric label for a request path, collapsing card IDs."""
+        if path in ("/cards/search", "/cards/named", "/cards/collection"):
+            return path
+        return "/cards/:id" if path.startswith("/cards/") else path
+
+    @classmethod
+    def _get_client(cls) -> httpx.AsyncClient:
+        """Return the keep-alive client for the running event loop, creating it if needed."""
+        loop = asyncio.get_running_loop()
+        client = cls._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=cls.BASE_URL,
+                headers=cls.HEADERS,
+                timeout=httpx.Timeout(10.0),
+                limits=httpx.Limits(
+                    max_connections=SCRYFALL_MAX_CONNECTIONS,
+                    max_keepalive_connections=SCRYFALL_MAX_CONNECTIONS
+                )
+            )
+            cls._clients[loop] = client
+        return client
+
+    @classmethod
+    def _get_local_store(cls):
+        """Return the local card store, or None when no bulk-data file is configured."""
+        if cls._local_store is None and SCRYFALL_BULK_DATA:
+            from services.card_index import LocalCardStore
+            cls._local_store = LocalCardStore(SCRYFALL_BULK_DATA, SCRYFALL_INDEX_CACHE)
+        return cls._local_store
+
+    @classmethod
+    async def _aget_local_store(cls):
+        """Return the local card store with its index loaded, loading it in a worker thread."""
+        local_store = cls._get_local_store()
+        if local_store is not None and not local_store.loaded:
+            await asyncio.to_thread(cls.load_local_store)
+        return local_store
+
+    @classmethod
+    def load_local_store(cls):
+        """Load the local bulk-data index ahead of the first search, if one is configured."""
+        local_store = cls._get_local_store()
+        if local_store is not None:
+            # Loaded on first access
+            local_store.index
+
+
+class ScryfallService:
+    """Synchronous wrapper around AsyncScryfallService."""
+
+    BASE_URL = AsyncScryfallService.BASE_URL
+
+    @classmethod
+    def search_cards(cls, query: str, order: str = "edhrec", unique: str = "cards",
+                     max_results: Optional[int] = None) -> List[Card]:
+        """Search for cards using the Scryfall API. See AsyncScryfallService.search_cards."""
+        return _run(AsyncScryfallService.search_cards(
+            query, order=order, unique=unique, max_results=max_results
+        ))
+
+    @classmethod
+    def iter_search(cls, query: str, order: str = "edhrec", unique: str = "cards",
+                    limit: Optional[int] = None) -> Iterator[Card]:
+        """Yield every card matching a query, page by page. See AsyncScryfallService.iter_search."""
+        cards = AsyncScryfallService.iter_search(query, order=order, unique=unique, limit=limit)
+        try:
+            while True:
+                try:
+                    yield _run(cards.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            _run(cards.aclose())
+
+    @classmethod
+    def search_many(cls, queries: List[str], order: str = "edhrec", unique: str = "cards",
+                    max_results: Optional[int] = None) -> List[Union[List[Card], Exception]]:
+        """Run several searches concurrently. See AsyncScryfallService.search_many."""
+        return _run(AsyncScryfallService.search_many(
+            queries, order=order, unique=unique, max_results=max_results
+        ))
+
+    @classmethod
+    def get_card(cls, card_id: str) -> Optional[Card]:
+        """Get a specific card by its Scryfall ID."""
+        return _run(AsyncScryfallService.get_card(card_id))
+
+    @classmethod
+    def get_cards(cls, identifiers: List[Dict[str, str]]) -> List[Optional[Card]]:
+        """Resolve many cards at once. See AsyncScryfallService.get_cards."""
+        return _run(AsyncScryfallService.get_cards(identifiers))
+
+    @classmethod
+    def cache_info(cls) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and occupancy for each cache tier."""
+        return AsyncScryfallService.cache_info()
+
+
+# Event loop that runs coroutines on behalf of synchronous callers. A single
+# long-lived loop keeps its pooled client (and open connections) across calls,
+# and works even when the caller is itself running inside an event loop.
+_background_loop = None
+_background_lock = threading.Lock()
+
+
+def _run(coro):
+    """Run a coroutine on the background event loop and wait for its result."""
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_background_loop.run_forever, name="scryfall-loop", daemon=True
+            ).start()
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop).result()
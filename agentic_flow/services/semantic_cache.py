@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """LRU/TTL cache whose entries are looked up by embedding similarity of their key text.
+
+    Embeddings live in a preallocated float32 matrix, so a lookup is one
+    vectorized dot product over every cached entry.
+    """
+
+    def __init__(self, embeddings, threshold: float = 0.95, ttl: float = 86400, max_entries: int = 1000):
+        """
+        Initialize the cache.
+
+        Args:
+            embeddings: LangChain embeddings used to embed key texts
+            threshold: Minimum cosine similarity for a cached entry to match
+            ttl: Seconds an entry stays valid after it is stored
+            max_entries: Entries kept before the least recently used is evicted
+        """
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = None
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._vectors = None  # allocated on first store, once the dimension is known
+        self._expires = np.zeros(max_entries, dtype=np.float64)
+        self._values: Dict[int, Any] = {}
+        self._lru = OrderedDict()  # slot -> None, least recently used first
+        self._lock = threading.Lock()
+
+    def embed(self, text: str) -> np.ndarray:
+        """The normalized key vector of a text, for passing to both lookup and store."""
+        return self._embed(self.embeddings.embed_query(text))
+
+    async def aembed(self, text: str) -> np.ndarray:
+        """Async version of embed."""
+        return self._embed(await self.embeddings.aembed_query(text))
+
+    def lookup(self, text: str, version: Optional[str] = None,
+               vector: Optional[np.ndarray] = None) -> Optional[Any]:
+        """
+        Return the value cached for the most similar text, if similar enough.
+
+        Pass the text's vector from embed when the value may be stored after a
+        miss, so the text is embedded once.
+        """
+        if vector is None:
+            if not self._values:
+                self._count("misses")
+                return None
+            vector = self.embed(text)
+        return self._lookup_vector(vector, version)
+
+    async def alookup(self, text: str, version: Optional[str] = None,
+                      vector: Optional[np.ndarray] = None) -> Optional[Any]:
+        """Async version of lookup."""
+        if vector is None:
+            if not self._values:
+                self._count("misses")
+                return None
+            vector = await self.aembed(text)
+        return self._lookup_vector(vector, version)
+
+    def store(self, text: str, value: Any, version: Optional[str] = None, vector: Optional[np.ndarray] = None):
+        """Cache a value under the embedding of the given text, or the vector embed gave for it."""
+        self._store_vector(self.embed(text) if vector is None else vector, value, version)
+
+    async def astore(self, text: str, value: Any, version: Optional[str] = None,
+                     vector: Optional[np.ndarray] = None):
+        """Async version of store."""
+        self._store_vector(await self.aembed(text) if vector is None else vector, value, version)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+            self._lru.clear()
+            self._expires[:] = 0
+
+    def info(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self._values), "max_entries": self.max_entries}
+
+    def _lookup_vector(self, vector: np.ndarray, version: Optional[str]) -> Optional[Any]:
+        with self._lock:
+            self._check_version(version)
+            if not self._values:
+                self.stats["misses"] += 1
+                return None
+            scores = self._vectors @ vector
+            # Empty and expired slots never match
+            scores[self._expires <= time.time()] = -np.inf
+            slot = int(np.argmax(scores))
+            if scores[slot] < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            self._lru.move_to_end(slot)
+            self.stats["hits"] += 1
+            return self._values[slot]
+
+    def _store_vector(self, vector: np.ndarray, value: Any, version: Optional[str]):
+        with self._lock:
+            self._check_version(version)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            slot = self._free_slot()
+            self._vectors[slot] = vector
+            self._expires[slot] = time.time() + self.ttl
+            self._values[slot] = value
+            self._lru[slot] = None
+
+    def _free_slot(self) -> int:
+        """Find an unused slot, reclaiming expired entries and then the least recently used."""
+        now = time.time()
+        for slot in [s for s in self._lru if self._expires[s] <= now]:
+            self._release(slot)
+        if len(self._values) < self.max_entries:
+            used = set(self._values)
+            return next(s for s in range(self.max_entries) if s not in used)
+        slot = next(iter(self._lru))
+        self._release(slot)
+        self.stats["evictions"] += 1
+        return slot
+
+    def _release(self, slot: int):
+        self._values.pop(slot, None)
+        self._lru.pop(slot, None)
+        self._expires[slot] = 0
+
+    def _check_version(self, version: Optional[str]):
+        """Drop every entry when the content they were derived from changes."""
+        if version != self.version:
+            self._values.clear()
+            self._lru.clear()
+            self._expires[:] = 0
+            self.version = version
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    @staticmethod
+    def _embed(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
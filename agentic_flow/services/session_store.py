@@ -0,0 +1,316 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, messages_from_dict, messages_to_dict
+
+# (previous summary, messages leaving the window) -> new summary
+Summarizer = Callable[[str, List[BaseMessage]], str]
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """Rough token count for a message (about four characters per token)."""
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    return len(content) // 4 + 4
+
+
+def extractive_summarizer(summary: str, dropped: List[BaseMessage], max_chars: int = 1500) -> str:
+    """Summarize dropped turns by the questions the user asked, without an LLM call."""
+    questions = [
+        message.content.strip().replace("\n", " ")[:200]
+        for message in dropped
+        if isinstance(message, HumanMessage) and isinstance(message.content, str)
+    ]
+    if not questions:
+        return summary
+    addition = "The user asked: " + "; ".join(questions) + "."
+    combined = f"{summary} {addition}".strip()
+    # Keep the most recent part when the summary outgrows its budget
+    return combined[-max_chars:]
+
+
+def llm_summarizer(llm) -> Summarizer:
+    """Build a summarizer that folds dropped turns into the summary with an LLM call."""
+    from prompts.strategist_prompts import get_summary_prompt
+
+    prompt = get_summary_prompt()
+
+    def summarize(summary: str, dropped: List[BaseMessage]) -> str:
+        transcript = "\n".join(f"{message.type}: {message.content}" for message in dropped)
+        response = llm.invoke(prompt.format_messages(summary=summary or "(none)", transcript=transcript))
+        return response.content.strip()
+
+    return summarize
+
+
+class BoundedChatMessageHistory(BaseChatMessageHistory):
+    """Chat history keeping the last turns within a token budget plus a rolling summary.
+
+    Messages that fall out of the window are folded into the summary and
+    dropped, so both stored size and prompt size stay bounded. Appends are
+    compare-and-swap on a version number: if another writer saved first, the
+    append is redone on top of its result, so neither side's turn is lost.
+    """
+
+    def __init__(self, max_turns: int, token_budget: int, summarizer: Summarizer):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summarizer = summarizer
+
+    @abstractmethod
+    def _load(self) -> Tuple[str, List[BaseMessage], int]:
+        """Return the stored (summary, window, version)."""
+
+    @abstractmethod
+    def _save(self, summary: str, window: List[BaseMessage], version: Optional[int] = None) -> bool:
+        """Persist the (summary, window) if the stored version is still `version` (None for always)."""
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        summary, window, _ = self._load()
+        if summary:
+            return [SystemMessage(content=SUMMARY_PREFIX + summary)] + window
+        return window
+
+    def add_messages(self, messages: Sequence[BaseMessage]):
+        while True:
+            summary, window, version = self._load()
+            window, dropped = self._apply_window(window + list(messages))
+            if dropped:
+                summary = self.summarizer(summary, dropped)
+            if self._save(summary, window, version):
+                return
+
+    def clear(self):
+        self._save("", [])
+
+    def _apply_window(self, messages: List[BaseMessage]) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+        """Split messages into the kept window and the ones to summarize."""
+        # A turn starts at each user message
+        starts = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)] or [0]
+        if starts[0] != 0:
+            starts.insert(0, 0)
+        turn = max(0, len(starts) - self.max_turns)
+        tokens = sum(estimate_tokens(message) for message in messages[starts[turn]:])
+        # Drop whole turns while over budget, always keeping the latest one
+        while tokens > self.token_budget and turn < len(starts) - 1:
+            tokens -= sum(estimate_tokens(message) for message in messages[starts[turn]:starts[turn + 1]])
+            turn += 1
+        return messages[starts[turn]:], messages[:starts[turn]]
+
+
+class InMemoryChatMessageHistory(BoundedChatMessageHistory):
+    """Bounded history held in process memory."""
+
+    def __init__(self, max_turns: int, token_budget: int, summarizer: Summarizer):
+        super().__init__(max_turns, token_budget, summarizer)
+        self._summary = ""
+        self._window: List[BaseMessage] = []
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def _load(self) -> Tuple[str, List[BaseMessage], int]:
+        with self._lock:
+            return self._summary, list(self._window), self._version
+
+    def _save(self, summary: str, window: List[BaseMessage], version: Optional[int] = None) -> bool:
+        with self._lock:
+            if version is not None and version != self._version:
+                return False
+            self._summary = summary
+            self._window = window
+            self._version += 1
+            return True
+
+
+class SQLiteChatMessageHistory(BoundedChatMessageHistory):
+    """Bounded history stored in a SQLite database shared between workers."""
+
+    def __init__(self, store: "SQLiteSessionStore", session_id: str):
+        super().__init__(store.max_turns, store.token_budget, store.summarizer)
+        self.store = store
+        self.session_id = session_id
+
+    def _load(self) -> Tuple[str, List[BaseMessage], int]:
+        row = self.store._connection().execute(
+            "SELECT summary, messages, last_access, version FROM sessions WHERE session_id = ?", (self.session_id,)
+        ).fetchone()
+        if row is None:
+            return "", [], 0
+        summary, messages, last_access, version = row
+        if time.time() - last_access >= self.store.idle_ttl:
+            # Expired but not purged yet; the next save overwrites it
+            return "", [], version
+        return summary, messages_from_dict(json.loads(messages)), version
+
+    def _save(self, summary: str, window: List[BaseMessage], version: Optional[int] = None) -> bool:
+        with self.store._connection() as conn:
+            saved = conn.execute(
+                "INSERT INTO sessions (session_id, summary, messages, last_access, version) VALUES (?, ?, ?, ?, 1) "
+                "ON CONFLICT (session_id) DO UPDATE SET summary = excluded.summary, messages = excluded.messages, "
+                "last_access = excluded.last_access, version = sessions.version + 1"
+                + ("" if version is None else " WHERE sessions.version = ?"),
+                (self.session_id, summary, json.dumps(messages_to_dict(window)), time.time())
+                + (() if version is None else (version,))
+            ).rowcount > 0
+        if saved:
+            self.store._saved()
+        return saved
+
+
+class SessionStore(ABC):
+    """Session histories with idle-TTL expiry and a cap on the number of sessions."""
+
+    def __init__(self, max_sessions: int = 1000, idle_ttl: float = 3600, max_turns: int = 6,
+                 token_budget: int = 2000, summarizer: Optional[Summarizer] = None):
+        """
+        Initialize the store.
+
+        Args:
+            max_sessions: Sessions kept before the least recently used is evicted
+            idle_ttl: Seconds without activity after which a session is dropped
+            max_turns: Most recent question/answer turns kept verbatim
+            token_budget: Approximate token budget for the kept turns
+            summarizer: Folds turns leaving the window into the rolling summary
+        """
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summarizer = summarizer or extractive_summarizer
+
+    @abstractmethod
+    def get_history(self, session_id: str) -> BoundedChatMessageHistory:
+        """Get or create the history for a session."""
+
+    @abstractmethod
+    def reset(self, session_id: str):
+        """Forget a session."""
+
+    @abstractmethod
+    def info(self) -> Dict[str, Any]:
+        """Occupancy and eviction counters."""
+
+
+class InMemorySessionStore(SessionStore):
+    """Session store local to one process."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions = OrderedDict()  # session_id -> (history, last_access)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get_history(self, session_id: str) -> BoundedChatMessageHistory:
+        now = time.time()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._sessions.pop(session_id, None)
+            history = entry[0] if entry else InMemoryChatMessageHistory(
+                self.max_turns, self.token_budget, self.summarizer
+            )
+            self._sessions[session_id] = (history, now)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+            return history
+
+    def reset(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def info(self) -> Dict[str, Any]:
+        return {"sessions": len(self._sessions), "evictions": self.evictions}
+
+    def _evict_idle(self, now: float):
+        """Drop idle sessions; the oldest are at the front."""
+        while self._sessions:
+            session_id, (_, last_access) = next(iter(self._sessions.items()))
+            if now - last_access < self.idle_ttl:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session store in a SQLite file, so every worker sees the same sessions."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.evictions = 0
+        self._local = threading.local()
+        self._writes = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, summary TEXT NOT NULL, messages TEXT NOT NULL, last_access REAL NOT NULL, "
+                "version INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+            if "version" not in columns:
+                # Databases created before appends were versioned
+                conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+
+    def get_history(self, session_id: str) -> BoundedChatMessageHistory:
+        # No I/O here: the history wrapper calls this on the event loop. Reads treat idle
+        # sessions as empty and every save refreshes last_access
+        return SQLiteChatMessageHistory(self, session_id)
+
+    def _saved(self):
+        """Purge every 100 saves."""
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.purge()
+
+    def reset(self, session_id: str):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def purge(self):
+        """Drop idle sessions and enforce the session cap."""
+        with self._connection() as conn:
+            idle = conn.execute(
+                "DELETE FROM sessions WHERE last_access < ?", (time.time() - self.idle_ttl,)
+            ).rowcount
+            over = conn.execute(
+                "DELETE FROM sessions WHERE session_id IN ("
+                "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            ).rowcount
+        self.evictions += max(idle, 0) + max(over, 0)
+
+    def info(self) -> Dict[str, Any]:
+        (count,) = self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()
+        return {"sessions": count, "evictions": self.evictions, "path": self.path}
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread connection; WAL mode lets several workers read while one writes."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+
+def create_session_store(backend: str = "memory", path: Optional[str] = None, **kwargs) -> SessionStore:
+    """Build the configured session store ("memory" or "sqlite")."""
+    if backend == "memory":
+        return InMemorySessionStore(**kwargs)
+    if backend == "sqlite":
+        return SQLiteSessionStore(path or "sessions.db", **kwargs)
+    raise ValueError(f"Unknown session store: {backend}")
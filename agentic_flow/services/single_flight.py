@@ -0,0 +1,82 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from services.deadline import expiry, shared_deadline
+from services.metrics import SINGLE_FLIGHT_CALLS
+
+
+class _Flight:
+    """One in-flight execution and the deadlines of the callers waiting on it."""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters: List[Optional[float]] = []
+
+    def expires(self) -> Optional[float]:
+        """The latest deadline among the waiters; None if any of them has none."""
+        if not self.waiters or None in self.waiters:
+            return None
+        return max(self.waiters)
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one execution.
+
+    The first caller for a key starts the work as a task; callers arriving while
+    it is in flight await the same task instead of repeating the work. Once it
+    finishes, the next call for the key starts fresh, so results are not cached.
+    Cancelling one caller does not cancel the shared work for the others, but
+    the work is cancelled once no caller is left waiting. It runs under the
+    latest deadline of the callers still waiting on it.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize the group.
+
+        Args:
+            name: Label for the group's metrics
+        """
+        self.name = name
+        # Tasks are bound to an event loop, so in-flight work is tracked per loop
+        self._calls: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], _Flight] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Return fn()'s result, sharing one execution with concurrent callers for the key."""
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        flight = self._calls.get(flight_key)
+        waiter = expiry()
+        if flight is None:
+            SINGLE_FLIGHT_CALLS.inc(group=self.name, role="leader")
+            flight = _Flight()
+            flight.waiters.append(waiter)
+            with shared_deadline(flight.expires):
+                flight.task = loop.create_task(fn())
+            self._calls[flight_key] = flight
+            flight.task.add_done_callback(lambda done: self._finish(flight_key, flight))
+        else:
+            SINGLE_FLIGHT_CALLS.inc(group=self.name, role="follower")
+            flight.waiters.append(waiter)
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters.remove(waiter)
+            if not flight.waiters and not flight.task.done():
+                # Every caller gave up; stop the work, and let the next call start afresh
+                self._forget(flight_key, flight)
+                flight.task.cancel()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def _forget(self, flight_key, flight: _Flight):
+        if self._calls.get(flight_key) is flight:
+            del self._calls[flight_key]
+
+    def _finish(self, flight_key, flight: _Flight):
+        self._forget(flight_key, flight)
+        # Mark the exception retrieved in case every caller was cancelled
+        if not flight.task.cancelled():
+            flight.task.exception()
@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from services.admission import AdmissionController, Overloaded
+from services.deadline import deadline
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_requests_are_admitted_in_arrival_order():
+    controller = AdmissionController("test", max_concurrent=1, max_queue=5, queue_timeout=5)
+    order = []
+
+    async def request(n, hold):
+        async with controller.admit():
+            order.append(n)
+            await hold
+
+    async def main():
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(request(0, release.wait()))]
+        await asyncio.sleep(0)
+        for n in range(1, 4):
+            tasks.append(asyncio.create_task(request(n, asyncio.sleep(0))))
+            await asyncio.sleep(0)
+        assert order == [0]
+        release.set()
+        await asyncio.gather(*tasks)
+
+    run(main())
+    assert order == [0, 1, 2, 3]
+
+
+def test_full_queue_is_rejected_with_429():
+    controller = AdmissionController("test", max_concurrent=1, max_queue=1, queue_timeout=5)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit():
+                await release.wait()
+
+        tasks = [asyncio.create_task(hold()) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as rejected:
+            async with controller.admit():
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+        return rejected.value
+
+    rejected = run(main())
+    assert rejected.status_code == 429
+    assert rejected.retry_after >= 1
+
+
+def test_queue_timeout_is_rejected_with_503_and_frees_its_place():
+    controller = AdmissionController("test", max_concurrent=1, max_queue=1, queue_timeout=0.05)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as rejected:
+            async with controller.admit():
+                pass
+        release.set()
+        await holder
+        # Both the slot and the queue place are free again
+        async with controller.admit():
+            pass
+        return rejected.value
+
+    assert run(main()).status_code == 503
+    assert controller._active == 0 and not controller._waiters
+
+
+def test_queue_wait_is_cut_short_by_the_deadline():
+    controller = AdmissionController("test", max_concurrent=1, max_queue=1, queue_timeout=10)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        with deadline(0.05), pytest.raises(Overloaded):
+            async with controller.admit():
+                pass
+        release.set()
+        await holder
+        return loop.time() - start
+
+    assert run(main()) < 1
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    controller = AdmissionController("test", max_concurrent=1, max_queue=1, queue_timeout=5)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.admit():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert not controller._waiters
+        release.set()
+        await holder
+
+    run(main())
+    assert controller._active == 0
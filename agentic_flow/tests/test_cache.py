@@ -0,0 +1,105 @@
+import time
+
+import orjson
+import pytest
+
+from services.cache import LRUCache, SQLiteCache, TieredCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time()."""
+    class Clock:
+        now = 1_000_000.0
+
+        def advance(self, seconds):
+            self.now += seconds
+
+    clock = Clock()
+    monkeypatch.setattr(time, "time", lambda: clock.now)
+    return clock
+
+
+def size(value):
+    return len(orjson.dumps(value))
+
+
+def test_lru_entries_expire(clock):
+    cache = LRUCache(max_bytes=1000, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=30)
+    clock.advance(10)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.info()["expirations"] == 1
+    assert cache.info()["entries"] == 1
+
+
+def test_lru_evicts_least_recently_used_within_budget(clock):
+    cache = LRUCache(max_bytes=3 * size("xxxx"), ttl=10)
+    for key in "abc":
+        cache.set(key, "xxxx")
+    cache.get("a")
+    cache.set("d", "xxxx")
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["xxxx"] * 3
+    assert cache.info()["evictions"] == 1
+    assert cache.info()["bytes"] <= cache.max_bytes
+
+
+def test_lru_skips_values_over_budget(clock):
+    cache = LRUCache(max_bytes=4, ttl=10)
+    cache.set("big", "far too large")
+    assert cache.get("big") is None
+    assert cache.info()["bytes"] == 0
+
+
+def test_sqlite_entries_expire(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), ttl=10)
+    cache.set("a", {"data": [1]})
+    assert cache.get_entry("a") == ({"data": [1]}, 10)
+    clock.advance(4)
+    assert cache.get_entry("a") == ({"data": [1]}, 6)
+    clock.advance(6)
+    assert cache.get("a") is None
+    cache.purge()
+    assert cache.info()["entries"] == 0
+
+
+def test_sqlite_purge_keeps_the_newest_entries(tmp_path, clock):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), ttl=100, max_entries=2)
+    for key in "abc":
+        cache.set(key, key)
+        clock.advance(1)
+    cache.purge()
+    assert [cache.get(key) for key in "abc"] == [None, "b", "c"]
+    assert cache.info()["evictions"] == 1
+
+
+def test_sqlite_is_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    SQLiteCache(path, ttl=10).set("a", [1, 2])
+    assert SQLiteCache(path, ttl=10).get("a") == [1, 2]
+
+
+def test_tiered_promotes_with_the_remaining_ttl(tmp_path, clock):
+    disk = SQLiteCache(str(tmp_path / "cache.db"), ttl=10)
+    disk.set("a", "value")
+    clock.advance(8)
+
+    cache = TieredCache(LRUCache(max_bytes=1000, ttl=3600), disk)
+    assert cache.get("a") == "value"
+    assert cache.memory.get("a") == "value"
+    # The promoted copy expires with the disk entry, not a fresh memory TTL
+    clock.advance(2)
+    assert cache.memory.get("a") is None
+    assert cache.get("a") is None
+
+
+def test_tiered_writes_both_tiers(tmp_path, clock):
+    cache = TieredCache(LRUCache(max_bytes=1000, ttl=10), SQLiteCache(str(tmp_path / "cache.db"), ttl=10))
+    cache.set("a", [1])
+    cache.memory.clear()
+    assert cache.get("a") == [1]
+    cache.delete("a")
+    assert cache.get("a", "missing") == "missing"
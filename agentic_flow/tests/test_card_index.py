@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+from services.card import Card
+from services.card_index import CardIndex, LocalCardStore, filter_cards
+from services.scryfall_query import UnsupportedQueryError, parse_query
+
+
+def card(name, type_line, cmc, colors, oracle_text="", rarity="common", edhrec_rank=None,
+         power=None, toughness=None, keywords=(), legal=("commander", "legacy", "vintage"), banned=(), **extra):
+    data = {
+        "object": "card", "id": f"id-{name}", "oracle_id": f"oracle-{name}", "name": name,
+        "mana_cost": "", "cmc": cmc, "type_line": type_line, "oracle_text": oracle_text,
+        "colors": list(colors), "color_identity": list(colors), "keywords": list(keywords),
+        "rarity": rarity, "layout": "normal", "released_at": "2020-01-01",
+        "legalities": {**{fmt: "legal" for fmt in legal}, **{fmt: "banned" for fmt in banned}},
+        **extra,
+    }
+    if edhrec_rank is not None:
+        data["edhrec_rank"] = edhrec_rank
+    if power is not None:
+        data["power"], data["toughness"] = power, toughness
+    return data
+
+
+CARDS = [
+    card("Llanowar Elves", "Creature — Elf Druid", 1, "G", "{T}: Add {G}.", edhrec_rank=30, power="1", toughness="1"),
+    card("Serra Angel", "Creature — Angel", 5, "W", "Flying\nVigilance", rarity="uncommon", edhrec_rank=900,
+         power="4", toughness="4", keywords=("Flying", "Vigilance")),
+    card("Sol Ring", "Artifact", 1, "", "{T}: Add {C}{C}.", rarity="uncommon", edhrec_rank=1, banned=("legacy",)),
+    card("Counterspell", "Instant", 2, "U", "Counter target spell.", edhrec_rank=50),
+    card("Tarmogoyf", "Creature — Lhurgoyf", 2, "G", rarity="mythic", power="*", toughness="1+*"),
+    card("Krenko, Mob Boss", "Legendary Creature — Goblin Warrior", 4, "R",
+         "{T}: Create X 1/1 red Goblin creature tokens, where X is the number of Goblins you control.",
+         rarity="rare", edhrec_rank=200, power="3", toughness="3"),
+    card("Hallowed Fountain", "Land — Plains Island", 0, "",
+         "As Hallowed Fountain enters, you may pay 2 life. If you don't, it enters tapped.", rarity="rare"),
+    card("Goblin", "Token Creature — Goblin", 0, "R", layout="token"),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return CardIndex.from_cards(CARDS)
+
+
+def names(index, query, order="name"):
+    return [result["name"] for result in index.search(query, order=order)]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("t:creature", ["Krenko, Mob Boss", "Llanowar Elves", "Serra Angel", "Tarmogoyf"]),
+    ("c:g", ["Llanowar Elves", "Tarmogoyf"]),
+    ("c:colorless", ["Hallowed Fountain", "Sol Ring"]),
+    ("id<=wu -t:land", ["Counterspell", "Serra Angel", "Sol Ring"]),
+    ("mv<=1", ["Hallowed Fountain", "Llanowar Elves", "Sol Ring"]),
+    ("mv:even", ["Counterspell", "Hallowed Fountain", "Krenko, Mob Boss", "Tarmogoyf"]),
+    ("pow>=3", ["Krenko, Mob Boss", "Serra Angel"]),
+    ("pow=tou t:creature", ["Krenko, Mob Boss", "Llanowar Elves", "Serra Angel"]),
+    ("r>=rare", ["Hallowed Fountain", "Krenko, Mob Boss", "Tarmogoyf"]),
+    ("kw:flying", ["Serra Angel"]),
+    ('o:"add {c}{c}"', ["Sol Ring"]),
+    ("o:~ t:land", ["Hallowed Fountain"]),
+    ('!"sol ring"', ["Sol Ring"]),
+    ("banned:legacy", ["Sol Ring"]),
+    ("f:legacy t:artifact", []),
+    ("is:commander", ["Krenko, Mob Boss"]),
+    ("is:shockland", ["Hallowed Fountain"]),
+    ("t:goblin", ["Krenko, Mob Boss"]),
+    ("c:u or (c:w t:angel)", ["Counterspell", "Serra Angel"]),
+])
+def test_evaluator_matches_known_cards(index, query, expected):
+    assert names(index, query) == expected
+
+
+def test_orders(index):
+    assert names(index, "t:creature", order="edhrec") == [
+        "Llanowar Elves", "Krenko, Mob Boss", "Serra Angel", "Tarmogoyf"
+    ]
+    assert names(index, "t:creature", order="cmc")[0] == "Llanowar Elves"
+    with pytest.raises(UnsupportedQueryError):
+        index.search("t:creature", order="usd")
+
+
+def test_rebuilt_cards_match_the_source(index):
+    (rebuilt,) = index.search("!\"Serra Angel\"")
+    assert Card.from_scryfall(rebuilt) == Card.from_scryfall(CARDS[1])
+
+
+def test_unsupported_terms(index):
+    with pytest.raises(UnsupportedQueryError):
+        index.search("is:reserved")
+    with pytest.raises(UnsupportedQueryError):
+        index.search("r:legendary")
+
+
+def test_local_store_uses_the_binary_cache(tmp_path):
+    bulk_path = tmp_path / "oracle-cards.json"
+    bulk_path.write_text(json.dumps(CARDS))
+    first = LocalCardStore(str(bulk_path))
+    assert [c["name"] for c in first.search_cards("c:g", max_results=1)] == ["Llanowar Elves"]
+    assert (tmp_path / "oracle-cards.json.idx").exists()
+
+    second = LocalCardStore(str(bulk_path))
+    rows = second.search_rows("c:g")
+    assert [second.card(row)["name"] for row in rows] == ["Llanowar Elves", "Tarmogoyf"]
+    with pytest.raises(UnsupportedQueryError):
+        second.search_cards("c:g", unique="prints")
+
+
+def test_filter_cards_keeps_order_and_exact_terms():
+    cards = [Card.from_scryfall(data) for data in CARDS[:6]]
+    assert [c.name for c in filter_cards(cards, parse_query("mv<=2 -c:u"))] == [
+        "Llanowar Elves", "Sol Ring", "Tarmogoyf"
+    ]
+    assert filter_cards([], parse_query("c:g")) == []
+
+
+@pytest.mark.parametrize("query", ["is:commander", "t:goblin", "o:draw", "pow>=3", "c:g or name:elves"])
+def test_filter_cards_rejects_approximate_terms(query):
+    cards = [Card.from_scryfall(data) for data in CARDS[:6]]
+    with pytest.raises(UnsupportedQueryError):
+        filter_cards(cards, parse_query(query))
@@ -0,0 +1,154 @@
+import asyncio
+import time
+
+import pytest
+
+from services.deadline import (
+    DeadlineExceeded, check_deadline, deadline, expiry, remaining, within_deadline
+)
+from services.single_flight import SingleFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_no_deadline():
+    assert remaining() is None
+    check_deadline()
+    with deadline(None):
+        assert expiry() is None
+    assert run(within_deadline(asyncio.sleep(0, "done"))) == "done"
+
+
+def test_nested_deadlines_never_extend_the_outer_one():
+    with deadline(1):
+        outer = expiry()
+        with deadline(10):
+            assert expiry() == outer
+        with deadline(0.5):
+            assert expiry() < outer
+        with deadline(None):
+            assert expiry() == outer
+    assert expiry() is None
+
+
+def test_passed_deadline():
+    with deadline(0.001):
+        time.sleep(0.01)
+        assert remaining() == 0
+        with pytest.raises(DeadlineExceeded):
+            check_deadline()
+
+
+def test_within_deadline_cancels_the_work():
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        with deadline(0.05):
+            await within_deadline(work())
+
+    with pytest.raises(DeadlineExceeded):
+        run(main())
+    assert cancelled == [True]
+
+
+def test_within_deadline_passes_through_the_work_s_own_timeout():
+    async def work():
+        await asyncio.wait_for(asyncio.sleep(10), 0.01)
+
+    async def main():
+        with deadline(5):
+            await within_deadline(work())
+
+    with pytest.raises(asyncio.TimeoutError) as raised:
+        run(main())
+    assert not isinstance(raised.value, DeadlineExceeded)
+
+
+def test_deadline_follows_tasks():
+    async def main():
+        with deadline(5):
+            expected = expiry()
+            return expected, await asyncio.create_task(asyncio.sleep(0, expiry()))
+
+    expected, seen = run(main())
+    assert seen == expected
+
+
+def test_single_flight_shares_one_execution():
+    group = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(True)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def main():
+        results = await asyncio.gather(*(group.do("key", work) for _ in range(5)))
+        assert group.in_flight() == 0
+        return results, await group.do("key", work)
+
+    results, later = run(main())
+    assert results == [1] * 5
+    assert later == 2
+
+
+def test_single_flight_runs_under_the_latest_waiter_deadline():
+    group = SingleFlight("test")
+    seen = []
+
+    async def work():
+        seen.append(expiry())
+        await asyncio.sleep(0.05)
+        seen.append(expiry())
+        return "done"
+
+    async def caller(seconds):
+        with deadline(seconds):
+            return await group.do("key", work)
+
+    async def main():
+        first = asyncio.create_task(caller(1))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(caller(5))
+        return await asyncio.gather(first, second)
+
+    assert run(main()) == ["done", "done"]
+    assert seen[1] > seen[0]
+
+
+def test_single_flight_stops_once_every_waiter_leaves():
+    group = SingleFlight("test")
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def caller(seconds):
+        with deadline(seconds):
+            return await within_deadline(group.do("key", work))
+
+    async def main():
+        short = asyncio.create_task(caller(0.02))
+        longer = asyncio.create_task(caller(0.06))
+        results = await asyncio.gather(short, longer, return_exceptions=True)
+        await asyncio.sleep(0)
+        return results
+
+    results = run(main())
+    assert all(isinstance(result, DeadlineExceeded) for result in results)
+    assert cancelled == [True]
+    assert group.in_flight() == 0
@@ -0,0 +1,96 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from services.hybrid_store import BM25Index, HybridVectorStore, tokenize
+
+TEXTS = [
+    "The stack resolves last in, first out.",
+    "Trample lets excess combat damage go to the player.",
+    "Deathtouch makes any damage lethal.",
+]
+
+
+class LetterEmbeddings(Embeddings):
+    """Letter-frequency vectors: deterministic and cheap, with similar texts close together."""
+
+    def embed_query(self, text):
+        vector = np.zeros(26, dtype=np.float32)
+        for ch in text.lower():
+            if "a" <= ch <= "z":
+                vector[ord(ch) - ord("a")] += 1
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HybridVectorStore(LetterEmbeddings(), str(tmp_path))
+    store.add_texts(TEXTS, [{"n": n} for n in range(3)], ids=["stack", "trample", "deathtouch"])
+    return store
+
+
+def test_tokenize():
+    assert tokenize("Don't tap Llanowar Elves, 2 times!") == ["don't", "tap", "llanowar", "elves", "2", "times"]
+
+
+def test_bm25_prefers_rare_terms():
+    index = BM25Index(TEXTS)
+    scores = index.scores("deathtouch damage")
+    assert int(np.argmax(scores)) == 2
+    assert scores[0] == 0
+    assert not BM25Index([]).scores("anything").size
+
+
+def test_search_blends_dense_and_lexical_scores(store):
+    assert store.search_ids("trample", k=1) == ["trample"]
+    docs = store.similarity_search("how does deathtouch work", k=2)
+    assert docs[0].id == "deathtouch"
+    assert docs[0].metadata == {"n": 2}
+    assert len(store.similarity_search("stack", k=10)) == 3
+
+
+def test_add_replaces_existing_ids(store):
+    store.add_texts(["Hexproof stops opponents targeting it."], ids=["trample"])
+    assert store.get(["trample"])["documents"] == ["Hexproof stops opponents targeting it."]
+    assert len(store.get()["ids"]) == 3
+
+
+def test_delete(store):
+    store.delete(["stack"])
+    assert store.get()["ids"] == ["trample", "deathtouch"]
+    store.delete_collection()
+    assert store.get()["ids"] == []
+    assert store.similarity_search("stack") == []
+
+
+def test_writes_are_seen_by_other_instances(store, tmp_path):
+    reader = HybridVectorStore(LetterEmbeddings(), str(tmp_path))
+    assert reader.get()["ids"] == ["stack", "trample", "deathtouch"]
+    store.delete(["stack"])
+    assert reader.search_ids("stack resolves", k=3) == store.search_ids("stack resolves", k=3)
+    assert "stack" not in reader.get()["ids"]
+
+
+def test_each_write_uses_a_new_embeddings_file(store, tmp_path):
+    with open(tmp_path / HybridVectorStore.CHUNKS_FILE) as f:
+        before = json.load(f)["embeddings"]
+    store.delete(["stack"])
+    with open(tmp_path / HybridVectorStore.CHUNKS_FILE) as f:
+        after = json.load(f)["embeddings"]
+    assert before != after
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".f32")] == [after]
+
+
+def test_loads_the_legacy_layout(tmp_path):
+    vectors = HybridVectorStore._normalize(np.asarray(LetterEmbeddings().embed_documents(TEXTS), dtype=np.float32))
+    vectors.tofile(tmp_path / HybridVectorStore.EMBEDDINGS_FILE)
+    with open(tmp_path / HybridVectorStore.CHUNKS_FILE, "w") as f:
+        json.dump({"dim": 26, "ids": ["a", "b", "c"], "texts": TEXTS, "metadatas": [{}, {}, {}]}, f)
+    store = HybridVectorStore(LetterEmbeddings(), str(tmp_path))
+    assert store.search_ids("deathtouch", k=1) == ["c"]
@@ -0,0 +1,80 @@
+import pytest
+
+from services.scryfall_query import (
+    COLOR_BITS, And, Not, Or, QuerySyntaxError, Term, UnsupportedQueryError,
+    canonical_query, canonicalize, conjuncts, format_query, parse_color_value, parse_query
+)
+
+
+def test_parse_terms_and_aliases():
+    assert parse_query("type:creature cmc<=2") == And((Term("t", ":", "creature"), Term("mv", "<=", "2")))
+    assert parse_query('!"Llanowar Elves"') == Term("name", "=", "Llanowar Elves")
+    assert parse_query("goblin") == Term("name", ":", "goblin")
+
+
+def test_parse_boolean_structure():
+    node = parse_query("t:elf (c:g or c:w) -o:flying")
+    assert node == And((
+        Term("t", ":", "elf"),
+        Or((Term("c", ":", "g"), Term("c", ":", "w"))),
+        Not(Term("o", ":", "flying")),
+    ))
+    assert parse_query("-(t:land or t:creature)") == Not(Or((Term("t", ":", "land"), Term("t", ":", "creature"))))
+
+
+@pytest.mark.parametrize("query", ["", "t:elf (c:g", 'o:"draw', "t:"])
+def test_parse_rejects_malformed_queries(query):
+    with pytest.raises(QuerySyntaxError):
+        parse_query(query)
+
+
+@pytest.mark.parametrize("query", ["foo:bar", "o:/draw.*/"])
+def test_unsupported_syntax(query):
+    with pytest.raises(UnsupportedQueryError):
+        parse_query(query)
+
+
+def test_color_values():
+    assert parse_color_value("boros") == parse_color_value("rw") == COLOR_BITS["r"] | COLOR_BITS["w"]
+    assert parse_color_value("colorless") == 0
+    with pytest.raises(UnsupportedQueryError):
+        parse_color_value("purple")
+
+
+@pytest.mark.parametrize("query", [
+    "t:creature c:g mv<=2",
+    'o:"draw a card" -t:land',
+    "(c:wu or id:esper) f:commander",
+    '!"Sol Ring"',
+    "name:\"and\" kw:flying",
+    "-(t:elf or t:goblin) pow>=3",
+])
+def test_format_round_trips(query):
+    node = canonicalize(parse_query(query))
+    assert canonicalize(parse_query(format_query(node))) == node
+
+
+@pytest.mark.parametrize("first, second", [
+    ("t:creature c:g", "c:green   type:Creature"),
+    ("c:wu", "color:azorius"),
+    ("id:esper", "ci:bwu"),
+    ("t:elf (c:g or c:w)", "(color:white OR c:g) AND t:elf"),
+    ("t:elf", "t:elf t:elf"),
+    ("t:elf", "-(-t:elf)"),
+])
+def test_equivalent_queries_share_a_canonical_form(first, second):
+    assert canonical_query(first) == canonical_query(second)
+
+
+def test_different_queries_stay_distinct():
+    assert canonical_query("c:g") != canonical_query("id:g")
+    assert canonical_query("mv<=2") != canonical_query("mv<2")
+
+
+def test_canonical_query_falls_back_to_normalized_text():
+    assert canonical_query("o:/draw/   t:elf") == "o:/draw/ t:elf"
+
+
+def test_conjuncts():
+    assert conjuncts(parse_query("t:elf c:g")) == (Term("t", ":", "elf"), Term("c", ":", "g"))
+    assert conjuncts(parse_query("t:elf or c:g")) == (parse_query("t:elf or c:g"),)
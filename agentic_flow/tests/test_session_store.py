@@ -0,0 +1,120 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from services.session_store import (
+    SUMMARY_PREFIX, InMemorySessionStore, SQLiteSessionStore, create_session_store
+)
+
+
+def turn(n):
+    return [HumanMessage(content=f"question {n}"), AIMessage(content=f"answer {n}")]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    return create_session_store(request.param, str(tmp_path / "sessions.db"), max_turns=2, token_budget=1000)
+
+
+def test_window_keeps_the_latest_turns_and_summarizes_the_rest(store):
+    history = store.get_history("s")
+    for n in range(4):
+        history.add_messages(turn(n))
+    messages = store.get_history("s").messages
+    assert isinstance(messages[0], SystemMessage)
+    assert messages[0].content == SUMMARY_PREFIX + "The user asked: question 0. The user asked: question 1."
+    assert [m.content for m in messages[1:]] == ["question 2", "answer 2", "question 3", "answer 3"]
+
+
+def test_token_budget_drops_whole_turns():
+    store = InMemorySessionStore(max_turns=10, token_budget=20)
+    history = store.get_history("s")
+    history.add_messages([HumanMessage(content="q" * 40), AIMessage(content="a" * 40)])
+    history.add_messages(turn(1))
+    assert [m.content for m in history.messages[1:]] == ["question 1", "answer 1"]
+
+
+def test_append_retries_after_a_concurrent_save(store):
+    first = store.get_history("s")
+    other = store.get_history("s") if isinstance(store, SQLiteSessionStore) else first
+    load = first._load
+    raced = []
+
+    def racing_load():
+        loaded = load()
+        if not raced:
+            # Another writer saves between this read and the compare-and-swap
+            raced.append(True)
+            other.add_messages(turn("other"))
+        return loaded
+
+    first._load = racing_load
+    first.add_messages(turn("mine"))
+    assert [m.content for m in store.get_history("s").messages] == [
+        "question other", "answer other", "question mine", "answer mine"
+    ]
+
+
+def test_sqlite_workers_do_not_lose_turns(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    stores = [SQLiteSessionStore(path, max_turns=100, token_budget=100_000) for _ in range(2)]
+
+    async def converse(store, name):
+        for n in range(10):
+            await store.get_history("s").aadd_messages(turn(f"{name}{n}"))
+
+    async def main():
+        await asyncio.gather(converse(stores[0], "a"), converse(stores[1], "b"))
+
+    asyncio.run(main())
+    assert len(stores[0].get_history("s").messages) == 40
+
+
+def test_sqlite_idle_sessions_read_as_empty(tmp_path, monkeypatch):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), idle_ttl=60)
+    store.get_history("s").add_messages(turn(0))
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 60)
+    assert store.get_history("s").messages == []
+    store.get_history("s").add_messages(turn(1))
+    assert [m.content for m in store.get_history("s").messages] == ["question 1", "answer 1"]
+
+
+def test_sqlite_migrates_unversioned_databases(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE sessions (session_id TEXT PRIMARY KEY, summary TEXT NOT NULL, "
+            "messages TEXT NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO sessions VALUES ('s', '', '[]', ?)", (time.time(),))
+    store = SQLiteSessionStore(path)
+    store.get_history("s").add_messages(turn(0))
+    assert len(store.get_history("s").messages) == 2
+
+
+def test_in_memory_store_evicts_sessions(monkeypatch):
+    store = InMemorySessionStore(max_sessions=2, idle_ttl=60)
+    for session_id in "abc":
+        store.get_history(session_id).add_messages(turn(session_id))
+    assert store.info() == {"sessions": 2, "evictions": 1}
+    assert store.get_history("a").messages == []
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 60)
+    store.get_history("d")
+    assert store.info()["sessions"] == 1
+
+
+def test_reset(store):
+    store.get_history("s").add_messages(turn(0))
+    store.reset("s")
+    assert store.get_history("s").messages == []
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_session_store("redis")
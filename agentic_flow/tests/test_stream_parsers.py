@@ -0,0 +1,52 @@
+import pytest
+
+from utils.stream_parsers import JSONStringArrayParser
+
+
+def feed_all(chunks):
+    parser = JSONStringArrayParser()
+    values = []
+    for chunk in chunks:
+        values.extend(parser.feed(chunk))
+    return parser, values
+
+
+def test_whole_array():
+    parser, values = feed_all(['["t:elf c:g", "o:\\"draw a card\\""]'])
+    assert values == ["t:elf c:g", 'o:"draw a card"']
+    assert parser.started and parser.finished
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_split_chunks(size):
+    text = 'Here you go:\n```json\n["t:elf c:g", "o:\\"draw\\" mv<=2", "id:\\\\wu"]\n```'
+    _, values = feed_all(text[i:i + size] for i in range(0, len(text), size))
+    assert values == ["t:elf c:g", 'o:"draw" mv<=2', "id:\\wu"]
+
+
+def test_escape_split_across_chunks():
+    _, values = feed_all(['["o:\\', '"flash\\', '"", "t:', 'instant"]'])
+    assert values == ['o:"flash"', "t:instant"]
+
+
+def test_strings_are_yielded_as_soon_as_they_close():
+    parser = JSONStringArrayParser()
+    assert parser.feed('["t:elf", "c:') == ["t:elf"]
+    assert parser.feed('g"') == ["c:g"]
+    assert parser.feed("]") == []
+
+
+def test_unicode_escapes_and_empty_strings():
+    _, values = feed_all(['["", "name:\\u00e6ther"]'])
+    assert values == ["name:æther"]
+
+
+def test_text_outside_the_array_is_ignored():
+    parser, values = feed_all(['"not this" [', '"this"', '] "nor this"'])
+    assert values == ["this"]
+    assert parser.finished
+
+
+def test_no_array():
+    parser, values = feed_all(["t:elf c:g\n", "o:draw"])
+    assert values == [] and not parser.started
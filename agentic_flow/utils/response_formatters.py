@@ -1,22 +1,29 @@
 from typing import Dict, List, Any
+import orjson
+from services.card import Card
 
-def format_card_results(strategy: str, cards: List[Dict[str, Any]]) -> str:
-    """Format strategy and card results into a readable response."""
-    # Group cards by their query
-    cards_by_query = {}
-    for card in cards:
-        query = card.pop("query", "unknown")
-        if query not in cards_by_query:
-            cards_by_query[query] = []
-        cards_by_query[query].append(card)
-    
-    # Build the response
+def format_card_results(strategy: str, cards_by_query: Dict[str, List[Card]]) -> str:
+    """Format strategy and card results, grouped by the query that found them, into a readable response."""
     response = f"{strategy}\n\n## Cards That Match This Strategy:\n\n"
     
-    for query, query_cards in cards_by_query.items():
+    for query, cards in cards_by_query.items():
+        if not cards:
+            continue
         response += f"### Search: `{query}`\n\n"
-        for card in query_cards:
-            response += f"- **{card['name']}** ({card['mana_cost']}) - {card['type_line']}\n"
-            response += f"  {card['oracle_text']}\n\n"
+        for card in cards:
+            response += f"- **{card.name}** ({card.mana_cost}) - {card.type_line}\n"
+            response += f"  {card.oracle_text}\n\n"
     
-    return response
\ No newline at end of file
+    return response
+
+def group_card_results(cards_by_query: Dict[str, List[Card]]) -> List[Dict[str, Any]]:
+    """Card results as a list of {"query", "cards"} groups, in query order."""
+    return [{"query": query, "cards": cards} for query, cards in cards_by_query.items()]
+
+def format_sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+def format_ndjson_line(data: Dict[str, Any]) -> str:
+    """Format one newline-delimited JSON record."""
+    return orjson.dumps(data).decode() + "\n"
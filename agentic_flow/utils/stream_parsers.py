@@ -0,0 +1,52 @@
+from typing import List
+import json
+
+
+class JSONStringArrayParser:
+    """Incrementally extract the string elements of the first JSON array in a text stream.
+
+    Text before the opening bracket (prose, code fences) and after the closing
+    bracket is ignored, matching what QueryAgent._parse_queries accepts.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self._in_string = False
+        self._escaped = False
+        self._buffer = []
+
+    def feed(self, text: str) -> List[str]:
+        """Consume the next chunk of text, returning any strings completed by it."""
+        completed = []
+        for ch in text:
+            if self.finished:
+                break
+            if not self.started:
+                if ch == "[":
+                    self.started = True
+                continue
+            if self._in_string:
+                self._buffer.append(ch)
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    completed.append(self._decode("".join(self._buffer)))
+                    self._buffer = []
+            elif ch == '"':
+                self._in_string = True
+                self._buffer = [ch]
+            elif ch == "]":
+                self.finished = True
+        return [value for value in completed if value]
+
+    @staticmethod
+    def _decode(literal: str) -> str:
+        """Decode a JSON string literal, keeping the raw text if it is malformed."""
+        try:
+            return json.loads(literal)
+        except json.JSONDecodeError:
+            return literal[1:-1]
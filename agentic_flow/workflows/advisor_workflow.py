@@ -1,10 +1,22 @@
+import asyncio
+import time
 from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, Annotated, Sequence, List, Dict, Optional, Union
+from typing import TypedDict, Annotated, Sequence, List, Dict, Optional, Union, Any, AsyncIterator, Tuple
 from agents.strategist_agent import StrategistAgent
 from agents.query_agent import QueryAgent
-from utils.response_formatters import format_card_results
-from config import GOOGLE_API_KEY, STRATEGIST_MODEL, QUERY_MODEL
+from utils.response_formatters import format_card_results, group_card_results
+from services.card import Card
+from services.card_ranker import CardRanker
+from services.deadline import DeadlineExceeded, within_deadline
+from services.metrics import DEADLINE_EXCEEDED, NODE_DURATION, WORKFLOW_DURATION, record, timed
+from services.routing import CARDS, RULES, classify_message
+from services.scryfall_service import AsyncScryfallService
+from config import (
+    GOOGLE_API_KEY, STRATEGIST_MODEL, QUERY_MODEL, BATCH_CONCURRENCY, ADAPTIVE_ROUTING, CARD_RANKING_ENABLED,
+    CARD_RANKING_EDHREC_WEIGHT, CARD_RANKING_CACHE_SIZE
+)
 
 
 # Define the state for the graph
@@ -12,7 +24,9 @@ class AgentState(TypedDict):
     messages: Annotated[Sequence[Union[HumanMessage, AIMessage]], "Conversation messages"]
     strategy: Annotated[Optional[str], "Strategy recommendations"]
     queries: Annotated[Optional[List[str]], "Scryfall queries"]
-    cards: Annotated[Optional[List[Dict]], "Card results"]
+    cards: Annotated[Optional[Dict[str, List[Card]]], "Card results by query"]
+    route: Annotated[Optional[str], "Path taken: cards, or rules to skip the card search"]
+    partial: Annotated[bool, "Whether the card search missed the request deadline"]
     session_id: Annotated[str, "Conversation session ID"]
 
 class CardAdvisorWorkflow:
@@ -27,10 +41,21 @@ class CardAdvisorWorkflow:
         )
         self.query_agent = QueryAgent(
             model_name=QUERY_MODEL,
-            api_key=self.api_key
+            api_key=self.api_key,
+            ranker=self._build_ranker()
         )
         self.workflow = self._build_workflow()
     
+    def _build_ranker(self) -> Optional[CardRanker]:
+        """Card ranker sharing the knowledge base's embeddings, when ranking is enabled."""
+        if not CARD_RANKING_ENABLED:
+            return None
+        return CardRanker(
+            self.strategist.knowledge_base.embeddings,
+            edhrec_weight=CARD_RANKING_EDHREC_WEIGHT,
+            max_entries=CARD_RANKING_CACHE_SIZE
+        )
+    
     def _build_workflow(self):
         """Build the LangGraph workflow."""
         workflow = StateGraph(AgentState)
@@ -43,36 +68,69 @@ class CardAdvisorWorkflow:
                 "query": query,
                 "session_id": session_id
             })
-            return {"strategy": strategy_result["answer"]}
+            return self._strategy_update(query, strategy_result)
+        
+        async def agenerate_strategy(state: AgentState) -> AgentState:
+            query = state["messages"][-1].content
+            session_id = state["session_id"]
+            try:
+                strategy_result = await within_deadline(self.strategist.aprocess({
+                    "query": query,
+                    "session_id": session_id
+                }))
+            except DeadlineExceeded:
+                DEADLINE_EXCEEDED.inc(stage="strategist")
+                raise
+            return self._strategy_update(query, strategy_result)
         
-        # Node 2: Generate queries and fetch cards
+        # Node 2: Generate queries (unless the strategist gave them) and fetch cards
         def fetch_cards(state: AgentState) -> AgentState:
             strategy = state["strategy"]
             query_result = self.query_agent.process({
-                "strategy": strategy
+                "strategy": strategy,
+                "queries": state["queries"]
             })
             return {
                 "queries": query_result["queries"],
                 "cards": query_result["cards"]
             }
         
+        async def afetch_cards(state: AgentState) -> AgentState:
+            strategy = state["strategy"]
+            try:
+                query_result = await within_deadline(self.query_agent.aprocess({
+                    "strategy": strategy,
+                    "queries": state["queries"]
+                }))
+            except DeadlineExceeded:
+                # The strategy is still worth returning without its cards
+                DEADLINE_EXCEEDED.inc(stage="card_fetcher")
+                return {"queries": state["queries"] or [], "cards": {}, "partial": True}
+            return {
+                "queries": query_result["queries"],
+                "cards": query_result["cards"]
+            }
+        
         # Node 3: Prepare final response
         def prepare_response(state: AgentState) -> AgentState:
             strategy = state["strategy"]
             cards = state["cards"]
-            print('hahaha')
-            formatted_response = format_card_results(strategy, cards)
+            if state["route"] == RULES or state["partial"]:
+                formatted_response = strategy
+            else:
+                formatted_response = format_card_results(strategy, cards)
             final_message = AIMessage(content=formatted_response)
-            print(final_message)
             return {"messages": state["messages"] + [final_message]}
         
-        # Add nodes to the graph
-        workflow.add_node("strategist", generate_strategy)
-        workflow.add_node("card_fetcher", fetch_cards)
+        # Add nodes to the graph; nodes with I/O get native async versions for ainvoke
+        workflow.add_node("strategist", RunnableLambda(generate_strategy, afunc=agenerate_strategy))
+        workflow.add_node("card_fetcher", RunnableLambda(fetch_cards, afunc=afetch_cards))
         workflow.add_node("response_builder", prepare_response)
         
-        # Add edges to define the flow
-        workflow.add_edge("strategist", "card_fetcher")
+        # Add edges to define the flow; rules questions go straight to the response
+        workflow.add_conditional_edges(
+            "strategist", lambda state: state["route"], {CARDS: "card_fetcher", RULES: "response_builder"}
+        )
         workflow.add_edge("card_fetcher", "response_builder")
         workflow.add_edge("response_builder", END)
         
@@ -88,11 +146,219 @@ class CardAdvisorWorkflow:
             "strategy": None,
             "queries": None,
             "cards": None,
+            "route": None,
+            "partial": False,
             "session_id": session_id
         }
+        start = time.perf_counter()
         result = self.workflow.invoke(initial_state)
+        self._observe_path(result["route"], time.perf_counter() - start)
         return result["messages"][-1].content
     
+    async def aprocess_query(self, query: str, session_id: str = "default_session") -> str:
+        """Process a user query through the workflow without blocking the event loop."""
+        result = await self.arun_query(query, session_id)
+        return result["answer"]
+    
+    async def arun_query(self, query: str, session_id: str = "default_session") -> Dict[str, Any]:
+        """
+        Process a user query through the workflow, keeping the structured results.
+        
+        Returns:
+            {"answer": formatted response, "queries": Scryfall queries, "cards": cards by query,
+             "partial": whether the cards were dropped for missing the request deadline}
+        """
+        initial_state = {
+            "messages": [HumanMessage(content=query)],
+            "strategy": None,
+            "queries": None,
+            "cards": None,
+            "route": None,
+            "partial": False,
+            "session_id": session_id
+        }
+        start = time.perf_counter()
+        result = await self.workflow.ainvoke(initial_state)
+        self._observe_path(result["route"], time.perf_counter() - start)
+        return {
+            "answer": result["messages"][-1].content,
+            "queries": result["queries"] or [],
+            "cards": result["cards"] or {},
+            "partial": result["partial"]
+        }
+    
+    async def astream_query(self, query: str,
+                            session_id: str = "default_session") -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Run the advisor pipeline, yielding (event, data) pairs as each stage produces output.
+        
+        Events: "token" for each strategist answer chunk (the whole answer at once in
+        single-pass mode), then "strategy" with the full answer. After that, "query" as
+        each Scryfall query is generated and "cards" as its search completes,
+        interleaved; both are skipped for rules questions. Last comes "done" with the
+        final formatted response.
+        """
+        # Stages run outside the graph here, so they are timed as nodes explicitly
+        start = time.perf_counter()
+        search_queries = None
+        if self.strategist.single_pass:
+            # A structured response can't be streamed token by token
+            with timed(NODE_DURATION, "node.strategist", node="strategist"):
+                strategy_result = await self.strategist.aprocess({
+                    "query": query,
+                    "session_id": session_id
+                })
+            strategy, search_queries = strategy_result["answer"], strategy_result.get("queries")
+            yield "token", {"text": strategy}
+        else:
+            answer_parts = []
+            with timed(NODE_DURATION, "node.strategist", node="strategist"):
+                async for token in self.strategist.astream_answer({
+                    "query": query,
+                    "session_id": session_id
+                }):
+                    answer_parts.append(token)
+                    yield "token", {"text": token}
+            strategy = "".join(answer_parts)
+        yield "strategy", {"answer": strategy}
+        
+        route = self._route(query, strategy, search_queries)
+        queries = []
+        cards = {}
+        if route == CARDS:
+            with timed(NODE_DURATION, "node.card_fetcher", node="card_fetcher"):
+                async for event, search_query, query_cards in self.query_agent.astream_pipeline(
+                    strategy, queries=search_queries
+                ):
+                    if event == "query":
+                        queries.append(search_query)
+                        yield "query", {"query": search_query}
+                    else:
+                        yield "cards", {"query": search_query, "cards": query_cards}
+                        cards[search_query] = query_cards
+            answer = format_card_results(strategy, {query: cards[query] for query in queries if query in cards})
+        else:
+            answer = strategy
+        
+        self._observe_path(route, time.perf_counter() - start)
+        yield "done", {
+            "answer": answer,
+            "session_id": session_id,
+            "queries": queries
+        }
+    
+    async def aprocess_batch(self, messages: List[str], concurrency: int = BATCH_CONCURRENCY
+                             ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer many independent messages, yielding each result as soon as it is ready.
+        
+        Messages are answered without conversation history. Strategies come from one
+        batched strategist call; as each arrives, its queries are generated (unless the
+        strategist gave them, in single-pass mode) and its cards fetched, with at most
+        `concurrency` messages in each stage; rules questions skip the card search.
+        Identical strategies share one query generation, and equivalent Scryfall
+        queries are fetched once for the whole batch.
+        
+        Yields:
+            {"index", "message", "answer", "queries", "cards"} per message, or
+            {"index", "message", "error"} if that message failed
+        """
+        results = asyncio.Queue()
+        limit = asyncio.Semaphore(concurrency)
+        # Work shared across the batch: query generation per strategy, searches per query
+        plans = {}
+        searches = {}
+        
+        async def finish(index: int, strategy: str, queries: Optional[List[str]]):
+            if self._route(messages[index], strategy, queries) == RULES:
+                await results.put({"index": index, "message": messages[index], "answer": strategy,
+                                   "queries": [], "cards": []})
+                return
+            try:
+                async with limit:
+                    if queries is None:
+                        if strategy not in plans:
+                            plans[strategy] = asyncio.ensure_future(self.query_agent.agenerate_queries(strategy))
+                        queries = await asyncio.shield(plans[strategy])
+                    cards = await self.query_agent.afetch_cards(queries, shared=searches, strategy=strategy)
+                result = {
+                    "answer": format_card_results(strategy, cards),
+                    "queries": queries,
+                    "cards": group_card_results(cards)
+                }
+            except Exception as e:
+                result = {"error": str(e)}
+            await results.put({"index": index, "message": messages[index], **result})
+        
+        async def produce():
+            tasks = []
+            try:
+                async for index, strategy, queries in self.strategist.astream_batch_answers(messages, concurrency):
+                    if isinstance(strategy, Exception):
+                        await results.put({"index": index, "message": messages[index], "error": str(strategy)})
+                    else:
+                        tasks.append(asyncio.ensure_future(finish(index, strategy, queries)))
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await results.put(None)
+        
+        producer = asyncio.ensure_future(produce())
+        done = set()
+        try:
+            while True:
+                result = await results.get()
+                if result is None:
+                    break
+                done.add(result["index"])
+                yield result
+            # Surface a failure of the batch as a whole on every message it left unanswered
+            await asyncio.wait([producer])
+            error = None if producer.cancelled() else producer.exception()
+            for index in range(len(messages)):
+                if index not in done:
+                    yield {"index": index, "message": messages[index], "error": str(error or "Not processed")}
+        finally:
+            producer.cancel()
+            for shared in (*plans.values(), *searches.values()):
+                shared.cancel()
+    
+    def process_batch(self, messages: List[str], concurrency: int = BATCH_CONCURRENCY) -> List[Dict[str, Any]]:
+        """Answer many independent messages. See aprocess_batch; results are returned in message order."""
+        async def collect():
+            try:
+                return [result async for result in self.aprocess_batch(messages, concurrency)]
+            finally:
+                await AsyncScryfallService.aclose()
+        
+        return sorted(asyncio.run(collect()), key=lambda result: result["index"])
+    
+    def _strategy_update(self, question: str, strategy_result: Dict[str, Any]) -> Dict[str, Any]:
+        """State update from the strategist's response; "queries" is only set in single-pass mode."""
+        answer = strategy_result["answer"]
+        queries = strategy_result.get("queries")
+        return {"strategy": answer, "queries": queries, "route": self._route(question, answer, queries)}
+    
+    @staticmethod
+    def _route(question: str, strategy: str, queries: Optional[List[str]] = None) -> str:
+        """
+        Which path a message takes after the strategist.
+        
+        In single-pass mode the strategist's query list decides: an empty one means
+        no cards are needed. Otherwise the message is classified locally.
+        """
+        if not ADAPTIVE_ROUTING:
+            return CARDS
+        if queries is not None:
+            return CARDS if queries else RULES
+        return classify_message(question, strategy)
+    
+    @staticmethod
+    def _observe_path(route: str, seconds: float):
+        WORKFLOW_DURATION.observe(seconds, path=route)
+        record(f"path.{route}", seconds)
+    
     def reset_session(self, session_id: str):
         """Reset a conversation session."""
         self.strategist.reset_session(session_id)
\ No newline at end of file
@@ -4,22 +4,37 @@ import { NextResponse } from 'next/server';
 export async function POST(request: Request) {
   try {
     const body = await request.json();
+    const stream = Boolean(body.stream);
+
+    const response = await fetch(
+      stream ? 'http://localhost:8000/api/query/stream' : 'http://localhost:8000/api/query',
+      {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          message: body.message,
+          session_id: body.sessionId || null
+        }),
+      }
+    );
 
-    const response = await fetch('http://localhost:8000/api/query', {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({
-        message: body.message,
-        session_id: body.sessionId || null
-      }),
-    });
-    
     if (!response.ok) {
       throw new Error(`Error from backend: ${response.status}`);
     }
-    
+
+    if (stream) {
+      // Pass the server-sent events through unbuffered
+      return new Response(response.body, {
+        headers: {
+          'Content-Type': 'text/event-stream',
+          'Cache-Control': 'no-cache',
+          'Connection': 'keep-alive',
+        },
+      });
+    }
+
     const data = await response.json();
     return NextResponse.json(data);
   } catch (error) {